@@ -1,16 +1,32 @@
 import streamlit as st
-import sqlite3
 import altair as alt
 import pandas as pd
-import os, base64
-from backend import create_incident, read_incidents, update_incident, delete_incident, search_incident
+import os, tempfile
+from datetime import datetime, timedelta
+from backend import (create_incident, list_incidents, update_incident, delete_incident, search_incident, export_incidents,
+                     incident_changes, incident_grid)
+import export
+import dashboard_data
+import db
+import instrumentation
+from lookups import resolve_jurisdiction, resolve_location
+from query_cache import cache_stats
+from timestamps import to_epoch
 import uuid
 
+# Dashboard payload limits: points per priority in the time series, and default bars per bar chart
+DASHBOARD_MAX_POINTS = 200
+DASHBOARD_TOP_BARS = 20
+# Size of the hot spot heatmap cells, in meters
+DASHBOARD_CELL_M = 250
+# Largest export offered as a download: Streamlit holds a download in memory, bigger exports use export.py
+EXPORT_DOWNLOAD_MAX_MB = 100
 
-# Function to display the latest 10 incidents
+
+# Function to browse incidents page by page
 def display_incidents():
     """
-    Display the latest 10 incidents in the database.
+    Display incidents page by page, newest first.
 
     This function will show the following details of each incident:
         - Call Key
@@ -18,12 +34,37 @@ def display_incidents():
         - Description
         - Call Time (Date and Time)
 
+    Incidents can be filtered by priority, jurisdiction and call date, and browsed with the "Older"
+    and "Newer" buttons. Pages are fetched with keyset pagination (backend.list_incidents), so going
+    deep into the history costs the same as the first page. The cursors of the pages already visited
+    are kept in the session state to go back.
+
     If there are no incidents in the database, it will display a message saying "No incidents found."
 
     It will not show the delete button in this section anymore. If you want to delete an incident, it will now be handled through the "Search Incidents" tab.
     """
-    st.subheader("View Latest 10 Incidents")
-    incidents = read_incidents()
+    st.subheader("View Incidents")
+    col1, col2, col3, col4 = st.columns(4)
+    priority = col1.selectbox("Priority", ["All", "Low", "Medium", "High", "Non-Emergency"])
+    jurisdiction_id = col2.number_input("Jurisdiction ID (0 for all)", min_value=0, value=0)
+    dates = col3.date_input("Call date range", value=())
+    page_size = col4.selectbox("Page size", [10, 25, 50, 100])
+
+    filters = {
+        'priority': None if priority == "All" else priority,
+        'jurisdiction_id': int(jurisdiction_id) or None,
+        'start': datetime.combine(dates[0], datetime.min.time()) if len(dates) > 0 else None,
+        'end': datetime.combine(dates[-1] + timedelta(days=1), datetime.min.time()) if len(dates) > 0 else None,
+    }
+
+    # Start over from the newest page whenever the filters change
+    state_key = (tuple(filters.items()), page_size)
+    if st.session_state.get('incident_filters') != state_key:
+        st.session_state['incident_filters'] = state_key
+        st.session_state['incident_cursors'] = [None]  # cursor of every page visited so far
+    cursors = st.session_state['incident_cursors']
+
+    incidents, next_cursor = list_incidents(page_size=page_size, cursor=cursors[-1], **filters)
 
     if not incidents:
         st.write("No incidents found.")
@@ -34,19 +75,31 @@ def display_incidents():
             st.write(f"**Call Key**: {incident['call_key']} - **Priority**: {incident['priority']} - **Description**: {incident['description']}")
             st.write(f"**Call Time**: {call_time}")  # Added date and time of the incident
             st.markdown("---")
-            # Removed the delete button from the "View Latest 10 Incidents" section
+            # Removed the delete button from the "View Incidents" section
             # If you want to delete an incident, it will now be handled through the "Search Incidents" tab
 
+    newer, page, older = st.columns([1, 2, 1])
+    if newer.button("Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    page.write(f"Page {len(cursors)}")
+    if older.button("Older", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
 # Function to add a new incident
 def add_incident():
     """
     Display a form to add a new incident to the database.
 
     This function provides a Streamlit form for users to enter details of a new incident,
-    including record ID, call date and time, priority, description, call number, incident
-    location ID, reporter location ID, and jurisdiction ID. Upon form submission, a new
-    incident is created with a unique call key and added to the database. A success message
-    is displayed after the incident is successfully added.
+    including record ID, call date and time, priority, description, call number, the incident
+    address, the reporter's location (address, neighborhood, ZIP code, census tract and community
+    statistical area) and the jurisdiction (district, police district and post, council and
+    sheriff districts). Locations and jurisdictions are resolved to their ids with lookups.py,
+    which creates them if they are new. Upon form submission, a new incident is created with a
+    unique call key and added to the database. A success message is displayed after the incident
+    is successfully added.
     """
 
     st.subheader("Add New Incident")
@@ -56,13 +109,27 @@ def add_incident():
         priority = st.selectbox("Priority", ["Low", "Medium", "High", "Non-Emergency"])
         description = st.text_area("Description")
         call_number = st.text_input("Call Number")
-        incident_location_id = st.number_input("Incident Location ID", min_value=1)
-        reporter_location_id = st.number_input("Reporter Location ID", min_value=1)
-        jurisdiction_id = st.number_input("Jurisdiction ID", min_value=1)
+        incident_address = st.text_input("Incident Location (address)")
+
+        st.markdown("**Reporter Location**")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        reporter_location = (col1.text_input("Address"), col2.text_input("Neighborhood"), col3.text_input("ZIP Code"),
+                             col4.text_input("Census Tract"), col5.text_input("Community Statistical Area"))
+
+        st.markdown("**Jurisdiction**")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        jurisdiction = (col1.text_input("District"), col2.text_input("Police District"),
+                        col3.text_input("Police Post"), col4.text_input("Council District"),
+                        col5.text_input("Sheriff District"))
         
         submit_button = st.form_submit_button(label="Add Incident")
         
         if submit_button:
+            # Resolve the locations and the jurisdiction to their ids, creating the new ones
+            incident_location_id = resolve_location(incident_address)
+            reporter_location_id = resolve_location(*reporter_location)
+            jurisdiction_id = resolve_jurisdiction(*jurisdiction)
+
             # Generate call_key automatically
             call_key = str(uuid.uuid4())
             # Create the incident
@@ -81,7 +148,8 @@ def update_existing_incident():
     Upon form submission, the incident is updated with new priority and description, and a success
     message is displayed after the incident is successfully updated.
 
-    If no incident is found with the given call key, an error message is displayed.
+    If no incident is found with the given call key, or it is archived (read-only), an error message
+    is displayed.
     """
     
     st.subheader("Update Incident")
@@ -96,29 +164,44 @@ def update_existing_incident():
             new_description = st.text_area("Description", value=incident["description"])
             
             if st.button(f"Update {call_key}"):
-                update_incident(call_key, priority=new_priority, description=new_description)
-                st.success(f"Incident {call_key} updated successfully!")
+                try:
+                    updated = update_incident(call_key, priority=new_priority, description=new_description)
+                except ValueError as e:
+                    st.error(str(e))  # Archived incidents are read-only
+                else:
+                    if updated:
+                        st.success(f"Incident {call_key} updated successfully!")
+                    else:
+                        st.error(f"No incident found with call key: {call_key}")
         else:
             st.error(f"No incident found with call key: {call_key}")
 
-# Function to search incidents by call_key and display the result
+# Function to search incidents and display the results
 def search_incident_form():
     """
-    Display a form to search for incidents by call_key and display the result.
+    Display a form to search for incidents and display the results.
     
-    This function provides a Streamlit form for users to enter a call key to search for an incident.
-    Upon form submission, the incident is searched in the database and the result is displayed in a
-    clean format using Streamlit's default layout.
+    This function lets users search by call key, or by words of the description (full-text,
+    ranked by relevance) combined with priority and jurisdiction filters. Words ending in "*"
+    match as prefixes and text in double quotes as a phrase. The results are displayed in a
+    clean format using Streamlit's default layout, up to the chosen limit.
 
-    If no incident is found with the given call key, an error message is displayed.
+    If no incident matches, an error message is displayed.
 
-    Additionally, a delete button is provided to delete the incident found.
+    Additionally, a delete button is provided to delete each incident found.
     """
-    st.subheader("Search Incidents by Call Key")
+    st.subheader("Search Incidents")
     call_key = st.text_input("Enter Call Key")
-
-    if call_key:
-        results = search_incident(call_key=call_key)
+    description = st.text_input("Description contains (e.g. burg*, \"hit and run\")")
+    col1, col2, col3 = st.columns(3)
+    priority = col1.selectbox("Priority", ["All", "Low", "Medium", "High", "Non-Emergency"])
+    jurisdiction_id = col2.number_input("Jurisdiction ID (0 for all)", min_value=0, value=0)
+    limit = col3.selectbox("Maximum results", [20, 50, 100, 500])
+
+    if call_key or description:
+        results = search_incident(call_key=call_key or None, description=description or None,
+                                  priority=None if priority == "All" else priority,
+                                  jurisdiction_id=int(jurisdiction_id) or None, limit=limit)
         
         if results:
             # Use Streamlit default layout for displaying search results in a readable format
@@ -136,17 +219,24 @@ def search_incident_form():
                 
                 # Add a delete button to delete the incident found
                 if st.button(f"Delete Incident {incident['call_key']}"):
-                    delete_incident(incident['call_key'])
-                    st.success(f"Incident {incident['call_key']} deleted successfully!")
+                    try:
+                        deleted = delete_incident(incident['call_key'])
+                    except ValueError as e:
+                        st.error(str(e))  # Archived incidents are read-only
+                    else:
+                        if deleted:
+                            st.success(f"Incident {incident['call_key']} deleted successfully!")
+                        else:
+                            st.error(f"No incident found with call key: {incident['call_key']}")
         else:
-            st.error(f"No incidents found with call key: {call_key}")
+            st.error("No incidents found matching the search criteria.")
 
 # Function to display the Dashboard with interactive Altair charts
 def dashboard():
     """
     Displays a dashboard with interactive Altair charts for incident analysis.
 
-    The dashboard consists of six charts:
+    The dashboard consists of seven charts:
 
     1. Priority Distribution (Bar Chart)
     2. Distribution of Calls by Hour of Day (Line Chart)
@@ -154,25 +244,41 @@ def dashboard():
     4. Number of Calls by Neighborhood (Bar Chart)
     5. Total Calls by Priority Over Time (Line Chart)
     6. Calls by Location (Bar Chart)
+    7. Hot Spots (Heatmap of the geocoded incident locations)
 
     The charts are interactive, allowing users to hover over the data points to see more
     information about each incident.
 
+    The charts can be limited to a date range and a jurisdiction; only that window is aggregated.
+    The time series uses hourly, daily, weekly or monthly points depending on the length of the
+    window, and the neighborhood and location charts show their largest bars plus an "Other" bar.
+
     This function uses the Altair library to create the charts and Streamlit to display them in a
     dashboard layout.
 
     :return: None
     """
     st.subheader("Dashboard: Incident Analysis")
-
-    # Connect to the database and fetch data for the charts
-    conn = sqlite3.connect('database/911_Call_Data.db')
-    df_calls = pd.read_sql_query("SELECT * FROM Calls;", conn)
+    col1, col2, col3 = st.columns(3)
+    dates = col1.date_input("Call date range", value=(), key='dashboard_dates')
+    jurisdiction_id = col2.number_input("Jurisdiction ID (0 for all)", min_value=0, value=0, key='dashboard_jurisdiction')
+    top = col3.number_input("Bars per chart", min_value=5, max_value=100, value=DASHBOARD_TOP_BARS)
+
+    # Fetch the data for every chart: small, already-aggregated frames from dashboard_data (backed by
+    # the Rollup_* tables when no filter is set), shared through the query cache until the data changes.
+    start = to_epoch(datetime.combine(dates[0], datetime.min.time())) if len(dates) > 0 else None
+    end = to_epoch(datetime.combine(dates[-1] + timedelta(days=1), datetime.min.time())) if len(dates) > 0 else None
+    charts = dashboard_data.get_dashboard(
+        start=start,
+        end=end,
+        jurisdiction_id=int(jurisdiction_id) or None,
+        max_points=DASHBOARD_MAX_POINTS,
+        top=int(top),
+    )
 
     # Plot 1: Priority Distribution (Bar Chart)
     st.subheader("Priority Distribution")
-    priority_counts = df_calls['priority'].value_counts().reset_index()
-    priority_counts.columns = ['Priority', 'Count']
+    priority_counts = charts['priority'].rename(columns={'priority': 'Priority', 'count': 'Count'})
 
     priority_chart = alt.Chart(priority_counts).mark_bar().encode(
         x='Priority:N',
@@ -185,11 +291,8 @@ def dashboard():
 
     # Plot 2: Distribution of Calls by Hour of Day (Line Chart)
     st.subheader("Distribution of Calls by Hour of Day")
-    df_calls['call_date_time'] = pd.to_datetime(df_calls['call_date_time'], errors='coerce')
-    df_calls = df_calls.dropna(subset=['call_date_time'])
-    df_calls['hour'] = df_calls['call_date_time'].dt.hour
-
-    df_hourly = df_calls.groupby('hour').size().reset_index(name="count")
+    # Hours are bucketed from call_epoch (UTC, like the stored "+00" times)
+    df_hourly = charts['hour']
 
     hour_chart = alt.Chart(df_hourly).mark_line().encode(
         x='hour:O',
@@ -202,13 +305,7 @@ def dashboard():
 
     # Plot 3: Number of Calls by District (Bar Chart)
     st.subheader("Number of Calls by District")
-    query_district = """
-    SELECT J.district, COUNT(*) as count
-    FROM Calls C
-    JOIN Jurisdictions J ON C.jurisdiction_id = J.jurisdiction_id
-    GROUP BY J.district;
-    """
-    df_district = pd.read_sql_query(query_district, conn)
+    df_district = charts['district']
 
     district_chart = alt.Chart(df_district).mark_bar().encode(
         x='district:N',
@@ -221,16 +318,10 @@ def dashboard():
 
     # Plot 4: Number of Calls by Neighborhood (Bar Chart)
     st.subheader("Number of Calls by Neighborhood")
-    query_neighborhood = """
-    SELECT L.neighborhood, COUNT(*) AS count
-    FROM Calls C
-    JOIN Locations L ON C.reporter_location_id = L.location_id
-    GROUP BY L.neighborhood;
-    """
-    df_neighborhood = pd.read_sql_query(query_neighborhood, conn)
+    df_neighborhood = charts['neighborhood']
 
     neighborhood_chart = alt.Chart(df_neighborhood).mark_bar().encode(
-        x='neighborhood:N',
+        x=alt.X('neighborhood:N', sort=None),  # Largest first, "Other" last
         y='count:Q',
         color='neighborhood:N'
     ).properties(
@@ -240,11 +331,10 @@ def dashboard():
 
     # Plot 5: Total Calls by Priority Over Time (Line Chart)
     st.subheader("Total Calls by Priority Over Time")
-    df_calls['date'] = df_calls['call_date_time'].dt.date
-    df_priority_over_time = df_calls.groupby(['date', 'priority']).size().reset_index(name='count')
+    df_priority_over_time = charts['priority_over_time']
 
     priority_time_chart = alt.Chart(df_priority_over_time).mark_line().encode(
-        x='date:T',
+        x=alt.X('date:T', title=f"{df_priority_over_time.attrs['bucket'].capitalize()} (UTC)"),
         y='count:Q',
         color='priority:N',
         tooltip=['date:T', 'count:Q', 'priority:N']
@@ -255,16 +345,10 @@ def dashboard():
 
     # Plot 6: Calls by Location (Bar Chart)
     st.subheader("Calls by Location")
-    query_location = """
-    SELECT L.location_id, COUNT(*) AS count
-    FROM Calls C
-    JOIN Locations L ON C.reporter_location_id = L.location_id
-    GROUP BY L.location_id;
-    """
-    df_location = pd.read_sql_query(query_location, conn)
+    df_location = charts['location']
 
     location_chart = alt.Chart(df_location).mark_bar().encode(
-        x='location_id:N',
+        x=alt.X('location_id:N', sort=None),  # Largest first, "Other" last
         y='count:Q',
         color='location_id:N'
     ).properties(
@@ -272,16 +356,199 @@ def dashboard():
     ).interactive()  # Add interactivity to the chart
     st.altair_chart(location_chart, use_container_width=True)
 
-    conn.close()
+    # Plot 7: Hot Spots (Heatmap)
+    st.subheader("Hot Spots")
+    # Counts per grid cell of the geocoded incident locations (see geo.py), over the same window
+    df_grid = pd.DataFrame(incident_grid(cell_m=DASHBOARD_CELL_M, start=start, end=end,
+                                         jurisdiction_id=int(jurisdiction_id) or None),
+                           columns=['latitude', 'longitude', 'count'])
+    if df_grid.empty:
+        st.write("No geocoded locations. Load coordinates with `python geo.py geocodes.csv`.")
+    else:
+        grid_chart = alt.Chart(df_grid).mark_square(size=40).encode(
+            x=alt.X('longitude:Q', scale=alt.Scale(zero=False)),
+            y=alt.Y('latitude:Q', scale=alt.Scale(zero=False)),
+            color=alt.Color('count:Q', scale=alt.Scale(scheme='inferno', type='log')),
+            tooltip=['latitude:Q', 'longitude:Q', 'count:Q']
+        ).properties(
+            title=f"Calls per {DASHBOARD_CELL_M} m Cell"
+        ).interactive()  # Add interactivity to the chart
+        st.altair_chart(grid_chart, use_container_width=True)
+
+# Function to display the query metrics admin page
+def query_metrics():
+    """
+    Display the SQLite query metrics collected by instrumentation.py for this server process.
+
+    The page shows, per statement template, the number of calls and rows, the total time and the
+    p50/p95/p99 latencies together with the functions that issued it, then the slow-query log with
+    the query plan captured for each slow statement, and the connection pool and query cache
+    counters. Slow statements are recorded above the process-wide threshold (INCIDENT_SLOW_QUERY_MS);
+    the page can show only the slower ones, a setting kept in the session state, and reset the metrics.
+
+    :return: None
+    """
+    st.subheader("Query Metrics")
+    col1, col2 = st.columns([3, 1])
+    recorded_ms = float(instrumentation.metrics.slow_ms)
+    slow_ms = col1.number_input("Show slow queries over (ms)", min_value=recorded_ms, value=recorded_ms,
+                                key='metrics_slow_ms')
+    if col2.button("Reset metrics"):
+        instrumentation.reset()
+
+    snapshot = instrumentation.snapshot()
+    st.caption(f"Collected since {datetime.fromtimestamp(snapshot['since']):%Y-%m-%d %H:%M:%S}")
+    if snapshot['queries']:
+        queries = pd.DataFrame(snapshot['queries'])
+        queries['callers'] = queries['callers'].map(
+            lambda callers: ", ".join(f"{caller} ({calls})" for caller, calls in callers.items()))
+        st.dataframe(queries[['template', 'calls', 'rows', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+                              'max_ms', 'callers']].round(2), use_container_width=True)
+    else:
+        st.write("No queries recorded yet.")
+
+    st.subheader(f"Slow Queries (over {slow_ms:g} ms)")
+    slow_queries = [entry for entry in snapshot['slow_queries'] if entry['ms'] >= slow_ms]
+    if not slow_queries:
+        st.write("No slow queries.")
+    for entry in slow_queries:
+        with st.expander(f"{entry['ms']:.1f} ms - {entry['caller']} - {entry['template'][:80]}"):
+            st.write(f"**At**: {datetime.fromtimestamp(entry['at']):%Y-%m-%d %H:%M:%S} - **Rows**: {entry['rows']}")
+            st.code(entry['sql'], language='sql')
+            st.code("\n".join(entry['plan'] or ["(no plan)"]))
+
+    st.subheader("Connection Pool and Query Cache")
+    col1, col2 = st.columns(2)
+    col1.json(db.pool_stats())
+    col2.json(cache_stats())
+
+# Function to display a live board of the newest incidents
+def live_board():
+    """
+    Display the newest incidents and keep them up to date without rerunning the page.
+
+    The board lives in a Streamlit fragment that reruns on its own every few seconds. The first run
+    loads a page of incidents; later runs ask backend.incident_changes for the changes logged since
+    the last watermark and only apply those to the board kept in the session state: new and updated
+    incidents are merged in, deleted ones (or ones no longer matching the filters) are dropped. An
+    idle refresh reads a single row, and screens polling at the same watermark share one cached query.
+
+    :return: None
+    """
+    st.subheader("Live Incident Board")
+    col1, col2, col3, col4 = st.columns(4)
+    priorities = col1.multiselect("Priority", ["Low", "Medium", "High", "Non-Emergency"], key='live_priority')
+    jurisdiction_id = col2.number_input("Jurisdiction ID (0 for all)", min_value=0, value=0, key='live_jurisdiction')
+    size = col3.selectbox("Incidents shown", [25, 50, 100, 200], index=1)
+    interval = col4.selectbox("Refresh every (s)", [2, 5, 10, 30], index=1)
+
+    # Start over when the filters change
+    filters = (tuple(priorities), int(jurisdiction_id) or None, size)
+    if st.session_state.get('live_filters') != filters:
+        st.session_state.live_filters = filters
+        st.session_state.live_watermark = None
+        st.session_state.live_board = {}
+
+    @st.fragment(run_every=interval)
+    def refresh():
+        board = st.session_state.live_board
+        changed = set()
+        while True:
+            changes = incident_changes(since=st.session_state.live_watermark, priority=filters[0] or None,
+                                       jurisdiction_id=filters[1], page_size=size)
+            if changes['reset']:
+                board.clear()
+            dropped = [call_key for call_key in changes['removed'] if board.pop(call_key, None) is not None]
+            for incident in changes['incidents']:
+                board[incident['call_key']] = dict(incident)
+                if not changes['reset']:
+                    changed.add(incident['call_key'])
+            st.session_state.live_watermark = changes['watermark']
+            if dropped and len(board) < size:
+                st.session_state.live_watermark = None  # Reload a full page to fill the gaps
+            elif not changes['more']:
+                break
+
+        # Keep the newest incidents only
+        newest = sorted(board.values(), key=lambda incident: (incident['call_epoch'] is not None,
+                                                              incident['call_epoch'] or 0, incident['call_key']),
+                        reverse=True)[:size]
+        st.session_state.live_board = board = {incident['call_key']: incident for incident in newest}
+
+        st.caption(f"Updated {datetime.now():%H:%M:%S} - {len(changed)} new or updated - "
+                   f"watermark {st.session_state.live_watermark}")
+        if not board:
+            st.write("No incidents found.")
+            return
+        incidents = pd.DataFrame(newest)[['call_key', 'call_date_time', 'priority', 'description', 'jurisdiction_id']]
+        incidents.insert(0, 'new', incidents['call_key'].isin(changed))
+        st.dataframe(incidents, hide_index=True, use_container_width=True)
+
+    refresh()
+
+# Function to export the filtered incidents to a file
+def export_incidents_form():
+    """
+    Export the incidents matching a filter to CSV, NDJSON or Parquet, with the attributes of their
+    locations and jurisdiction, and offer the file for download.
+
+    The export is streamed by backend.export_incidents into a temporary file, chunk by chunk, while
+    the rows written and the throughput are shown. Streamlit serves a download from memory, so the
+    export stops once the file passes EXPORT_DOWNLOAD_MAX_MB; larger exports are run with export.py.
+
+    :return: None
+    """
+    st.subheader("Export Incidents")
+    col1, col2, col3 = st.columns(3)
+    dates = col1.date_input("Call date range", value=(), key='export_dates')
+    priorities = col2.multiselect("Priority", ["Low", "Medium", "High", "Non-Emergency"])
+    jurisdiction_id = col3.number_input("Jurisdiction ID (0 for all)", min_value=0, value=0, key='export_jurisdiction')
+    description = st.text_input("Description contains (e.g. burg*, \"hit and run\")", key='export_description')
+    col1, col2, col3 = st.columns(3)
+    format = col1.selectbox("Format", export.FORMATS)
+    compression = col2.selectbox("Compression", export.COMPRESSIONS[format], format_func=lambda name: name or "none")
+    ordered = col3.checkbox("Newest first", value=False)
+
+    st.caption(f"Downloads are limited to {EXPORT_DOWNLOAD_MAX_MB} MB; export more with "
+               f"`python export.py incidents.csv.gz --compression gzip`.")
+
+    if st.button("Export"):
+        status = st.empty()
+
+        def progress(written, total, elapsed):
+            status.write(f"{written:,} incidents, {written / elapsed if elapsed else 0:,.0f} rows/s")
+            if os.path.getsize(path) > EXPORT_DOWNLOAD_MAX_MB * 1024 * 1024:
+                status.warning(f"The export passed {EXPORT_DOWNLOAD_MAX_MB} MB after {written:,} incidents and was "
+                               f"stopped. Narrow the filters, pick a compression, or run export.py.")
+                st.stop()  # Leaves through the finally below, which removes the partial file
+
+        suffix = {'csv': ".csv", 'ndjson': ".ndjson", 'parquet': ".parquet"}[format]
+        suffix += {'gzip': ".gz", 'bz2': ".bz2", 'xz': ".xz"}.get(compression, "") if format != 'parquet' else ""
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as file:
+            path = file.name
+        try:
+            summary = export_incidents(
+                path, format=format, compression=compression, priority=priorities or None,
+                jurisdiction_id=int(jurisdiction_id) or None,
+                start=datetime.combine(dates[0], datetime.min.time()) if len(dates) > 0 else None,
+                end=datetime.combine(dates[-1] + timedelta(days=1), datetime.min.time()) if len(dates) > 0 else None,
+                description=description or None, ordered=ordered, progress=progress)
+            status.write(f"{summary['rows']:,} incidents in {summary['elapsed']:.1f} s "
+                         f"({summary['rows_per_sec']:,.0f} rows/s)")
+            with open(path, 'rb') as file:
+                st.download_button("Download", file, file_name=f"incidents{suffix}")
+        finally:
+            os.remove(path)
 
 st.title("911 Incident Management System")
 # Streamlit sidebar for navigation
-menu = ["Dashboard", "View Latest 10 Incidents", "Add Incident", "Update Incident", "Search & Delete Incidents"]
+menu = ["Dashboard", "View Incidents", "Add Incident", "Update Incident", "Search & Delete Incidents",
+        "Live Incident Board", "Export Incidents", "Query Metrics"]
 choice = st.sidebar.selectbox("Select an Option", menu, index=0)  # Set "Dashboard" as the default option
 
 if choice == "Dashboard":
     dashboard()  # Load the dashboard
-elif choice == "View Latest 10 Incidents":
+elif choice == "View Incidents":
     display_incidents()
 elif choice == "Add Incident":
     add_incident()
@@ -289,3 +556,9 @@ elif choice == "Update Incident":
     update_existing_incident()
 elif choice == "Search & Delete Incidents":
     search_incident_form()
+elif choice == "Live Incident Board":
+    live_board()
+elif choice == "Export Incidents":
+    export_incidents_form()
+elif choice == "Query Metrics":
+    query_metrics()
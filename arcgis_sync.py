@@ -0,0 +1,400 @@
+"""
+Incremental sync of the calls to the ArcGIS layer.
+
+ArcGIS_Metadata.needs_sync marks the calls whose GIS feature is out of date. Triggers on Calls
+(created by migration 10) set it on every insert, update and delete, in the same transaction as
+the change, and the change itself is appended to the Call_Changes log (see changelog.py).
+
+The calls that existed before the triggers were never logged. A new SyncWorker first backfills
+them, scanning Calls by call_key for those without a metadata row or dirty without a logged change
+(then the dirty metadata rows of calls deleted before the triggers), and records in
+Sync_Checkpoints that the backfill is done; a bulk load (see loader.py), whose calls are not
+logged either, deletes that record and the worker backfills again. Call_Changes only ever holds
+real changes. The worker then drains the log in seq order, a batch at a time:
+
+1. read the next changes after its checkpoint (Sync_Checkpoints),
+2. push the current state of every dirty call to a sink: an upsert with the call's columns and
+   esri_oid, or a delete with the esri_oid of a deleted call,
+3. in one transaction, store the esri_oids returned by the sink, clear needs_sync (unless the call
+   changed again meanwhile) and advance the checkpoint.
+
+Failed pushes are retried with exponential backoff; if they keep failing, the checkpoint stays
+where it was and the next run starts again from the same batch. Sinks must therefore accept the
+same upsert or delete twice. After a drain, the changes every consumer of the log has applied are
+pruned (see changelog.prune_consumed()). The cost of a sync depends on the number of changes, not on the size
+of Calls. Calls moved to the archive (see archive.py) are not changes and are not synced; a call
+that changed and was archived before its sync is pushed from its partition, not deleted.
+
+Sinks are pluggable: subclass SyncSink and implement push(). FileSink (NDJSON file) and MockSink
+(in memory, with injectable failures) are provided for local runs and tests.
+
+Usage:
+    python arcgis_sync.py --db database/911_Call_Data.db --output arcgis_changes.ndjson
+    python arcgis_sync.py --db database/911_Call_Data.db --output arcgis_changes.ndjson --watch 5
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import archive
+import changelog
+from schema import CALL_COLUMNS
+
+# Backfill batches, by call_key after the previous batch: calls without a metadata row or dirty
+# without any logged change, then the dirty metadata rows of calls deleted before the triggers
+# existed (or of archived calls, which _changes() reads from their partition). Calls changed since
+# are left to the log.
+BACKFILL_QUERIES = (
+    """
+    SELECT C.call_key FROM Calls C LEFT JOIN ArcGIS_Metadata M ON M.call_key = C.call_key
+    WHERE C.call_key > ? AND (M.call_key IS NULL OR M.needs_sync IS NULL
+        OR (M.needs_sync = 1 AND NOT EXISTS (SELECT 1 FROM Call_Changes L WHERE L.call_key = C.call_key)))
+    ORDER BY C.call_key LIMIT ?
+    """,
+    """
+    SELECT M.call_key FROM ArcGIS_Metadata M
+    WHERE M.call_key > ? AND M.needs_sync = 1 AND NOT EXISTS (SELECT 1 FROM Calls C WHERE C.call_key = M.call_key)
+        AND NOT EXISTS (SELECT 1 FROM Call_Changes L WHERE L.call_key = M.call_key)
+    ORDER BY M.call_key LIMIT ?
+    """,
+)
+
+class SyncError(RuntimeError):
+    """Raised when a batch could not be pushed to the sink after every retry."""
+
+
+class SyncSink(ABC):
+    """
+    Destination of the synced changes. Subclasses implement push().
+    """
+
+    @abstractmethod
+    def push(self, changes):
+        """
+        Apply a batch of changes to the destination.
+
+        Parameters:
+        - changes (list of dict): In seq order, each with:
+            - operation (str): 'upsert' or 'delete'.
+            - call_key (str): The call.
+            - esri_oid (int or None): The feature's object id, None if the call was never synced.
+            - attributes (dict or None): The Calls columns of an upsert (None for a delete).
+
+        Raises:
+        - Exception: Any error; the whole batch is then retried.
+
+        Returns:
+        - dict: Maps the call_key of every upsert to the esri_oid of its feature.
+        """
+
+
+class MockSink(SyncSink):
+    """
+    An in-memory sink for tests: keeps the features by esri_oid and every batch it received.
+
+    Parameters:
+    - failures (int, optional): Number of pushes that raise ConnectionError before it starts
+      accepting them. Defaults to 0.
+    - first_oid (int, optional): esri_oid given to the first new feature. Defaults to 1.
+    """
+
+    def __init__(self, failures=0, first_oid=1):
+        self.failures = failures
+        self.features = {}
+        self.batches = []
+        self._next_oid = first_oid
+
+    def push(self, changes):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Simulated sink failure.")
+        oids = {}
+        for change in changes:
+            if change['operation'] == 'delete':
+                self.features.pop(change['esri_oid'], None)
+                continue
+            oid = change['esri_oid']
+            if oid is None:
+                oid, self._next_oid = self._next_oid, self._next_oid + 1
+            self.features[oid] = change['attributes']
+            oids[change['call_key']] = oid
+        self.batches.append(changes)
+        return oids
+
+
+class FileSink(SyncSink):
+    """
+    A sink appending every change as one JSON line to a file, e.g. to inspect or replay a sync.
+
+    New features get esri_oids after the largest one already written to the file.
+
+    Parameters:
+    - path (str): The NDJSON file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._next_oid = 1
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    oid = json.loads(line).get('esri_oid')
+                    if oid is not None:
+                        self._next_oid = max(self._next_oid, oid + 1)
+
+    def push(self, changes):
+        oids = {}
+        lines = []
+        for change in changes:
+            record = dict(change)
+            if record['operation'] == 'upsert':
+                if record['esri_oid'] is None:
+                    record['esri_oid'], self._next_oid = self._next_oid, self._next_oid + 1
+                oids[record['call_key']] = record['esri_oid']
+            lines.append(json.dumps(record) + "\n")
+        with open(self.path, 'a') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return oids
+
+
+class SyncWorker:
+    """
+    Drains the Calls change log into a sink, in batches, with a checkpoint and retries.
+
+    Parameters:
+    - sink (SyncSink): Where the changes are pushed.
+    - name (str, optional): Name of the checkpoint in Sync_Checkpoints. Defaults to 'arcgis'.
+    - batch_size (int, optional): Maximum number of log entries per batch. Defaults to 500.
+    - max_retries (int, optional): Retries of a failed push before giving up. Defaults to 5.
+    - backoff (float, optional): Seconds before the first retry, doubled at each retry. Defaults to 0.5.
+    """
+
+    def __init__(self, sink, name='arcgis', batch_size=500, max_retries=5, backoff=0.5):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+
+        self.sink = sink
+        self.name = name
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._stop = threading.Event()
+        self._backfill = None  # (query index, last call_key) of a backfill in progress, False once done
+
+    def checkpoint(self):
+        """
+        Return the seq of the last change applied (0 before the first sync).
+
+        Returns:
+        - int: The checkpoint.
+        """
+        import db  # Not at module level: db imports migrations, which imports this module
+
+        with db.connection() as conn:
+            row = conn.execute("SELECT last_seq FROM Sync_Checkpoints WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row else 0
+
+    # Function to build the changes pushing the current state of some calls
+    @staticmethod
+    def _changes(conn, call_keys, unknown):
+        # `unknown` is the needs_sync of a call without a metadata row
+        keys_json = json.dumps(call_keys)
+        metadata = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT call_key, needs_sync, esri_oid FROM ArcGIS_Metadata "
+            "WHERE call_key IN (SELECT value FROM json_each(?))", (keys_json,))}
+        query = (f"SELECT {', '.join(CALL_COLUMNS)}, call_epoch FROM {{schema}}.Calls "
+                 "WHERE call_key IN (SELECT value FROM json_each(?))")
+        calls = {row['call_key']: row for row in conn.execute(query.format(schema='main'), (keys_json,))}
+        missing = [call_key for call_key in call_keys if call_key not in calls]
+        if missing:
+            # Archived since they changed: still a feature, pushed from the partition
+            calls.update((row['call_key'], row) for row in archive.query_stores(conn, query, (json.dumps(missing),)))
+
+        changes = []
+        for call_key in call_keys:
+            needs_sync, esri_oid = metadata.get(call_key, (unknown, None))
+            if not needs_sync:
+                continue  # Already synced, e.g. loaded from an ArcGIS export
+            if call_key in calls:
+                changes.append({'operation': 'upsert', 'call_key': call_key, 'esri_oid': esri_oid,
+                                'attributes': dict(calls[call_key])})
+            else:
+                changes.append({'operation': 'delete', 'call_key': call_key, 'esri_oid': esri_oid,
+                                'attributes': None})
+        return changes
+
+    def _read_batch(self, after_seq):
+        import db
+
+        with db.connection() as conn:
+            entries = conn.execute("SELECT seq, call_key FROM Call_Changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                                   (after_seq, self.batch_size)).fetchall()
+            if not entries:
+                return None, 0, []
+            call_keys = list(dict.fromkeys(call_key for _, call_key in entries))
+            return entries[-1][0], len(entries), self._changes(conn, call_keys, unknown=0)
+
+    def _backfill_once(self):
+        # Push the next backfill batch; returns None once the backfill is done
+        import db
+
+        if not self._backfill:  # Checked again after each run: a bulk load restarts it (see changelog.reset_log)
+            with db.connection() as conn:
+                done = conn.execute("SELECT 1 FROM Sync_Checkpoints WHERE name = ?",
+                                    (f"{self.name}:backfill",)).fetchone()
+            self._backfill = False if done else (0, '')
+            if not done:
+                with db.transaction() as conn:  # The log is drained from the start after the backfill:
+                    conn.execute("INSERT OR IGNORE INTO Sync_Checkpoints (name, last_seq, updated_at) "
+                                 "VALUES (?, 0, ?)", (self.name, int(time.time())))  # keep it from pruning
+        while self._backfill:
+            query, after_key = self._backfill
+            with db.connection() as conn:
+                # Changes logged after this seq keep needs_sync set (see _commit)
+                upto_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM Call_Changes").fetchone()[0]
+                call_keys = [row[0] for row in conn.execute(BACKFILL_QUERIES[query], (after_key, self.batch_size))]
+                changes = self._changes(conn, call_keys, unknown=1)
+            if call_keys:
+                self._commit(upto_seq, changes, self._push(changes), checkpoint=False)
+                self._backfill = (query, call_keys[-1])
+                deletes = sum(1 for change in changes if change['operation'] == 'delete')
+                return {'changes': len(call_keys), 'upserts': len(changes) - deletes, 'deletes': deletes,
+                        'last_seq': self.checkpoint()}
+            if query + 1 < len(BACKFILL_QUERIES):
+                self._backfill = (query + 1, '')
+                continue
+            with db.transaction() as conn:
+                conn.execute("INSERT OR REPLACE INTO Sync_Checkpoints (name, last_seq, updated_at) VALUES (?, ?, ?)",
+                             (f"{self.name}:backfill", upto_seq, int(time.time())))
+            self._backfill = False
+        return None
+
+    def _push(self, changes):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.sink.push(changes) if changes else {}
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise SyncError(f"Sync batch failed after {attempt + 1} attempts: {e}") from e
+                if self._stop.wait(self.backoff * 2 ** attempt):
+                    raise SyncError("Sync stopped while retrying a batch.") from e
+
+    def _commit(self, upto_seq, changes, oids, checkpoint=True):
+        # A call changed again after this batch keeps needs_sync: a later batch pushes it again
+        import db
+
+        not_changed_since = "NOT EXISTS (SELECT 1 FROM Call_Changes WHERE call_key = ? AND seq > ?)"
+        with db.transaction() as conn:
+            for change in changes:
+                call_key = change['call_key']
+                if change['operation'] == 'upsert':
+                    # Backfilled calls may have no metadata row yet
+                    conn.execute(f"INSERT INTO ArcGIS_Metadata (call_key, needs_sync, esri_oid) "
+                                 f"SELECT ?, 0, ? WHERE {not_changed_since} "
+                                 f"ON CONFLICT(call_key) DO UPDATE SET needs_sync = 0, esri_oid = excluded.esri_oid",
+                                 (call_key, oids.get(call_key, change['esri_oid']), call_key, upto_seq))
+                else:  # The feature is gone, and so is the call
+                    conn.execute(f"DELETE FROM ArcGIS_Metadata WHERE call_key = ? AND {not_changed_since}",
+                                 (call_key, call_key, upto_seq))
+            if checkpoint:
+                changelog.set_checkpoint(conn, self.name, upto_seq)
+
+    def sync_once(self):
+        """
+        Push the next batch of changes and advance the checkpoint. Until the backfill is done, the
+        batch is the next calls that were never synced, and the checkpoint is unchanged.
+
+        Raises:
+        - SyncError: If the sink kept failing; the checkpoint is left unchanged.
+
+        Returns:
+        - dict: changes (log entries read), upserts, deletes and last_seq (the new checkpoint).
+        """
+        backfilled = self._backfill_once()
+        if backfilled is not None:
+            return backfilled
+        upto_seq, entries, changes = self._read_batch(self.checkpoint())
+        if upto_seq is None:
+            return {'changes': 0, 'upserts': 0, 'deletes': 0, 'last_seq': self.checkpoint()}
+        oids = self._push(changes)
+        self._commit(upto_seq, changes, oids)
+        deletes = sum(1 for change in changes if change['operation'] == 'delete')
+        return {'changes': entries, 'upserts': len(changes) - deletes, 'deletes': deletes, 'last_seq': upto_seq}
+
+    def drain(self):
+        """
+        Push every pending change, batch after batch, then prune the changes every consumer of the
+        log has applied (see changelog.prune_consumed()).
+
+        Returns:
+        - dict: Totals of upserts, deletes and batches, and the final last_seq.
+        """
+        import db
+
+        totals = {'upserts': 0, 'deletes': 0, 'batches': 0, 'last_seq': self.checkpoint()}
+        while not self._stop.is_set():
+            result = self.sync_once()
+            if result['changes'] == 0:
+                break
+            totals['upserts'] += result['upserts']
+            totals['deletes'] += result['deletes']
+            totals['batches'] += 1
+            totals['last_seq'] = result['last_seq']
+        if totals['batches']:
+            with db.transaction() as conn:
+                changelog.prune_consumed(conn)
+        return totals
+
+    def run(self, poll_interval=5.0, on_error=None):
+        """
+        Keep draining the log until stop() is called, waiting poll_interval seconds when idle or
+        after a failed batch.
+
+        Parameters:
+        - poll_interval (float, optional): Seconds between checks for new changes. Defaults to 5.
+        - on_error (callable, optional): Called with the SyncError of a failed batch. Defaults to
+          ignoring it (the batch is retried at the next poll).
+        """
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except SyncError as e:
+                if on_error is not None:
+                    on_error(e)
+            self._stop.wait(poll_interval)
+
+    def stop(self):
+        """Ask run() and drain() to return after the current batch."""
+        self._stop.set()
+
+
+def main(argv=None):
+    import db
+
+    parser = argparse.ArgumentParser(description="Push pending call changes to an NDJSON file sink.")
+    parser.add_argument('--db', default=db.DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--output', default='arcgis_changes.ndjson', help="NDJSON file the changes are appended to.")
+    parser.add_argument('--batch-size', type=int, default=500, help="Log entries per batch (default: %(default)s).")
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help="Keep syncing, polling every SECONDS.")
+    args = parser.parse_args(argv)
+
+    db.configure(args.db)
+    worker = SyncWorker(FileSink(args.output), batch_size=args.batch_size)
+    if args.watch:
+        try:
+            worker.run(poll_interval=args.watch, on_error=lambda e: print(e, flush=True))
+        except KeyboardInterrupt:
+            worker.stop()
+    else:
+        totals = worker.drain()
+        print(f"Synced {totals['upserts']:,} upserts and {totals['deletes']:,} deletes in {totals['batches']} batches "
+              f"(checkpoint {totals['last_seq']}).")
+
+
+if __name__ == '__main__':
+    main()
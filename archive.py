@@ -0,0 +1,432 @@
+"""
+Time-partitioned archive of old calls (hot/cold storage).
+
+Calls older than a horizon are moved out of the main database into one SQLite file per month
+(archive/calls_YYYY_MM.db next to the main database), registered in Archive_Partitions. The hot
+Calls table, its indexes and its full-text index then only hold recent calls, which is where nearly
+all live traffic goes, and old months stop weighing on VACUUM and backups.
+
+Each partition has the same Calls columns and keyset indexes as the hot table, plus its own FTS5
+index. Readers attach the partitions they need one query at a time: backend.list_incidents() and
+backend.search_incident() read hot and cold calls together, and aggregate() runs a dashboard
+GROUP BY over the hot table and only the partitions that overlap the requested time range.
+stream_stores() reads large results chunk by chunk, for exports.
+
+Archiving does not change the dashboard rollups, which keep counting archived calls (the move is
+done with the 'archiving' maintenance flag set, see rollups.py). Archived calls are read-only, and
+calls without a call time are never archived. Each month is moved in one transaction that copies
+with INSERT OR IGNORE before deleting, so an interrupted run can simply be run again.
+
+Usage:
+    python archive.py --db database/911_Call_Data.db --horizon-days 90
+    python archive.py --db database/911_Call_Data.db --list
+"""
+import argparse
+import heapq
+import itertools
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.request import pathname2url
+
+from instrumentation import InstrumentedConnection
+from schema import CALL_COLUMNS
+
+# Columns copied to the partitions, in the order of the hot Calls table
+ARCHIVE_COLUMNS = CALL_COLUMNS + ('call_epoch',)
+
+# Schema of a partition database. It mirrors the hot Calls table and its keyset indexes.
+PARTITION_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Calls (
+        call_key TEXT PRIMARY KEY,
+        record_id TEXT,
+        call_date_time TEXT,
+        priority TEXT,
+        description TEXT,
+        call_number TEXT,
+        incident_location_id INTEGER,
+        reporter_location_id INTEGER,
+        jurisdiction_id INTEGER,
+        call_epoch INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_calls_epoch_key ON Calls(call_epoch, call_key)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_calls_priority_epoch_key ON Calls(priority, call_epoch, call_key)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_calls_jurisdiction_epoch_key ON Calls(jurisdiction_id, call_epoch, call_key)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_calls_reporter_epoch ON Calls(reporter_location_id, call_epoch)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_calls_incident_epoch_key ON Calls(incident_location_id, call_epoch, call_key)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.Calls_FTS USING fts5(
+        description, content='Calls', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+)
+
+# SQLite attaches at most 10 databases per connection; keep a margin
+MAX_ATTACHED = 8
+
+
+# Function to get the first second of a month
+def _month_start(year, month):
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp())
+
+
+# Function to list the months overlapping [start_epoch, end_epoch)
+def _months(start_epoch, end_epoch):
+    moment = datetime.fromtimestamp(start_epoch, tz=timezone.utc)
+    year, month = moment.year, moment.month
+    while _month_start(year, month) < end_epoch:
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        yield f"{year:04d}-{month:02d}", _month_start(year, month), _month_start(next_year, next_month)
+        year, month = next_year, next_month
+
+
+# Function to get the directory of the main database
+def _base_dir(conn):
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return os.path.dirname(os.path.abspath(path)) if path else os.getcwd()
+    return os.getcwd()
+
+
+# Function to list the partitions overlapping a time range
+def partitions(conn, start=None, end=None):
+    """
+    Return the archive partitions that may hold calls in [start, end), newest first.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database.
+    - start (int, optional): Epoch lower bound (inclusive). Defaults to no bound.
+    - end (int, optional): Epoch upper bound (exclusive). Defaults to no bound.
+
+    Returns:
+    - list of tuple: (month, absolute path, start_epoch, end_epoch, row_count) per partition.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Archive_Partitions'").fetchone()
+    if not exists:
+        return []  # Database not migrated yet
+    rows = conn.execute("""
+        SELECT month, path, start_epoch, end_epoch, row_count FROM Archive_Partitions
+        WHERE row_count > 0 AND (? IS NULL OR end_epoch > ?) AND (? IS NULL OR start_epoch < ?)
+        ORDER BY start_epoch DESC
+    """, (start, start, end, end)).fetchall()
+    base = _base_dir(conn)
+    return [(month, os.path.join(base, path), start_epoch, end_epoch, count)
+            for month, path, start_epoch, end_epoch, count in rows]
+
+
+# Function to attach partitions for the duration of a block
+@contextmanager
+def attached(conn, paths):
+    """
+    Attach partition databases to a connection, and detach them afterwards.
+
+    Must be used outside of a write transaction (SQLite cannot detach a database that the current
+    transaction has read).
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database.
+    - paths (list of str): Up to MAX_ATTACHED partition files.
+
+    Yields:
+    - list of str: The schema name of each partition, e.g. 'cold0'.
+    """
+    if len(paths) > MAX_ATTACHED:
+        raise ValueError(f"At most {MAX_ATTACHED} partitions can be attached at once.")
+    names = []
+    try:
+        for path in paths:
+            name = f"cold{len(names)}"
+            conn.execute("ATTACH DATABASE ? AS " + name, (path,))
+            names.append(name)
+        yield names
+    finally:
+        for name in names:
+            conn.execute("DETACH DATABASE " + name)
+
+
+# Function to run one query over the hot table and the relevant partitions
+def query_stores(conn, sql, params=(), start=None, end=None, sort_key=None, reverse=False, limit=None,
+                 epoch_ordered=False):
+    """
+    Run a query against the hot Calls table and every partition overlapping [start, end), and merge
+    the results.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database, outside of a transaction.
+    - sql (str): The query, where "{schema}" stands for the database ("main" or a partition), e.g.
+      "SELECT * FROM {schema}.Calls WHERE ...". It is run once per store with the same parameters.
+    - params (sequence, optional): The query parameters.
+    - start (int, optional): Epoch lower bound used to prune partitions.
+    - end (int, optional): Epoch upper bound (exclusive) used to prune partitions.
+    - sort_key (callable, optional): Sort key of the merged rows. Defaults to keeping the store order.
+    - reverse (bool, optional): Sort in descending order of sort_key. Defaults to False.
+    - limit (int, optional): Keep only the first `limit` merged rows.
+    - epoch_ordered (bool, optional): The query returns rows newest first by call_epoch and sort_key
+      sorts them that way: partitions are then read newest first and the scan stops as soon as
+      `limit` rows are newer than the next partition. Defaults to False.
+
+    Returns:
+    - list: The merged rows.
+    """
+    rows = conn.execute(sql.format(schema='main'), params).fetchall()
+    for _, path, _, end_epoch, _ in partitions(conn, start, end):
+        if epoch_ordered and limit is not None and len(rows) >= limit:
+            oldest_kept = rows[limit - 1]['call_epoch']
+            if oldest_kept is not None and oldest_kept >= end_epoch:
+                break  # Every remaining partition only holds older calls
+        with attached(conn, [path]) as (name,):
+            rows += conn.execute(sql.format(schema=name), params).fetchall()
+        if sort_key is not None:
+            rows.sort(key=sort_key, reverse=reverse)
+        if limit is not None:
+            rows = rows[:limit]
+    return rows if limit is None else rows[:limit]
+
+
+# Function to open a private read-only connection to the main database with a partition attached
+@contextmanager
+def _partition_connection(conn, path):
+    main = next(file for _, name, file in conn.execute("PRAGMA database_list") if name == 'main')
+    reader = sqlite3.connect(f"file:{pathname2url(main)}?mode=ro", uri=True, check_same_thread=False,
+                             factory=InstrumentedConnection)
+    try:
+        reader.execute("ATTACH DATABASE ? AS cold0", (f"file:{pathname2url(path)}?mode=ro",))
+        yield reader
+    finally:
+        reader.close()
+
+
+# Function to read a cursor chunk by chunk
+def _chunks(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+# Function to stream one query over the hot table and the relevant partitions
+def stream_stores(conn, sql, params=(), start=None, end=None, chunk_size=5000, sort_key=None, reverse=False,
+                  row_factory=sqlite3.Row):
+    """
+    Run a query against the hot Calls table and every partition overlapping [start, end), and yield
+    its rows in chunks read with fetchmany, so that memory stays bounded however many rows match.
+
+    The hot table is read through conn. Each partition is read, after the hot table's statement has
+    started, through a private read-only connection to the main database with only that partition
+    attached (as "cold0"), so queries can still join the main lookup tables and no DETACH is needed
+    while conn has a statement open. Rows written while the stream is read may or may not appear.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database, kept busy until the
+      generator is exhausted or closed.
+    - sql (str): The query, where "{schema}" stands for the database ("main" or "cold0").
+    - params (sequence, optional): The query parameters.
+    - start (int, optional): Epoch lower bound used to prune partitions.
+    - end (int, optional): Epoch upper bound (exclusive) used to prune partitions.
+    - chunk_size (int, optional): Maximum rows per chunk. Defaults to 5000.
+    - sort_key (callable, optional): The order of the query's rows in every store. The hot rows are
+      then merged with the partition rows (read newest month first) in that order. Defaults to
+      yielding the hot rows, then each partition's.
+    - reverse (bool, optional): The rows are in descending order of sort_key. Defaults to False.
+    - row_factory (callable, optional): Row factory of the cursors, None for plain tuples. Defaults
+      to sqlite3.Row.
+
+    Yields:
+    - list: Up to chunk_size rows.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    stores = partitions(conn, start, end)
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory
+    hot = _chunks(cursor.execute(sql.format(schema='main'), params), chunk_size)
+
+    def cold():
+        for _, path, _, _, _ in stores:
+            with _partition_connection(conn, path) as reader:
+                cursor = reader.cursor()
+                cursor.row_factory = row_factory
+                yield from _chunks(cursor.execute(sql.format(schema='cold0'), params), chunk_size)
+
+    if not stores:
+        yield from hot
+    elif sort_key is None:
+        yield from itertools.chain(hot, cold())
+    else:
+        # Partitions hold disjoint months, so only the hot rows need merging with them
+        merged = heapq.merge(itertools.chain.from_iterable(hot), itertools.chain.from_iterable(cold()),
+                             key=sort_key, reverse=reverse)
+        while True:
+            rows = list(itertools.islice(merged, chunk_size))
+            if not rows:
+                return
+            yield rows
+
+
+# Function to run a dashboard aggregate over hot and cold calls
+def aggregate(conn, sql, params=(), start=None, end=None, where=None, where_params=()):
+    """
+    Run a GROUP BY ... COUNT(*) query over the calls in [start, end), hot and archived.
+
+    The query is written against a table named Calls, exactly like the aggregates in
+    rollups.ROLLUPS. It is run with Calls bound (through a CTE) to the hot table plus the
+    partitions that overlap the time range, at most MAX_ATTACHED partitions at a time, and the
+    counts of each group are summed. Partitions outside the range are never opened.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database.
+    - sql (str): The aggregate query. Its last column must be the count.
+    - params (sequence, optional): The query parameters.
+    - start (int, optional): Epoch lower bound (inclusive). Defaults to no bound.
+    - end (int, optional): Epoch upper bound (exclusive). Defaults to no bound.
+    - where (str, optional): An extra condition on the Calls columns, e.g. "jurisdiction_id = ?".
+    - where_params (sequence, optional): The parameters of that condition.
+
+    Returns:
+    - list of tuple: One (key..., count) tuple per group.
+    """
+    bounds, bound_params = ([where], list(where_params)) if where else ([], [])
+    if start is not None:
+        bounds.append("call_epoch >= ?")
+        bound_params.append(start)
+    if end is not None:
+        bounds.append("call_epoch < ?")
+        bound_params.append(end)
+    where = f" WHERE {' AND '.join(bounds)}" if bounds else ""
+    columns = ', '.join(ARCHIVE_COLUMNS)
+
+    cold = [path for _, path, _, _, _ in partitions(conn, start, end)]
+    if not cold:
+        if not bounds:
+            return [tuple(row) for row in conn.execute(sql, params)]
+        cte = f"WITH Calls AS (SELECT {columns} FROM main.Calls{where}) "
+        return [tuple(row) for row in conn.execute(cte + sql, list(bound_params) + list(params))]
+
+    totals = {}
+
+    def add(rows):
+        for row in rows:
+            key = tuple(row[:-1])
+            totals[key] = totals.get(key, 0) + row[-1]
+
+    if conn.in_transaction:
+        # Nothing can be attached inside a transaction (e.g. a migration): read the hot table here
+        # and each partition through a private read-only connection, which sees the committed
+        # lookup tables. Partitions are only written by archive_calls, outside of transactions.
+        add(conn.execute(f"WITH Calls AS (SELECT {columns} FROM main.Calls{where}) " + sql,
+                         list(bound_params) + list(params)))
+        for path in cold:
+            with _partition_connection(conn, path) as reader:
+                add(reader.execute(f"WITH Calls AS (SELECT {columns} FROM cold0.Calls{where}) " + sql,
+                                   list(bound_params) + list(params)))
+        return [key + (count,) for key, count in totals.items()]
+
+    groups = [cold[i:i + MAX_ATTACHED] for i in range(0, len(cold), MAX_ATTACHED)]
+    for index, group in enumerate(groups):
+        with attached(conn, group) as names:
+            schemas = (['main'] if index == 0 else []) + names  # The hot table is read once
+            branches = [f"SELECT {columns} FROM {schema}.Calls{where}" for schema in schemas]
+            cte = f"WITH Calls AS ({' UNION ALL '.join(branches)}) "
+            add(conn.execute(cte + sql, list(bound_params) * len(branches) + list(params)))
+    return [key + (count,) for key, count in totals.items()]
+
+
+# Function to move old calls to the monthly partitions
+def archive_calls(conn, horizon_days=90, now=None, archive_dir='archive'):
+    """
+    Move the calls older than the horizon into monthly partition databases.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database, outside of a transaction.
+    - horizon_days (float, optional): Calls older than this many days are archived. Defaults to 90.
+    - now (int, optional): The current epoch. Defaults to the current time.
+    - archive_dir (str, optional): Partition directory, relative to the main database's directory.
+      Defaults to 'archive'.
+
+    Returns:
+    - dict: archived (number of calls moved), months (list of the months written) and elapsed seconds.
+    """
+    started = time.perf_counter()
+    cutoff = int((time.time() if now is None else now) - horizon_days * 86400)
+    summary = {'archived': 0, 'months': [], 'elapsed': 0.0}
+
+    oldest = conn.execute("SELECT MIN(call_epoch) FROM Calls WHERE call_epoch IS NOT NULL").fetchone()[0]
+    if oldest is None or oldest >= cutoff:
+        summary['elapsed'] = time.perf_counter() - started
+        return summary
+
+    base = _base_dir(conn)
+    os.makedirs(os.path.join(base, archive_dir), exist_ok=True)
+    columns = ', '.join(ARCHIVE_COLUMNS)
+
+    for month, month_start, month_end in _months(oldest, cutoff):
+        upper = min(month_end, cutoff)
+        if not conn.execute("SELECT 1 FROM Calls WHERE call_epoch >= ? AND call_epoch < ? LIMIT 1",
+                            (month_start, upper)).fetchone():
+            continue
+
+        relative_path = os.path.join(archive_dir, f"calls_{month.replace('-', '_')}.db")
+        with attached(conn, [os.path.join(base, relative_path)]) as (name,):
+            for statement in PARTITION_SCHEMA:
+                conn.execute(statement.format(schema=name))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                first_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {name}.Calls").fetchone()[0]
+                conn.execute(f"INSERT OR IGNORE INTO {name}.Calls ({columns}) SELECT {columns} FROM main.Calls "
+                             "WHERE call_epoch >= ? AND call_epoch < ?", (month_start, upper))
+                conn.execute(f"INSERT INTO {name}.Calls_FTS (rowid, description) "
+                             f"SELECT rowid, description FROM {name}.Calls WHERE rowid > ?", (first_rowid,))
+
+                conn.execute("INSERT INTO Maintenance_Flags (name) VALUES ('archiving')")
+                moved = conn.execute("DELETE FROM main.Calls WHERE call_epoch >= ? AND call_epoch < ?",
+                                     (month_start, upper)).rowcount
+                conn.execute("DELETE FROM Maintenance_Flags WHERE name = 'archiving'")
+
+                row_count = conn.execute(f"SELECT COUNT(*) FROM {name}.Calls").fetchone()[0]
+                conn.execute("""
+                    INSERT INTO Archive_Partitions (month, path, start_epoch, end_epoch, row_count, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(month) DO UPDATE SET row_count = excluded.row_count, archived_at = excluded.archived_at
+                """, (month, relative_path, month_start, month_end, row_count, int(time.time())))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        summary['archived'] += moved
+        summary['months'].append(month)
+
+    summary['elapsed'] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH, ConnectionPool
+
+    parser = argparse.ArgumentParser(description="Move old calls into monthly archive databases.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--horizon-days', type=float, default=90,
+                        help="Archive calls older than this many days (default: %(default)s).")
+    parser.add_argument('--list', action='store_true', help="List the archive partitions instead.")
+    args = parser.parse_args(argv)
+
+    conn = ConnectionPool(args.db, pool_size=1).open_connection()  # Applies PRAGMAs and migrations
+    try:
+        if args.list:
+            for month, path, _, _, count in partitions(conn):
+                print(f"{month}: {count:>10,} calls  {path}")
+        else:
+            summary = archive_calls(conn, horizon_days=args.horizon_days)
+            print(f"Archived {summary['archived']:,} calls into {len(summary['months'])} partitions "
+                  f"in {summary['elapsed']:.1f} s.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
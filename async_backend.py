@@ -0,0 +1,254 @@
+"""
+asyncio interface to the incident backend, for services such as an async HTTP intake API.
+
+SQLite allows a single writer at a time, so instead of letting every coroutine open its own
+write transaction (and fail with "database is locked" under load), all writes are queued to one
+writer thread that owns one connection. The writer drains whatever is waiting in the queue and
+commits it as a single transaction (a group commit): the more concurrent writers, the more writes
+share each commit, so throughput grows with concurrency instead of collapsing. Each write runs in
+its own SAVEPOINT, so one failing write (e.g. a duplicate call_key) only fails its own caller.
+
+Reads run the regular backend.py functions on a thread pool, over the shared connection pool and
+query cache. Both sides use the database of the shared pool (see db.configure()).
+
+Usage:
+    async with AsyncBackend() as backend:
+        call_key = await backend.create_incident(priority="High", description="HIT AND RUN")
+        incidents = await backend.search_incident(description="hit and run", limit=20)
+"""
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import backend
+from db import get_pool
+
+_STOP = object()  # Queued by close() to stop the writer thread
+
+
+# Function to insert one incident on the writer connection
+def _create_operation(conn, params):
+    conn.execute(backend.INSERT_CALL_SQL, params)
+    return params[0]
+
+
+# Function to hand a result over to the event loop that is waiting for it
+def _resolve(future, result, error):
+    if future.done():  # The caller was cancelled
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class AsyncBackend:
+    """
+    Coroutine versions of the backend.py functions with a single, group-committing writer thread.
+
+    Parameters:
+    - readers (int, optional): Number of threads running reads. Defaults to 4; keep it at most the
+      shared pool's pool_size.
+    - max_batch (int, optional): Maximum number of writes committed together. Defaults to 512.
+    """
+
+    def __init__(self, readers=4, max_batch=512):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1.")
+
+        self.max_batch = max_batch
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='incident-reader')
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {'writes': 0, 'failed_writes': 0, 'batches': 0, 'largest_batch': 0}
+        self._conn = get_pool().open_connection()  # Owned by the writer thread from now on
+        self._conn.isolation_level = None  # Transactions are managed explicitly by the writer
+        self._writer = threading.Thread(target=self._run_writer, name='incident-writer', daemon=True)
+        self._writer.start()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Writer side
+
+    def _run_writer(self):
+        conn = self._conn
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # Group every write that queued up while the previous batch was being committed
+                while batch[-1] is not _STOP and len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is _STOP
+                if stop:
+                    batch.pop()
+                if batch:
+                    self._commit_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, args, future, loop in batch:
+                conn.execute("SAVEPOINT write_operation")
+                try:
+                    result = operation(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_operation")
+                    conn.execute("RELEASE write_operation")
+                    outcomes.append((future, loop, None, e))
+                else:
+                    conn.execute("RELEASE write_operation")
+                    outcomes.append((future, loop, result, None))
+            conn.execute("COMMIT")
+        except Exception as e:  # The transaction itself failed: so did every write in it
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, loop, None, e) for _, _, future, loop in batch]
+
+        failed = sum(1 for outcome in outcomes if outcome[3] is not None)
+        with self._lock:
+            self._stats['writes'] += len(outcomes) - failed
+            self._stats['failed_writes'] += failed
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+
+        for future, loop, result, error in outcomes:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:
+                pass  # The caller's event loop is already closed
+
+    async def _write(self, operation, *args):
+        if self._closed:
+            raise RuntimeError("The async backend has been closed.")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((operation, args, future, loop))
+        return await future
+
+    async def _read(self, function, *args, **kwargs):
+        if self._closed:
+            raise RuntimeError("The async backend has been closed.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(function, *args, **kwargs))
+
+    # Writes
+
+    async def create_incident(self, call_key=None, record_id=None, call_date_time=None, priority=None,
+                              description=None, call_number=None, incident_location_id=None,
+                              reporter_location_id=None, jurisdiction_id=None):
+        """
+        Create a new incident (see backend.create_incident()). Concurrent calls share commits.
+
+        Raises:
+        - sqlite3.IntegrityError: If the call_key already exists.
+
+        Returns:
+        - str: The generated or provided call_key.
+        """
+        params = backend._incident_params(
+            (call_key, record_id, call_date_time, priority, description, call_number, incident_location_id,
+             reporter_location_id, jurisdiction_id), generate_call_keys=True)
+        return await self._write(_create_operation, params)
+
+    async def update_incident(self, call_key, priority=None, description=None, call_date_time=None):
+        """
+        Update an incident (see backend.update_incident()).
+
+        Raises:
+        - ValueError: If no fields (priority, description, or call_date_time) are provided to update, or
+          the incident is archived.
+
+        Returns:
+        - int: The number of incidents updated (0 if the call_key does not exist).
+        """
+        updated = await self._write(backend._update_incident, call_key, priority, description, call_date_time)
+        if not updated:
+            await self._read(backend._check_not_archived, call_key)
+        return updated
+
+    async def delete_incident(self, call_key):
+        """
+        Delete an incident (see backend.delete_incident()).
+
+        Raises:
+        - ValueError: If the incident is archived.
+
+        Returns:
+        - int: The number of incidents deleted (0 if the call_key does not exist).
+        """
+        deleted = await self._write(backend._delete_incident, call_key)
+        if not deleted:
+            await self._read(backend._check_not_archived, call_key)
+        return deleted
+
+    # Reads
+
+    async def read_incidents(self):
+        """
+        Fetch the latest 10 incidents (see backend.read_incidents()).
+
+        Returns:
+        - list of sqlite3.Row: The latest 10 incidents.
+        """
+        return await self._read(backend.read_incidents)
+
+    async def list_incidents(self, **kwargs):
+        """
+        Fetch one page of incidents (see backend.list_incidents() for the arguments).
+
+        Returns:
+        - tuple: (list of sqlite3.Row, next_cursor).
+        """
+        return await self._read(backend.list_incidents, **kwargs)
+
+    async def search_incident(self, **kwargs):
+        """
+        Search for incidents (see backend.search_incident() for the arguments).
+
+        Returns:
+        - list of sqlite3.Row: The matching incidents.
+        """
+        return await self._read(backend.search_incident, **kwargs)
+
+    # Lifecycle
+
+    def stats(self):
+        """
+        Return the writer's counters.
+
+        Returns:
+        - dict: writes, failed_writes, batches (commits), largest_batch, queued (writes waiting) and
+          writes_per_batch.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        stats['writes_per_batch'] = (stats['writes'] + stats['failed_writes']) / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    async def close(self):
+        """
+        Finish the queued writes, then stop the writer thread and the reader threads.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.join)
+        self._readers.shutdown(wait=True)
@@ -1,6 +1,34 @@
+import base64
+import itertools
+import json
+import math
 import sqlite3
+import time
 import uuid
 
+import archive
+import changelog
+import export
+import geo
+import records
+from db import connection, transaction
+from fulltext import fts_query
+from query_cache import cached
+from records import INCIDENT_FIELDS
+from schema import CALL_COLUMNS
+from timestamps import to_epoch
+
+# call_epoch is derived from call_date_time on every write (see timestamps.to_epoch)
+INSERT_CALL_SQL = """
+    INSERT INTO Calls (call_key, record_id, call_date_time, priority, description, call_number, 
+                       incident_location_id, reporter_location_id, jurisdiction_id, call_epoch)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Unfiltered time windows longer than this (in seconds) are counted per location on the location
+# index by incident_grid(); shorter ones on the call_epoch index
+GRID_INDEX_WINDOW = 3 * 24 * 3600
+
 # Function to generate a unique call_key
 def generate_unique_call_key():
     """
@@ -38,42 +66,703 @@ def create_incident(call_key=None, record_id=None, call_date_time=None, priority
     if not call_key:
         call_key = generate_unique_call_key()
 
-    with sqlite3.connect('database/911_Call_Data.db') as conn:
-        conn.row_factory = sqlite3.Row  # Ensure we can access columns by name
+    with transaction() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Calls (call_key, record_id, call_date_time, priority, description, call_number, 
-                               incident_location_id, reporter_location_id, jurisdiction_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (call_key, record_id, call_date_time, priority, description, call_number, incident_location_id, 
-              reporter_location_id, jurisdiction_id))
-        
-        conn.commit()  # Save changes to the database
+        cursor.execute(INSERT_CALL_SQL, (call_key, record_id, call_date_time, priority, description, call_number, incident_location_id, 
+              reporter_location_id, jurisdiction_id, to_epoch(call_date_time)))
     
     return call_key  # Return the generated or provided call_key
 
+# Function to turn one incident (dict or tuple) into an INSERT parameter tuple
+def _incident_params(incident, generate_call_keys):
+    """
+    Normalize an incident given as a dict or a tuple into a tuple ordered like CALL_COLUMNS.
+
+    Parameters:
+    - incident (dict or tuple): The incident. Tuples follow create_incident's positional order;
+      a tuple without the leading call_key (8 values) is also accepted.
+    - generate_call_keys (bool): Whether to generate a call_key when it is missing.
+
+    Raises:
+    - ValueError: If the incident has the wrong shape or no call_key can be determined.
+
+    Returns:
+    - tuple: The values for INSERT_CALL_SQL, including the derived call_epoch.
+    """
+    if isinstance(incident, dict):
+        unknown = set(incident) - set(CALL_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown incident fields: {', '.join(sorted(unknown))}")
+        values = [incident.get(column) for column in CALL_COLUMNS]
+    else:
+        values = list(incident)
+        if len(values) == len(CALL_COLUMNS) - 1:
+            values.insert(0, None)  # Tuple without a call_key
+        if len(values) != len(CALL_COLUMNS):
+            raise ValueError(f"Expected {len(CALL_COLUMNS)} values per incident, got {len(values)}.")
+
+    if not values[0]:
+        if not generate_call_keys:
+            raise ValueError("Incident has no call_key and call_key generation is disabled.")
+        values[0] = generate_unique_call_key()
+    values.append(to_epoch(values[2]))
+    return tuple(values)
+
+# Create Many Incidents (Batched Insert)
+def create_incidents_many(incidents, chunk_size=5000, generate_call_keys=True):
+    """
+    Insert many incidents into the Calls table using batched transactions.
+
+    Incidents are consumed lazily from any iterable (a list, a generator, a CSV reader...) and
+    written with executemany, one transaction per chunk, so the database is synced once per chunk
+    instead of once per incident. If a chunk contains a bad row (e.g. a duplicate call_key), the
+    chunk is rolled back and retried row by row so that every other row is still inserted and the
+    bad rows are reported instead of aborting the batch.
+
+    Parameters:
+    - incidents (iterable): Incidents as dicts keyed by Calls column names, or tuples in
+      create_incident's positional order.
+    - chunk_size (int, optional): Number of incidents written per transaction. Defaults to 5000.
+    - generate_call_keys (bool, optional): Generate a call_key for incidents that do not have one.
+      Defaults to True.
+
+    Raises:
+    - ValueError: If chunk_size is smaller than 1.
+
+    Returns:
+    - dict: A summary with the keys:
+        - inserted (int): Number of rows inserted.
+        - failed (int): Number of rows that could not be inserted.
+        - errors (list of tuple): (position in the input, call_key, error message) for each failed row.
+        - chunks (int): Number of transactions committed.
+        - elapsed (float): Wall-clock seconds spent.
+        - rows_per_sec (float): Inserted rows per second.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    summary = {'inserted': 0, 'failed': 0, 'errors': [], 'chunks': 0}
+    started = time.perf_counter()
+    iterator = iter(incidents)
+    position = 0
+
+    while True:
+        batch = list(itertools.islice(iterator, chunk_size))
+        if not batch:
+            break
+
+        rows = []  # (position, params) for the rows that are well-formed
+        for offset, incident in enumerate(batch):
+            try:
+                rows.append((position + offset, _incident_params(incident, generate_call_keys)))
+            except (ValueError, TypeError) as e:
+                call_key = incident.get('call_key') if isinstance(incident, dict) else None
+                summary['errors'].append((position + offset, call_key, str(e)))
+        position += len(batch)
+
+        with transaction() as conn:
+            try:
+                conn.executemany(INSERT_CALL_SQL, [params for _, params in rows])
+                summary['inserted'] += len(rows)
+            except sqlite3.DatabaseError:
+                # Discard the partial chunk and insert row by row to isolate the bad rows
+                conn.rollback()
+                for row_position, params in rows:
+                    try:
+                        conn.execute(INSERT_CALL_SQL, params)
+                        summary['inserted'] += 1
+                    except sqlite3.DatabaseError as e:
+                        summary['errors'].append((row_position, params[0], str(e)))
+        summary['chunks'] += 1
+
+    summary['errors'].sort(key=lambda error: error[0])
+    summary['failed'] = len(summary['errors'])
+    summary['elapsed'] = time.perf_counter() - started
+    summary['rows_per_sec'] = summary['inserted'] / summary['elapsed'] if summary['elapsed'] > 0 else 0.0
+    return summary
+
+# Function to build the WHERE clauses shared by the listing and search functions
+def _call_filters(priority=None, jurisdiction_id=None, start=None, end=None):
+    """
+    Build SQL conditions on Calls for the common incident filters.
+
+    Parameters:
+    - priority (str or list of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time (see timestamps.to_epoch).
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+
+    Raises:
+    - ValueError: If start or end cannot be parsed as a time.
+
+    Returns:
+    - tuple: (list of SQL conditions, list of parameters).
+    """
+    clauses, params = [], []
+    if priority:
+        priorities = [priority] if isinstance(priority, str) else list(priority)
+        clauses.append(f"priority IN ({', '.join('?' * len(priorities))})")
+        params.extend(priorities)
+    if jurisdiction_id is not None:
+        clauses.append("jurisdiction_id = ?")
+        params.append(jurisdiction_id)
+    for value, condition in ((start, "call_epoch >= ?"), (end, "call_epoch < ?")):
+        if value is not None:
+            epoch = to_epoch(value)
+            if epoch is None:
+                raise ValueError(f"Invalid time filter: {value!r}")
+            clauses.append(condition)
+            params.append(epoch)
+    return clauses, params
+
+# Function to convert the start/end filters to epochs, for pruning archive partitions
+def _epoch_bounds(start=None, end=None):
+    return (None if start is None else to_epoch(start)), (None if end is None else to_epoch(end))
+
+# Sort key of the listing order (with reverse=True): newest first, then calls without a time by call_key
+def _newest_first(row):
+    return (row['call_epoch'] is not None, row['call_epoch'] or 0, row['call_key'])
+
+# Function to encode a pagination cursor
+def encode_cursor(call_epoch, call_key):
+    """
+    Encode the position of an incident in the listing order as an opaque, URL-safe token.
+
+    Parameters:
+    - call_epoch (int or None): The incident's call_epoch.
+    - call_key (str): The incident's call_key.
+
+    Returns:
+    - str: The cursor token.
+    """
+    return base64.urlsafe_b64encode(json.dumps([call_epoch, call_key]).encode()).decode()
+
+# Function to decode a pagination cursor
+def decode_cursor(cursor):
+    """
+    Decode a token produced by encode_cursor().
+
+    Parameters:
+    - cursor (str): The cursor token.
+
+    Raises:
+    - ValueError: If the token is malformed.
+
+    Returns:
+    - tuple: (call_epoch, call_key).
+    """
+    try:
+        call_epoch, call_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+    if not isinstance(call_key, str) or not (call_epoch is None or isinstance(call_epoch, int)):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return call_epoch, call_key
+
+# List Incidents (Keyset Pagination, Newest First)
+@cached()
+def list_incidents(page_size=10, cursor=None, priority=None, jurisdiction_id=None, start=None, end=None, shape='row'):
+    """
+    Fetch one page of incidents, newest first, using keyset pagination.
+
+    Incidents are ordered by (call_epoch, call_key) descending; calls without a parseable time
+    come last, ordered by call_key. Instead of an OFFSET, each page seeks past the last incident
+    of the previous page through the (..., call_epoch, call_key) indexes, so page 1000 costs the
+    same as page 1 and rows inserted meanwhile never shift or repeat later pages. Archived calls
+    are listed too: pages continue into the monthly partitions that the page can reach (see archive.py).
+
+    Parameters:
+    - page_size (int, optional): Number of incidents per page. Defaults to 10.
+    - cursor (str, optional): The next_cursor returned with the previous page. None for the first page.
+    - priority (str or list of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time.
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+    - shape (str, optional): 'row', 'incident', 'numpy' or 'arrow' (see records.py). Defaults to 'row'.
+
+    Raises:
+    - ValueError: If page_size is smaller than 1, the shape is unknown, or the cursor or a time
+      filter is invalid.
+
+    Returns:
+    - tuple: (page, next_cursor). The page is a list of sqlite3.Row (or Incident), or one batch
+      for the 'numpy' and 'arrow' shapes. next_cursor is None on the last page. Pass the same
+      filters with the cursor to get the next page.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1.")
+    records.check_shape(shape)
+
+    filters, filter_params = _call_filters(priority, jurisdiction_id, start, end)
+    start_epoch, end_epoch = _epoch_bounds(start, end)
+    after_epoch, after_key = decode_cursor(cursor) if cursor else (None, None)
+    limit = page_size + 1  # One extra row tells whether there is a next page
+    incidents = []
+
+    with connection() as conn:
+        # Calls with a time, unless the cursor is already past them
+        if cursor is None or after_epoch is not None:
+            clauses = ["call_epoch IS NOT NULL"] + filters
+            params = list(filter_params)
+            upper = end_epoch
+            if cursor is not None:
+                clauses.append("(call_epoch, call_key) < (?, ?)")
+                params.extend([after_epoch, after_key])
+                upper = after_epoch + 1 if upper is None else min(upper, after_epoch + 1)
+            incidents += archive.query_stores(
+                conn, f"SELECT * FROM {{schema}}.Calls WHERE {' AND '.join(clauses)} "
+                "ORDER BY call_epoch DESC, call_key DESC LIMIT ?", params + [limit], start=start_epoch, end=upper,
+                sort_key=_newest_first, reverse=True, limit=limit, epoch_ordered=True)
+
+        # Then the calls without a time, which a time window excludes (they are never archived)
+        if len(incidents) < limit and start is None and end is None:
+            clauses = ["call_epoch IS NULL"] + filters
+            params = list(filter_params)
+            if after_epoch is None and after_key is not None:
+                clauses.append("call_key < ?")
+                params.append(after_key)
+            incidents += conn.execute(
+                f"SELECT * FROM Calls WHERE {' AND '.join(clauses)} "
+                "ORDER BY call_key DESC LIMIT ?", params + [limit - len(incidents)]).fetchall()
+
+    if len(incidents) <= page_size:
+        return records.convert(incidents, shape), None
+    incidents = incidents[:page_size]
+    last = incidents[-1]
+    return records.convert(incidents, shape), encode_cursor(last['call_epoch'], last['call_key'])
+
 # Read the latest 10 Incidents (Fetch Latest 10 Incidents)
-def read_incidents():
+def read_incidents(shape='row'):
     """
     Fetch the latest 10 incidents from the database.
 
-    This function fetches the latest 10 incidents from the Calls table in the database, ordered by call_date_time in descending order (newest first).
+    This function returns the first page of list_incidents(): the latest 10 incidents from the Calls table, ordered by call time (the indexed call_epoch column) in descending order (newest first).
+    Results are served from the shared query cache until the data changes (see query_cache.py).
+
+    Parameters:
+    - shape (str, optional): 'row', 'incident', 'numpy' or 'arrow' (see records.py). Defaults to 'row'.
 
     Returns:
         list of sqlite3.Row: A list of the latest 10 incidents, where each incident is a dictionary-like object with column names as keys.
+        With another shape, the incidents in that shape.
     """
-    
-    with sqlite3.connect('database/911_Call_Data.db') as conn:
-        conn.row_factory = sqlite3.Row  # Ensure we can access columns by name
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM Calls
-            ORDER BY call_date_time DESC
-            LIMIT 10
-        ''')
-        incidents = cursor.fetchall()  # Fetch the latest 10 incidents
+    incidents, _ = list_incidents(page_size=10, shape=shape)
     return incidents
 
+# Function to stream every incident matching filters
+def iter_incidents(priority=None, jurisdiction_id=None, start=None, end=None, shape='incident', chunk_size=5000,
+                   ordered=True):
+    """
+    Stream the incidents matching the filters, hot and archived, without loading them all.
+
+    Rows are read with fetchmany, chunk_size at a time, and handed over before the next chunk is
+    read, so memory stays flat however many incidents match (e.g. to export a million of them).
+    A pooled connection is held until the generator is exhausted or closed.
+
+    Parameters:
+    - priority (str or list of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time.
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+    - shape (str, optional): 'incident' or 'row' to yield one object per incident, 'numpy' or
+      'arrow' to yield one batch per chunk (see records.py). Defaults to 'incident'.
+    - chunk_size (int, optional): Incidents read per fetchmany (and per batch). Defaults to 5000.
+    - ordered (bool, optional): Newest first, like list_incidents(). Unordered streams read the
+      table in storage order, which is faster for whole-table exports. Defaults to True.
+
+    Raises:
+    - ValueError: If chunk_size is smaller than 1, the shape is unknown or a time filter is invalid.
+
+    Yields:
+    - Incident, sqlite3.Row, dict of numpy.ndarray or pyarrow.RecordBatch: Depending on the shape.
+    """
+    records.check_shape(shape)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    clauses, params = _call_filters(priority, jurisdiction_id, start, end)
+    query = f"SELECT {', '.join(INCIDENT_FIELDS)} FROM {{schema}}.Calls"
+    if clauses:
+        query += f" WHERE {' AND '.join(clauses)}"
+    if ordered:
+        query += " ORDER BY call_epoch DESC, call_key DESC"
+    epoch = INCIDENT_FIELDS.index('call_epoch')
+    start_epoch, end_epoch = _epoch_bounds(start, end)
+
+    with connection() as conn:
+        chunks = archive.stream_stores(
+            conn, query, params, start=start_epoch, end=end_epoch, chunk_size=chunk_size,
+            sort_key=(lambda row: (row[epoch] is not None, row[epoch] or 0, row[0])) if ordered else None,
+            reverse=True, row_factory=sqlite3.Row if shape == 'row' else None)
+        try:
+            for chunk in chunks:
+                if shape in records.BATCH_SHAPES:
+                    yield records.convert(chunk, shape)
+                else:
+                    yield from records.convert(chunk, shape)
+        finally:
+            chunks.close()  # Closes the partition connections of an abandoned stream
+
+# Live feed: the incidents changed since a watermark
+@cached()
+def incident_changes(since=None, priority=None, jurisdiction_id=None, page_size=50, max_changes=500, shape='row'):
+    """
+    Return what changed on a live incident board since its last poll.
+
+    The watermark is the seq of the change log (see changelog.py). The first poll (since=None)
+    returns the newest page of incidents and the current watermark; each later poll passes the
+    watermark it got back and only reads the changes logged after it, so its cost grows with the
+    number of new or updated calls, not with the size of the table or of the board. Results are
+    served from the shared query cache until the next commit, so many screens polling at the same
+    watermark share one query.
+
+    Parameters:
+    - since (int, optional): The watermark returned by the previous poll. None for the first poll.
+    - priority (str or tuple of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - page_size (int, optional): Incidents returned by a first poll or a reset. Defaults to 50.
+    - max_changes (int, optional): Changes read per poll; the rest is left for the next poll. Defaults to 500.
+    - shape (str, optional): 'row', 'incident', 'numpy' or 'arrow' (see records.py). Defaults to 'row'.
+
+    Raises:
+    - ValueError: If max_changes is smaller than 1 or the shape is unknown.
+
+    Returns:
+    - dict: With the keys (shared with other callers, treat as read-only):
+        - watermark (int): The value to pass as `since` next time.
+        - reset (bool): True when `incidents` is a fresh page that replaces the board: on the first
+          poll, or when the changes after `since` have been pruned from the log.
+        - incidents: The new or updated incidents matching the filters, in the order of their
+          last change (newest first on a reset).
+        - removed (list of str): call_keys of incidents deleted or no longer matching the filters.
+        - more (bool): True if more changes are waiting; poll again right away.
+    """
+    if max_changes < 1:
+        raise ValueError("max_changes must be at least 1.")
+    records.check_shape(shape)
+
+    with connection() as conn:
+        watermark = changelog.last_seq(conn)
+        if since is not None and since >= watermark:  # Nothing new: one row read
+            return {'watermark': since, 'reset': False, 'incidents': records.convert([], shape), 'removed': [],
+                    'more': False}
+        if since is None or not changelog.has_changes_since(conn, since):
+            # Read the watermark first: changes landing during the page are delivered again next time
+            page, _ = list_incidents.uncached(page_size=page_size, priority=priority,
+                                              jurisdiction_id=jurisdiction_id, shape=shape)
+            return {'watermark': watermark, 'reset': True, 'incidents': page, 'removed': [], 'more': False}
+
+        changes = conn.execute("SELECT seq, call_key FROM Call_Changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                               (since, max_changes)).fetchall()
+        call_keys = list(dict.fromkeys(call_key for _, call_key in reversed(changes)))[::-1]  # By last change
+        clauses, params = _call_filters(priority, jurisdiction_id)
+        clauses.insert(0, "call_key IN (SELECT value FROM json_each(?))")
+        params.insert(0, json.dumps(call_keys))
+        rows = conn.execute(f"SELECT * FROM Calls WHERE {' AND '.join(clauses)}", params).fetchall()
+
+    by_key = {row['call_key']: row for row in rows}
+    return {'watermark': changes[-1][0] if changes else watermark, 'reset': False,
+            'incidents': records.convert([by_key[call_key] for call_key in call_keys if call_key in by_key], shape),
+            'removed': [call_key for call_key in call_keys if call_key not in by_key],
+            'more': len(changes) == max_changes}
+
+# Function to read the newest calls at a set of locations
+def _incidents_at(conn, location_ids, priority, jurisdiction_id, start, end, limit, shape):
+    clauses, params = _call_filters(priority, jurisdiction_id, start, end)
+    clauses.insert(0, "incident_location_id IN (SELECT value FROM json_each(?))")
+    params.insert(0, json.dumps(list(location_ids)))
+    where, order = " AND ".join(clauses), "ORDER BY call_epoch DESC, call_key DESC"
+    if limit is None:
+        query = f"SELECT * FROM {{schema}}.Calls WHERE {where} {order}"
+    else:
+        # Pick the newest rows on the covering (incident_location_id, call_epoch, call_key) index
+        # first, so only `limit` rows are read from the table however busy the locations are
+        query = (f"SELECT * FROM {{schema}}.Calls WHERE rowid IN "
+                 f"(SELECT rowid FROM {{schema}}.Calls WHERE {where} {order} LIMIT ?) {order}")
+        params.append(limit)
+    start_epoch, end_epoch = _epoch_bounds(start, end)
+    incidents = archive.query_stores(conn, query, params, start=start_epoch, end=end_epoch, sort_key=_newest_first,
+                                     reverse=True, limit=limit, epoch_ordered=True)
+    return records.convert(incidents, shape)
+
+# Spatial Search: incidents within a distance of a point
+@cached()
+def incidents_near(latitude, longitude, radius_m, priority=None, jurisdiction_id=None, start=None, end=None,
+                   limit=100, shape='row'):
+    """
+    Fetch the incidents whose incident location lies within a distance of a point, newest first.
+
+    The locations are found through the Locations_RTree spatial index (see geo.py) and their calls
+    through the (incident_location_id, call_epoch) index, so "calls near here in the last hour"
+    reads only those calls. Locations without coordinates are never matched; archived calls are
+    included for the partitions overlapping the time filters.
+
+    Parameters:
+    - latitude (float): Latitude of the point, in degrees.
+    - longitude (float): Longitude of the point, in degrees.
+    - radius_m (float): The distance in meters.
+    - priority (str or tuple of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time.
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+    - limit (int, optional): Maximum number of incidents to return. Defaults to 100; None for no limit.
+    - shape (str, optional): 'row', 'incident', 'numpy' or 'arrow' (see records.py). Defaults to 'row'.
+
+    Raises:
+    - ValueError: If the point or radius is invalid, or a time filter or the shape is unknown.
+
+    Returns:
+    - list of sqlite3.Row: The incidents, newest first (or a batch for the 'numpy' and 'arrow' shapes).
+    """
+    if not geo.valid_coordinates(latitude, longitude) or radius_m < 0:
+        raise ValueError(f"Invalid point or radius: ({latitude!r}, {longitude!r}), {radius_m!r} m.")
+    records.check_shape(shape)
+
+    with connection() as conn:
+        nearby = geo.locations_near(conn, latitude, longitude, radius_m)
+        return _incidents_at(conn, nearby, priority, jurisdiction_id, start, end, limit, shape)
+
+# Spatial Search: incidents inside a bounding box
+@cached()
+def incidents_in_bbox(south, west, north, east, priority=None, jurisdiction_id=None, start=None, end=None,
+                      limit=100, shape='row'):
+    """
+    Fetch the incidents whose incident location lies inside a latitude/longitude box, newest first.
+
+    Like incidents_near(), the locations are found through the Locations_RTree spatial index.
+
+    Parameters:
+    - south, west, north, east (float): The box, in degrees.
+    - priority (str or tuple of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time.
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+    - limit (int, optional): Maximum number of incidents to return. Defaults to 100; None for no limit.
+    - shape (str, optional): 'row', 'incident', 'numpy' or 'arrow' (see records.py). Defaults to 'row'.
+
+    Raises:
+    - ValueError: If the box is invalid, or a time filter or the shape is unknown.
+
+    Returns:
+    - list of sqlite3.Row: The incidents, newest first (or a batch for the 'numpy' and 'arrow' shapes).
+    """
+    if not (geo.valid_coordinates(south, west) and geo.valid_coordinates(north, east)) or south > north or west > east:
+        raise ValueError(f"Invalid bounding box: {(south, west, north, east)!r}.")
+    records.check_shape(shape)
+
+    with connection() as conn:
+        inside = [location_id for location_id, _, _ in geo.locations_in_bbox(conn, south, west, north, east)]
+        return _incidents_at(conn, inside, priority, jurisdiction_id, start, end, limit, shape)
+
+# Hot Spots: incident counts on a grid, for a heatmap
+@cached()
+def incident_grid(cell_m=250, bbox=None, priority=None, jurisdiction_id=None, start=None, end=None):
+    """
+    Count the incidents per cell of a square grid over their incident locations, for a heatmap.
+
+    Cells are cell_m meters high and about as wide (their width in degrees is scaled to the
+    latitude of the area). Without filters the counts come from the Rollup_Incident_Location
+    rollup; otherwise the calls are counted in SQLite over the time window, hot and archived. A
+    `bbox` restricts both to the locations the R*Tree finds inside it. Locations without
+    coordinates are left out.
+
+    Parameters:
+    - cell_m (float, optional): Height of a cell in meters. Defaults to 250.
+    - bbox (tuple, optional): (south, west, north, east) in degrees. Defaults to every location.
+    - priority (str or tuple of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Count only calls at or after this time.
+    - end (str, datetime or int, optional): Count only calls strictly before this time.
+
+    Raises:
+    - ValueError: If cell_m is not positive, or a time filter is invalid.
+
+    Returns:
+    - list of tuple: (latitude, longitude, count) per non-empty cell, with the coordinates of the
+      cell's center, largest count first.
+    """
+    if cell_m <= 0:
+        raise ValueError("cell_m must be positive.")
+    clauses, params = _call_filters(priority, jurisdiction_id)
+    start_epoch, end_epoch = _epoch_bounds(start, end)
+
+    with connection() as conn:
+        if bbox is not None:
+            south, west, north, east = bbox
+            source = "main.Locations_RTree R JOIN main.Locations L ON L.location_id = R.location_id"
+            condition = ("R.min_lat <= ? AND R.max_lat >= ? AND R.min_lon <= ? AND R.max_lon >= ? "
+                         "AND L.latitude BETWEEN ? AND ? AND L.longitude BETWEEN ? AND ?")
+            location_params = [north, south, east, west, south, north, west, east]
+        else:
+            source = "main.Locations L"
+            condition = "L.latitude IS NOT NULL AND L.longitude IS NOT NULL"
+            location_params = []
+        middle = conn.execute(f"SELECT (MIN(L.latitude) + MAX(L.latitude)) / 2 FROM {source} WHERE {condition}",
+                              location_params).fetchone()[0]
+        if middle is None:
+            return []  # No located location in the area
+        height = cell_m / geo.METERS_PER_DEGREE
+        width = height / max(math.cos(math.radians(middle)), 0.01)
+
+        # Cell indexes are offset to stay positive, so CAST truncates like floor()
+        cells = "CAST((L.latitude + 90) / ? AS INTEGER) AS cell_y, CAST((L.longitude + 180) / ? AS INTEGER) AS cell_x"
+        if not clauses and start is None and end is None:
+            # Whole history: the trigger-maintained counts per incident location (see rollups.py)
+            counts = conn.execute(f"SELECT {cells}, SUM(RI.count) FROM {source} "
+                                  f"JOIN Rollup_Incident_Location RI ON RI.location_id = L.location_id "
+                                  f"WHERE {condition} GROUP BY cell_y, cell_x", [height, width] + location_params)
+        else:
+            if bbox is not None:
+                # Few locations: read the calls of each one on the (incident_location_id, ...) index
+                sql = (f"SELECT {cells}, COUNT(*) FROM {source} JOIN Calls C ON C.incident_location_id = L.location_id "
+                       f"WHERE {condition} GROUP BY cell_y, cell_x")
+            else:
+                # Count per location first, then place the (far fewer) locations in cells. A long
+                # unfiltered window is best counted on the location index; otherwise the unary +
+                # keeps SQLite on the index of the filter or time window
+                window = (end_epoch or int(time.time())) - start_epoch if start_epoch is not None else None
+                group = "incident_location_id" if not clauses and (window is None or window > GRID_INDEX_WINDOW) \
+                    else "+incident_location_id"
+                sql = (f"SELECT {cells}, SUM(C.count) FROM {source} JOIN (SELECT incident_location_id, COUNT(*) "
+                       f"AS count FROM Calls GROUP BY {group}) C ON C.incident_location_id = L.location_id "
+                       f"WHERE {condition} GROUP BY cell_y, cell_x")
+            counts = archive.aggregate(conn, sql, [height, width] + location_params, start=start_epoch,
+                                       end=end_epoch, where=" AND ".join(clauses) or None, where_params=params)
+
+    cells = [((cell_y + 0.5) * height - 90, (cell_x + 0.5) * width - 180, count) for cell_y, cell_x, count in counts]
+    return sorted(cells, key=lambda cell: cell[2], reverse=True)
+
+# Function to export the incidents matching filters to a file
+def export_incidents(destination, format='csv', compression='default', priority=None, jurisdiction_id=None,
+                     start=None, end=None, description=None, ordered=False, chunk_size=5000, progress=None,
+                     count=False):
+    """
+    Export the incidents matching the filters, hot and archived, with the attributes of their
+    incident location, reporter location and jurisdiction (see export.EXPORT_FIELDS).
+
+    Rows are streamed from SQLite with fetchmany and written chunk by chunk, so memory stays flat
+    whatever the size of the export.
+
+    Parameters:
+    - destination (str or binary file object): The output path or an open binary file.
+    - format (str, optional): 'csv', 'ndjson' or 'parquet'. Defaults to 'csv'.
+    - compression (str, optional): gzip, bz2 or xz for CSV and NDJSON; snappy, zstd or gzip for
+      Parquet; None for no compression. Defaults to none for CSV/NDJSON and snappy for Parquet.
+    - priority (str or list of str, optional): Keep only these priorities.
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time.
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+    - description (str, optional): Full-text search of the description, as in search_incident().
+    - ordered (bool, optional): Export newest first instead of in storage order. Defaults to False.
+    - chunk_size (int, optional): Rows read and written at a time. Defaults to 5000.
+    - progress (callable, optional): Called after every chunk with (rows written, total rows or
+      None, elapsed seconds).
+    - count (bool, optional): Count the matching rows first, for the total passed to progress.
+      This scans them twice. Defaults to False.
+
+    Raises:
+    - ValueError: If the format, compression or a time filter is invalid.
+
+    Returns:
+    - dict: rows, total (rows matching when the export started, None unless counted), elapsed and
+      rows_per_sec.
+    """
+    started = time.perf_counter()
+    clauses, params = _call_filters(priority, jurisdiction_id, start, end)
+    if description is not None:
+        match = fts_query(description)
+        calls = ("SELECT H.* FROM {schema}.Calls_FTS F JOIN {schema}.Calls H ON H.rowid = F.rowid "
+                 f"WHERE {' AND '.join(['F.Calls_FTS MATCH ?'] + clauses)}")
+        params.insert(0, match)
+    else:
+        match = None
+        calls = "SELECT * FROM {schema}.Calls" + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+    query = export.EXPORT_SELECT.format(calls=calls)
+    if ordered:
+        query += " ORDER BY C.call_epoch DESC, C.call_key DESC"
+    epoch = INCIDENT_FIELDS.index('call_epoch')
+    start_epoch, end_epoch = _epoch_bounds(start, end)
+
+    with export.ExportWriter(destination, format, compression) as writer:
+        if description is not None and match is None:
+            total = 0  # Nothing searchable in the text
+        else:
+            with connection() as conn:
+                total = sum(row[0] for row in archive.query_stores(
+                    conn, f"SELECT COUNT(*) FROM ({calls})", params, start=start_epoch, end=end_epoch)) if count else None
+                chunks = archive.stream_stores(
+                    conn, query, params, start=start_epoch, end=end_epoch, chunk_size=chunk_size,
+                    sort_key=(lambda row: (row[epoch] is not None, row[epoch] or 0, row[0])) if ordered else None,
+                    reverse=True, row_factory=None)
+                for chunk in chunks:
+                    writer.write(chunk)
+                    if progress is not None:
+                        progress(writer.rows, total, time.perf_counter() - started)
+        rows = writer.rows
+
+    elapsed = time.perf_counter() - started
+    return {'rows': rows, 'total': total, 'elapsed': elapsed, 'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0}
+
+# Function to build the SET clause of an incident update
+def _update_assignments(priority=None, description=None, call_date_time=None):
+    """
+    Build the assignments for an UPDATE of Calls, keeping call_epoch in step with call_date_time.
+
+    Raises:
+    - ValueError: If no fields (priority, description, or call_date_time) are provided to update.
+
+    Returns:
+    - tuple: (list of "column = ?" assignments, list of values).
+    """
+    update_parts = []
+    update_values = []
+
+    if priority:
+        update_parts.append("priority = ?")
+        update_values.append(priority)
+    if description:
+        update_parts.append("description = ?")
+        update_values.append(description)
+    if call_date_time:
+        update_parts.append("call_date_time = ?")
+        update_values.append(call_date_time)
+        update_parts.append("call_epoch = ?")
+        update_values.append(to_epoch(call_date_time))
+
+    if not update_parts:
+        raise ValueError("At least one field (priority, description, or call_date_time) must be provided to update.")
+    return update_parts, update_values
+
+# Function to run an incident update on an open connection
+def _update_incident(conn, call_key, priority=None, description=None, call_date_time=None):
+    """
+    Execute update_incident()'s UPDATE on `conn` without committing (see update_incident()).
+
+    Returns:
+    - int: The number of rows updated (0 or 1).
+    """
+    update_parts, update_values = _update_assignments(priority, description, call_date_time)
+    query = "UPDATE Calls SET " + ", ".join(update_parts) + " WHERE call_key = ?"
+    update_values.append(call_key)
+
+    return conn.execute(query, tuple(update_values)).rowcount
+
+# Function to refuse a write to an archived call
+def _check_not_archived(call_key):
+    """
+    Raise if a call that a write did not find is in an archive partition.
+
+    Parameters:
+    - call_key (str): The call the write did not find in Calls.
+
+    Raises:
+    - ValueError: If the call is archived: partitions are read-only.
+    """
+    with connection() as conn:
+        archived = archive.query_stores(conn, "SELECT 1 FROM {schema}.Calls WHERE call_key = ?", (call_key,), limit=1)
+    if archived:
+        raise ValueError(f"Incident {call_key} is archived and read-only.")
+
 # Update Incident (Modify Incident Details)
 def update_incident(call_key, priority=None, description=None, call_date_time=None):
     """
@@ -88,36 +777,27 @@ def update_incident(call_key, priority=None, description=None, call_date_time=No
     - call_date_time (str, optional): The new date and time of the call in the format "YYYY/MM/DD HH:MM:SS+00".
 
     Raises:
-    - ValueError: If no fields (priority, description, or call_date_time) are provided to update.
+    - ValueError: If no fields (priority, description, or call_date_time) are provided to update, or
+      the incident is archived (see archive.py).
 
     Returns:
-        None
+    - int: The number of incidents updated (0 if the call_key does not exist).
     """
-    with sqlite3.connect('database/911_Call_Data.db') as conn:
-        conn.row_factory = sqlite3.Row  # Ensure we can access columns by name
-        cursor = conn.cursor()
-        update_values = []
-        query = "UPDATE Calls SET "
-        update_parts = []
-
-        if priority:
-            update_parts.append("priority = ?")
-            update_values.append(priority)
-        if description:
-            update_parts.append("description = ?")
-            update_values.append(description)
-        if call_date_time:
-            update_parts.append("call_date_time = ?")
-            update_values.append(call_date_time)
-
-        if not update_parts:
-            raise ValueError("At least one field (priority, description, or call_date_time) must be provided to update.")
-
-        query += ", ".join(update_parts) + " WHERE call_key = ?"
-        update_values.append(call_key)
+    with transaction() as conn:
+        updated = _update_incident(conn, call_key, priority, description, call_date_time)
+    if not updated:
+        _check_not_archived(call_key)
+    return updated
+
+# Function to run an incident delete on an open connection
+def _delete_incident(conn, call_key):
+    """
+    Execute delete_incident()'s DELETE on `conn` without committing (see delete_incident()).
 
-        cursor.execute(query, tuple(update_values))
-        conn.commit()  # Save changes to the database
+    Returns:
+    - int: The number of rows deleted (0 or 1).
+    """
+    return conn.execute('DELETE FROM Calls WHERE call_key = ?', (call_key,)).rowcount
 
 # Delete Incident (Remove Incident)
 def delete_incident(call_key):
@@ -127,46 +807,182 @@ def delete_incident(call_key):
     Parameters:
     - call_key (str): The unique identifier of the incident to delete.
 
+    Raises:
+    - ValueError: If the incident is archived (see archive.py).
+
     Returns:
-        None
+    - int: The number of incidents deleted (0 if the call_key does not exist).
     """
 
-    with sqlite3.connect('database/911_Call_Data.db') as conn:
-        conn.row_factory = sqlite3.Row  # Ensure we can access columns by name
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM Calls WHERE call_key = ?', (call_key,))
-        conn.commit()  # Save changes to the database
+    with transaction() as conn:
+        deleted = _delete_incident(conn, call_key)
+    if not deleted:
+        _check_not_archived(call_key)
+    return deleted
+
+
+# Function to build the WHERE clause of a bulk update or delete
+def _bulk_selection(call_keys, priority, jurisdiction_id, start, end):
+    """
+    Build the conditions selecting the incidents of a bulk operation.
+
+    Keys are passed as a single JSON array and expanded by json_each(), so any number of keys
+    costs one statement and one parameter, and each key is found through the primary key.
+
+    Raises:
+    - ValueError: If neither call_keys nor any filter is given, or a time filter is invalid.
+
+    Returns:
+    - tuple: (SQL condition, list of parameters).
+    """
+    clauses, params = _call_filters(priority, jurisdiction_id, start, end)
+    if call_keys is not None:
+        if isinstance(call_keys, str):
+            call_keys = [call_keys]
+        clauses.insert(0, "call_key IN (SELECT value FROM json_each(?))")
+        params.insert(0, json.dumps(list(call_keys)))
+    if not clauses:
+        raise ValueError("Pass call_keys or at least one filter (priority, jurisdiction_id, start, end).")
+    return " AND ".join(clauses), params
+
+# Update Many Incidents (Set-Based)
+def update_incidents_many(changes, call_keys=None, priority=None, jurisdiction_id=None, start=None, end=None):
+    """
+    Apply the same changes to many incidents with a single UPDATE in one transaction.
+
+    The incidents are selected by call_keys, by filters, or by both (only keys that also match the
+    filters are updated). The rollups and the full-text index are kept consistent by their triggers
+    in the same transaction.
+
+    Parameters:
+    - changes (dict): New values, with any of the keys priority, description and call_date_time.
+    - call_keys (iterable of str, optional): The incidents to update.
+    - priority (str or list of str, optional): Update only incidents with these current priorities.
+    - jurisdiction_id (int, optional): Update only incidents in this jurisdiction.
+    - start (str, datetime or int, optional): Update only calls at or after this time.
+    - end (str, datetime or int, optional): Update only calls strictly before this time.
 
+    Raises:
+    - ValueError: If changes is empty or has unknown keys, no selection is given, or a time filter is invalid.
+
+    Returns:
+    - int: The number of incidents updated.
+    """
+    unknown = set(changes) - {'priority', 'description', 'call_date_time'}
+    if unknown:
+        raise ValueError(f"Unknown incident fields: {', '.join(sorted(unknown))}")
+    update_parts, update_values = _update_assignments(**changes)
+    condition, params = _bulk_selection(call_keys, priority, jurisdiction_id, start, end)
+
+    with transaction() as conn:
+        return conn.execute(f"UPDATE Calls SET {', '.join(update_parts)} WHERE {condition}",
+                            update_values + params).rowcount
+
+# Delete Many Incidents (Set-Based)
+def delete_incidents_many(call_keys=None, priority=None, jurisdiction_id=None, start=None, end=None):
+    """
+    Delete many incidents with a single DELETE in one transaction.
+
+    The incidents are selected by call_keys, by filters, or by both (only keys that also match the
+    filters are deleted). To protect against accidents, at least one of them is required. The
+    rollups and the full-text index are kept consistent by their triggers in the same transaction.
+
+    Parameters:
+    - call_keys (iterable of str, optional): The incidents to delete.
+    - priority (str or list of str, optional): Delete only incidents with these priorities.
+    - jurisdiction_id (int, optional): Delete only incidents in this jurisdiction.
+    - start (str, datetime or int, optional): Delete only calls at or after this time.
+    - end (str, datetime or int, optional): Delete only calls strictly before this time.
+
+    Raises:
+    - ValueError: If no selection is given or a time filter is invalid.
+
+    Returns:
+    - int: The number of incidents deleted.
+    """
+    condition, params = _bulk_selection(call_keys, priority, jurisdiction_id, start, end)
+
+    with transaction() as conn:
+        return conn.execute(f"DELETE FROM Calls WHERE {condition}", params).rowcount
 
-# Search Incident by call_key (Return a dictionary)
-def search_incident(call_key=None):
+
+# Search Incidents (Multi-Criteria, Ranked Full-Text)
+@cached()
+def search_incident(call_key=None, priority=None, description=None, jurisdiction_id=None, start=None, end=None,
+                    limit=None, order='relevance', shape='row'):
     """
     Search for incidents in the database based on the given parameters.
 
     This function queries the `Calls` table in the database and returns 
-    incidents that match the specified criteria. If no criteria are provided, 
-    all incidents are returned.
+    incidents that match all the specified criteria. If no criteria are provided, 
+    all incidents are returned. Description searches use the Calls_FTS full-text
+    index (see fulltext.py) and are ranked by relevance (BM25) unless order is
+    'newest'; other searches are always ordered newest first. Results are served from the shared query cache
+    until the data changes (see query_cache.py). Archived calls are searched too, in the
+    partitions that overlap the time filters (see archive.py).
 
     Parameters:
     - call_key (str, optional): The unique identifier for the incident to search for.
+    - priority (str or list of str, optional): Keep only these priorities.
+    - description (str, optional): Words that must all appear in the description. "burg*" matches
+      a prefix and "\"hit and run\"" an exact phrase (see fulltext.fts_query).
+    - jurisdiction_id (int, optional): Keep only calls in this jurisdiction.
+    - start (str, datetime or int, optional): Keep only calls at or after this time.
+    - end (str, datetime or int, optional): Keep only calls strictly before this time.
+    - limit (int, optional): Maximum number of incidents to return. Defaults to no limit.
+    - order (str, optional): 'relevance' or 'newest', for description searches. Ranking is skipped
+      with 'newest', which is faster for very common words. Defaults to 'relevance'.
+    - shape (str, optional): 'row', 'incident', 'numpy' or 'arrow' (see records.py). Defaults to 'row'.
+
+    Raises:
+    - ValueError: If a time filter cannot be parsed, or order or shape is unknown.
 
     Returns:
     - list of sqlite3.Row: A list of rows representing the incidents that match 
       the search criteria. Each row is a dictionary-like object with column names 
-      as keys.
+      as keys. With another shape, the incidents in that shape.
     """
-
-    with sqlite3.connect('database/911_Call_Data.db') as conn:
-        conn.row_factory = sqlite3.Row  # Ensure rows are returned as dictionary-like objects
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM Calls WHERE 1=1"
-        params = []
-
-        if call_key:
-            query += " AND call_key = ?"
-            params.append(call_key)
-        
-        cursor.execute(query, tuple(params))
-        incidents = cursor.fetchall()  # Get all matching records
-    return incidents
+    if order not in ('relevance', 'newest'):
+        raise ValueError(f"Unknown search order {order!r}; expected 'relevance' or 'newest'.")
+    records.check_shape(shape)
+
+    clauses, params = _call_filters(priority, jurisdiction_id, start, end)
+    if call_key:
+        clauses.insert(0, "call_key = ?")
+        params.insert(0, call_key)
+
+    if description is not None:
+        match = fts_query(description)
+        if match is None:
+            return records.convert([], shape)  # Nothing searchable in the text
+        query = ("SELECT C.* FROM {schema}.Calls_FTS F JOIN {schema}.Calls C ON C.rowid = F.rowid "
+                 f"WHERE {' AND '.join(['F.Calls_FTS MATCH ?'] + clauses)} ")
+        query += "ORDER BY F.rank" if order == 'relevance' else "ORDER BY C.call_epoch DESC, C.call_key DESC"
+        params.insert(0, match)
+    else:
+        query = "SELECT * FROM {schema}.Calls"
+        if clauses:
+            query += f" WHERE {' AND '.join(clauses)}"
+        query += " ORDER BY call_epoch DESC, call_key DESC"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    ranked_search = description is not None and order == 'relevance'
+    start_epoch, end_epoch = _epoch_bounds(start, end)
+    with connection() as conn:
+        if ranked_search and archive.partitions(conn, start_epoch, end_epoch):
+            # Merge the stores by rank first, then fetch the winning rows. Each store ranks with its
+            # own BM25 statistics, so the merged order is close to, not exactly, a global ranking.
+            ranked = archive.query_stores(conn, query.replace("SELECT C.*", "SELECT F.rank, C.call_key", 1), params,
+                                          start=start_epoch, end=end_epoch, sort_key=lambda row: row[0], limit=limit)
+            call_keys = [row[1] for row in ranked]
+            rows = archive.query_stores(conn, "SELECT * FROM {schema}.Calls "
+                                        "WHERE call_key IN (SELECT value FROM json_each(?))", [json.dumps(call_keys)],
+                                        start=start_epoch, end=end_epoch)
+            by_key = {row['call_key']: row for row in rows}
+            return records.convert([by_key[call_key] for call_key in call_keys], shape)
+        incidents = archive.query_stores(conn, query, params, start=start_epoch, end=end_epoch,
+                                         sort_key=_newest_first, reverse=True, limit=limit, epoch_ordered=True)
+    return records.convert(incidents, shape)
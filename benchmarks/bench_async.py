@@ -0,0 +1,86 @@
+"""
+Write throughput benchmark: the group-committing AsyncBackend against threads calling the
+synchronous backend.create_incident (one transaction per incident), at several concurrency levels.
+
+Usage:
+    python -m benchmarks.bench_async --writes 5000 --concurrency 1 8 64 256 --output async.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Function to build the arguments of the i-th benchmark incident
+def _incident(prefix, i):
+    return {'call_key': f"{prefix}-{i}", 'record_id': f"R{i}", 'call_date_time': "2021/12/01 10:00:00+00",
+            'priority': "High", 'description': "HIT AND RUN", 'call_number': f"C{i}",
+            'incident_location_id': 1, 'reporter_location_id': 1, 'jurisdiction_id': 1}
+
+
+# Function to measure the async backend
+def measure_async(writes, concurrency):
+    from async_backend import AsyncBackend
+
+    async def run():
+        async with AsyncBackend() as backend:
+            counter = iter(range(writes))
+
+            async def worker():
+                for i in counter:
+                    await backend.create_incident(**_incident(f"async{concurrency}", i))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return time.perf_counter() - started, backend.stats()
+
+    elapsed, stats = asyncio.run(run())
+    return {'engine': 'async', 'concurrency': concurrency, 'writes': writes, 'seconds': elapsed,
+            'writes_per_sec': writes / elapsed, 'writes_per_batch': stats['writes_per_batch']}
+
+
+# Function to measure threads calling the synchronous backend
+def measure_sync(writes, concurrency):
+    from backend import create_incident
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda i: create_incident(**_incident(f"sync{concurrency}", i)), range(writes)))
+    elapsed = time.perf_counter() - started
+    return {'engine': 'sync', 'concurrency': concurrency, 'writes': writes, 'seconds': elapsed,
+            'writes_per_sec': writes / elapsed, 'writes_per_batch': 1.0}
+
+
+def main(argv=None):
+    import db
+
+    parser = argparse.ArgumentParser(description="Benchmark concurrent incident writes.")
+    parser.add_argument('--writes', type=int, default=5000, help="Incidents written per run (default: %(default)s).")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 64, 256],
+                        help="Numbers of concurrent writers (default: %(default)s).")
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db.configure(os.path.join(workdir, "bench_async.db"))
+        try:
+            for concurrency in args.concurrency:
+                for measure in (measure_sync, measure_async):
+                    result = measure(args.writes, concurrency)
+                    results.append(result)
+                    print(f"{result['engine']:>5} x{concurrency:<4}: {result['writes_per_sec']:10,.0f} writes/s  "
+                          f"({result['writes_per_batch']:.1f} writes per commit)", flush=True)
+        finally:
+            db.configure()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Backend benchmark suite: latency and throughput of every backend.py function, of bulk ingestion
+and of every dashboard chart, on synthetic databases of configurable size.
+
+Each scale is generated once into the work directory (see synthetic.py), then copied to a
+temporary directory, so the writes measured here never alter the shared data. Read functions are
+timed without the query cache. Every operation is run on varied parameters (random calls, pages,
+words and windows drawn with a fixed seed), and its latency percentiles and operations per second
+are recorded.
+
+The results are written as JSON together with the git commit and the Python/SQLite versions.
+Pass --compare with an earlier result file to list the operations that got slower.
+
+Usage:
+    python -m benchmarks.bench_backend --scales 100000 1000000 --output backend.json
+    python -m benchmarks.bench_backend --scales 100000 --compare backend.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+WORDS = ('ALARM', 'ASSAULT', 'BURGLARY', 'LARCENY', 'NOISE', 'ROBBERY', 'ACCIDENT', 'DISORDERLY')
+DAY = 86400
+
+
+# Function to summarize a list of latencies
+def _summary(timings):
+    timings = sorted(timings)
+    total = sum(timings)
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(p / 100 * len(timings)))]
+
+    return {'runs': len(timings), 'mean_ms': total / len(timings) * 1000, 'p50_ms': percentile(50) * 1000,
+            'p95_ms': percentile(95) * 1000, 'p99_ms': percentile(99) * 1000, 'max_ms': timings[-1] * 1000,
+            'ops_per_second': len(timings) / total if total > 0 else 0.0}
+
+
+# Function to time a callable over a list of argument sets
+def _timed(function, arguments):
+    timings = []
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return _summary(timings)
+
+
+# Function to bypass the query cache of a cached function
+def _uncached(function):
+    return getattr(function, 'uncached', function)
+
+
+# Function to draw the parameters of the read and write operations
+def _samples(conn, runs, rng):
+    max_rowid, first, last = conn.execute("SELECT MAX(rowid), MIN(call_epoch), MAX(call_epoch) FROM Calls").fetchone()
+    calls = []
+    while len(calls) < runs:
+        row = conn.execute("SELECT call_key, call_epoch FROM Calls WHERE rowid = ?",
+                           (rng.randint(1, max_rowid),)).fetchone()
+        if row is not None and row[1] is not None:
+            calls.append(tuple(row))
+    jurisdictions = conn.execute("SELECT MAX(jurisdiction_id) FROM Jurisdictions").fetchone()[0]
+    windows = [(start, start + DAY) for start in (rng.randint(first, max(first, last - DAY)) for _ in range(runs))]
+    return calls, jurisdictions, windows, (first, last)
+
+
+# Function to benchmark every backend function on one database
+def measure_backend(runs, ingest_rows, seed=0):
+    """
+    Time every backend.py function on the database the shared pool points at.
+
+    Parameters:
+    - runs (int): Calls of each function.
+    - ingest_rows (int): Incidents inserted with create_incidents_many.
+    - seed (int, optional): Random seed of the parameters. Defaults to 0.
+
+    Returns:
+    - dict: Maps each operation to its latency summary (ingestion also reports rows_per_second).
+    """
+    import backend
+    import db
+    from benchmarks.synthetic import PRIORITIES, incidents, locate
+
+    rng = random.Random(seed)
+    with db.connection() as conn:
+        calls, jurisdictions, windows, (first, last) = _samples(conn, runs, rng)
+        location_count = conn.execute("SELECT MAX(location_id) FROM Locations").fetchone()[0]
+    keys = [call_key for call_key, _ in calls]
+    cursors = [(backend.encode_cursor(call_epoch, call_key),) for call_key, call_epoch in calls]
+    priorities = [rng.choice(PRIORITIES) for _ in range(runs)]
+    juris = [rng.randint(1, jurisdictions) for _ in range(runs)]
+    words = [rng.choice(WORDS) for _ in range(runs)]
+
+    list_page, search = _uncached(backend.list_incidents), _uncached(backend.search_incident)
+    results = {}
+
+    def run(name, function, arguments):
+        results[name] = _timed(function, arguments)
+
+    run('read_incidents', _uncached(backend.read_incidents), [()] * runs)
+    run('list_incidents', lambda: list_page(page_size=50), [()] * runs)
+    run('list_incidents_deep_page', lambda cursor: list_page(page_size=50, cursor=cursor), cursors)
+    run('list_incidents_filtered', lambda priority, jurisdiction_id, window: list_page(
+        page_size=50, priority=priority, jurisdiction_id=jurisdiction_id, start=window[0], end=window[1]),
+        zip(priorities, juris, windows))
+    run('search_incident_key', lambda call_key: search(call_key=call_key), [(k,) for k in keys])
+    run('search_incident_fulltext', lambda word: search(description=word, limit=100),
+        [(w,) for w in words])
+    run('search_incident_filtered', lambda word, priority, window: search(
+        description=word, priority=priority, start=window[0], end=window[1], limit=100),
+        zip(words, priorities, windows))
+
+    with db.connection() as conn:
+        if conn.execute("SELECT COUNT(*) FROM Locations_RTree").fetchone()[0] == 0:
+            with conn:  # Databases generated before the spatial index
+                locate(conn, seed=seed)
+        points = [tuple(conn.execute("SELECT latitude, longitude FROM Locations WHERE location_id = ?",
+                                     (rng.randint(1, location_count),)).fetchone()) for _ in range(runs)]
+    run('incidents_near', lambda point: _uncached(backend.incidents_near)(point[0], point[1], 500),
+        [(point,) for point in points])
+    run('incidents_near_last_day', lambda point, window: _uncached(backend.incidents_near)(
+        point[0], point[1], 1000, start=window[0], end=window[1]), zip(points, windows))
+    run('incidents_in_bbox', lambda point: _uncached(backend.incidents_in_bbox)(
+        point[0] - 0.01, point[1] - 0.01, point[0] + 0.01, point[1] + 0.01), [(point,) for point in points])
+    run('incident_grid', lambda: _uncached(backend.incident_grid)(cell_m=250), [()] * runs)
+    run('incident_grid_last_day', lambda window: _uncached(backend.incident_grid)(
+        cell_m=250, start=window[0], end=window[1]), [(window,) for window in windows])
+
+    generated = list(incidents(runs + ingest_rows, location_count, jurisdictions, seed=seed + 1,
+                               start=time.strftime('%Y-%m-%d', time.gmtime(last - DAY)), days=1))
+    created = [(str(uuid.uuid4()),) + incident[1:] for incident in generated[:runs]]
+    run('create_incident', backend.create_incident, created)
+    run('update_incident', lambda call_key, priority: backend.update_incident(call_key, priority=priority),
+        zip(keys, priorities))
+    run('delete_incident', backend.delete_incident, [(incident[0],) for incident in created])
+
+    summary = backend.create_incidents_many(generated[runs:])
+    results['create_incidents_many'] = {'rows': summary['inserted'], 'seconds': summary['elapsed'],
+                                        'rows_per_second': summary['rows_per_sec']}
+
+    ingested = [incident[0] for incident in generated[runs:]]
+    batches = [(ingested[i:i + 100],) for i in range(0, min(len(ingested), runs * 100), 100)]
+    run('update_incidents_many', lambda call_keys: backend.update_incidents_many({'priority': "High"},
+                                                                                 call_keys=call_keys), batches)
+    run('update_incidents_many_window', lambda window: backend.update_incidents_many(
+        {'priority': "Low"}, start=window[0], end=window[0] + 600), [(window,) for window in windows])
+    run('delete_incidents_many', lambda call_keys: backend.delete_incidents_many(call_keys=call_keys), batches)
+    return results
+
+
+# Function to benchmark every dashboard chart on one database
+def measure_dashboard(runs, engines):
+    """
+    Time every dashboard chart with each engine, over the whole history and over the last 30 days.
+
+    Parameters:
+    - runs (int): Loads of each chart.
+    - engines (list of str): Engines from dashboard_data.ENGINES.
+
+    Returns:
+    - dict: Maps '<engine>_<chart>' and '<engine>_<chart>_last_30_days' to latency summaries, plus
+      'columnar_build' when the columnar engine is measured.
+    """
+    import columnar
+    import dashboard_data
+    import db
+
+    results = {}
+    with db.connection() as conn:
+        last = conn.execute("SELECT MAX(call_epoch) FROM Calls").fetchone()[0]
+        if 'columnar' in engines:
+            build = columnar.snapshot_for(conn).refresh(conn, full=True)
+            results['columnar_build'] = {'rows': build['rows'], 'seconds': build['elapsed']}
+        for engine in engines:
+            for name, load in dashboard_data.CHARTS.items():
+                results[f'{engine}_{name}'] = _timed(lambda: load(conn, engine), [()] * runs)
+                results[f'{engine}_{name}_last_30_days'] = _timed(
+                    lambda: load(conn, engine, start=last - 30 * DAY), [()] * runs)
+    return results
+
+
+# Function to run the whole suite on one database
+def measure(db_path, runs, ingest_rows, engines):
+    """
+    Run the dashboard and backend benchmarks on a database (modified by the write benchmarks).
+
+    Parameters:
+    - db_path (str): Path to a synthetic database.
+    - runs (int): Calls of each operation.
+    - ingest_rows (int): Incidents inserted by the ingestion benchmark.
+    - engines (list of str): Dashboard engines to measure.
+
+    Returns:
+    - dict: 'dashboard' and 'backend' result maps.
+    """
+    import columnar
+    import db
+
+    db.configure(db_path, pool_size=2)
+    try:
+        dashboard = measure_dashboard(runs, engines)  # Before the writes, on the generated data
+        backend = measure_backend(runs, ingest_rows)
+    finally:
+        columnar.close_snapshots()
+        db.configure()
+    return {'dashboard': dashboard, 'backend': backend}
+
+
+# Function to describe the code and environment being measured
+def environment():
+    """Return the git commit, Python, SQLite and platform versions of this run."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'timestamp': int(time.time())}
+
+
+# Function to compare two result files
+def compare(baseline, current, tolerance):
+    """
+    List the operations slower than in the baseline by more than `tolerance`.
+
+    Latencies are compared on p50_ms, throughputs (bulk ingestion) on rows_per_second.
+
+    Parameters:
+    - baseline (dict): An earlier result document.
+    - current (dict): This run's result document.
+    - tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+    - list of tuple: (rows, group, operation, baseline value, current value) for each regression.
+    """
+    earlier = {(scale['rows'], group, name): value for scale in baseline['scales']
+               for group in ('backend', 'dashboard') for name, value in scale[group].items()}
+    regressions = []
+    for scale in current['scales']:
+        for group in ('backend', 'dashboard'):
+            for name, value in scale[group].items():
+                before = earlier.get((scale['rows'], group, name))
+                if before is None:
+                    continue
+                if 'p50_ms' in value:
+                    slower = value['p50_ms'] > before['p50_ms'] * (1 + tolerance)
+                    metric = 'p50_ms'
+                elif 'rows_per_second' in value:
+                    slower = value['rows_per_second'] * (1 + tolerance) < before['rows_per_second']
+                    metric = 'rows_per_second'
+                else:
+                    continue
+                if slower:
+                    regressions.append((scale['rows'], group, name, before[metric], value[metric]))
+    return regressions
+
+
+def main(argv=None):
+    import columnar
+    import dashboard_data
+    from benchmarks.synthetic import call_count, create_database
+
+    parser = argparse.ArgumentParser(description="Benchmark every backend function and dashboard chart.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[100000, 1000000],
+                        help="Numbers of calls to benchmark, from 100000 to 10000000 (default: %(default)s).")
+    parser.add_argument('--workdir', default='benchmarks/data', help="Where synthetic databases are kept.")
+    parser.add_argument('--runs', type=int, default=50, help="Calls of each operation (default: %(default)s).")
+    parser.add_argument('--ingest-rows', type=int, default=50000,
+                        help="Incidents inserted by the ingestion benchmark (default: %(default)s).")
+    default_engines = [engine for engine in dashboard_data.ENGINES
+                       if engine != 'columnar' or columnar.duckdb is not None]
+    parser.add_argument('--engines', nargs='+', default=default_engines, choices=dashboard_data.ENGINES)
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--compare', metavar='BASELINE', help="Result file of an earlier run to compare with.")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (default: %(default)s).")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    document = {'environment': environment(), 'runs': args.runs, 'scales': []}
+    for rows in args.scales:
+        db_path = os.path.join(args.workdir, f"synthetic_{rows}.db")
+        if call_count(db_path) != rows:
+            print(f"Generating {rows:,} calls in {db_path} ...", flush=True)
+            create_database(db_path, rows)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            copy_path = shutil.copy(db_path, os.path.join(tmp, os.path.basename(db_path)))
+            result = measure(copy_path, args.runs, args.ingest_rows, args.engines)
+        result['rows'] = rows
+        document['scales'].append(result)
+
+        for group in ('backend', 'dashboard'):
+            for name, value in result[group].items():
+                if 'p50_ms' in value:
+                    print(f"{rows:>10,} {name:<42} p50 {value['p50_ms']:9.2f} ms  p95 {value['p95_ms']:9.2f} ms  "
+                          f"{value['ops_per_second']:10.1f} ops/s", flush=True)
+                else:
+                    rate = f"  {value['rows_per_second']:10,.0f} rows/s" if 'rows_per_second' in value else ""
+                    print(f"{rows:>10,} {name:<42} {value['rows']:,} rows in {value['seconds']:.2f} s{rate}",
+                          flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), document, args.tolerance)
+        for rows, group, name, before, after in regressions:
+            print(f"REGRESSION {rows:>10,} {group}.{name}: {before:.2f} -> {after:.2f}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Columnar engine benchmark: the DuckDB snapshot against the SQLite engines for the six dashboard
+charts, over the whole history and over the last 30 days, plus the cost of keeping the snapshot
+up to date (full build, and incremental refresh after a batch of updates).
+
+The synthetic database is copied first, so the updates do not alter the shared benchmark data.
+
+Usage:
+    python -m benchmarks.bench_columnar --scales 100000 1000000 --output columnar.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+ENGINES = ('sql', 'rollup', 'columnar')
+
+
+# Function to time a callable
+def _timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+# Function to run every measurement on one database
+def measure(db_path, updates, repeat):
+    """
+    Measure snapshot maintenance and chart loading on one database.
+
+    Parameters:
+    - db_path (str): Path to a synthetic database (modified by the updates).
+    - updates (int): Number of calls updated before the incremental refresh.
+    - repeat (int): Timed runs per measurement (the fastest is kept).
+
+    Returns:
+    - dict: build_seconds, refresh_seconds, and per engine dashboard_seconds / last_30_days_seconds.
+    """
+    import backend
+    import columnar
+    import dashboard_data
+    import db
+
+    pool = db.configure(db_path, pool_size=2)
+    try:
+        with pool.connection() as conn:
+            snapshot = columnar.snapshot_for(conn)
+            build = snapshot.refresh(conn, full=True)
+
+            call_keys = [row[0] for row in conn.execute("SELECT call_key FROM Calls LIMIT ?", (updates,))]
+            backend.update_incidents_many({'priority': "High"}, call_keys=call_keys)
+            refresh = snapshot.refresh(conn)
+
+            newest = conn.execute("SELECT MAX(call_epoch) FROM Calls").fetchone()[0]
+            result = {'build_seconds': build['elapsed'], 'snapshot_rows': build['rows'],
+                      'refresh_seconds': refresh['elapsed'], 'refresh_mode': refresh['mode'], 'updates': updates}
+            for engine in ENGINES:
+                result[f'{engine}_dashboard_seconds'] = _timed(
+                    lambda: dashboard_data.load_dashboard(conn, engine=engine), repeat)
+                result[f'{engine}_last_30_days_seconds'] = _timed(
+                    lambda: dashboard_data.load_dashboard(conn, engine=engine, start=newest - 30 * 86400), repeat)
+    finally:
+        columnar.close_snapshots()
+        db.configure()
+    return result
+
+
+def main(argv=None):
+    from benchmarks.synthetic import call_count, create_database
+
+    parser = argparse.ArgumentParser(description="Benchmark the columnar dashboard engine.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[100000, 1000000],
+                        help="Numbers of calls to benchmark (default: %(default)s).")
+    parser.add_argument('--workdir', default='benchmarks/data', help="Where synthetic databases are kept.")
+    parser.add_argument('--updates', type=int, default=1000,
+                        help="Calls updated before the incremental refresh (default: %(default)s).")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per measurement (default: %(default)s).")
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.scales:
+        db_path = os.path.join(args.workdir, f"synthetic_{rows}.db")
+        if call_count(db_path) != rows:
+            print(f"Generating {rows:,} calls in {db_path} ...", flush=True)
+            create_database(db_path, rows)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            copy_path = shutil.copy(db_path, os.path.join(tmp, os.path.basename(db_path)))
+            result = measure(copy_path, args.updates, args.repeat)
+        result['rows'] = rows
+        results.append(result)
+        print(f"{rows:>10,} snapshot: build {result['build_seconds']:7.2f} s  "
+              f"refresh after {args.updates:,} updates {result['refresh_seconds'] * 1000:8.1f} ms", flush=True)
+        for engine in ENGINES:
+            print(f"{rows:>10,} {engine:>8}: all {result[f'{engine}_dashboard_seconds'] * 1000:9.1f} ms  "
+                  f"last 30 days {result[f'{engine}_last_30_days_seconds'] * 1000:9.1f} ms", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Dashboard data benchmark: peak memory and load time of the six chart frames.
+
+Compares the original implementation (SELECT * FROM Calls into pandas, then parsing and grouping
+in Python) with the dashboard_data engines ('sql' aggregates pushed into SQLite, 'rollup' reads of
+the pre-aggregated tables). Each measurement runs in a fresh process so peak RSS is not polluted
+by earlier runs.
+
+Usage:
+    python -m benchmarks.bench_dashboard --scales 100000 1000000 5000000 --output dashboard.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sqlite3
+import time
+import tracemalloc
+
+VARIANTS = ('legacy', 'sql', 'rollup')
+
+
+# Function reproducing the original dashboard() data path
+def legacy_dashboard(conn):
+    import pandas as pd
+
+    df_calls = pd.read_sql_query("SELECT * FROM Calls;", conn)
+    priority_counts = df_calls['priority'].value_counts().reset_index()
+    df_calls['call_date_time'] = pd.to_datetime(df_calls['call_date_time'], errors='coerce')
+    df_calls = df_calls.dropna(subset=['call_date_time'])
+    df_calls['hour'] = df_calls['call_date_time'].dt.hour
+    df_hourly = df_calls.groupby('hour').size().reset_index(name="count")
+    df_district = pd.read_sql_query("""
+        SELECT J.district, COUNT(*) as count FROM Calls C
+        JOIN Jurisdictions J ON C.jurisdiction_id = J.jurisdiction_id GROUP BY J.district;""", conn)
+    df_neighborhood = pd.read_sql_query("""
+        SELECT L.neighborhood, COUNT(*) AS count FROM Calls C
+        JOIN Locations L ON C.reporter_location_id = L.location_id GROUP BY L.neighborhood;""", conn)
+    df_calls['date'] = df_calls['call_date_time'].dt.date
+    df_priority_over_time = df_calls.groupby(['date', 'priority']).size().reset_index(name='count')
+    df_location = pd.read_sql_query("""
+        SELECT L.location_id, COUNT(*) AS count FROM Calls C
+        JOIN Locations L ON C.reporter_location_id = L.location_id GROUP BY L.location_id;""", conn)
+    return {'priority': priority_counts, 'hour': df_hourly, 'district': df_district,
+            'neighborhood': df_neighborhood, 'priority_over_time': df_priority_over_time, 'location': df_location}
+
+
+# Function to measure one variant (runs in a child process)
+def measure(db_path, variant, repeat):
+    import pandas  # noqa: F401 - imported before the baseline so it is not counted
+    import dashboard_data
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn = sqlite3.connect(db_path)
+    timings = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if variant == 'legacy':
+            frames = legacy_dashboard(conn)
+        else:
+            frames = dashboard_data.load_dashboard(conn, engine=variant)
+        timings.append(time.perf_counter() - started)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame_bytes = sum(int(df.memory_usage(deep=True).sum()) for df in frames.values())
+    conn.close()
+
+    return {
+        'variant': variant,
+        'seconds_min': min(timings),
+        'seconds_median': sorted(timings)[len(timings) // 2],
+        'traced_peak_bytes': traced_peak,
+        # ru_maxrss is in KiB on Linux
+        'rss_growth_bytes': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss) * 1024,
+        'frame_bytes': frame_bytes,
+    }
+
+
+def main(argv=None):
+    from benchmarks.synthetic import call_count, create_database
+
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data path.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[100000, 1000000, 5000000],
+                        help="Numbers of calls to benchmark (default: %(default)s).")
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument('--workdir', default='benchmarks/data', help="Where synthetic databases are kept.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per variant (default: %(default)s).")
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for rows in args.scales:
+        db_path = os.path.join(args.workdir, f"synthetic_{rows}.db")
+        if call_count(db_path) != rows:
+            print(f"Generating {rows:,} calls in {db_path} ...", flush=True)
+            create_database(db_path, rows)
+
+        for variant in args.variants:
+            with context.Pool(1) as pool:
+                result = pool.apply(measure, (db_path, variant, args.repeat))
+            result['rows'] = rows
+            results.append(result)
+            print(f"{rows:>10,} {variant:>7}: {result['seconds_min'] * 1000:10.1f} ms  "
+                  f"peak traced {result['traced_peak_bytes'] / 2**20:8.1f} MiB  "
+                  f"RSS +{result['rss_growth_bytes'] / 2**20:8.1f} MiB  "
+                  f"frames {result['frame_bytes'] / 1024:8.1f} KiB", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
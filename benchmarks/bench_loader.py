@@ -0,0 +1,122 @@
+"""
+CSV loader benchmark: rows per second of loader.load_csv into an empty and into a loaded database.
+
+A synthetic CSV in the city's format is generated once per scale. Each run loads it into a fresh
+database, then loads a second CSV of new calls on top of it, and records the rate, the time per
+chunk and the change log rows left behind (the loader resets the log instead of logging each call).
+
+Usage:
+    python -m benchmarks.bench_loader --scales 100000 1000000 --output loader.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import time
+
+# Columns of the city CSV, in its order
+CSV_COLUMNS = ('callKey', 'recordId', 'callDateTime', 'priority', 'description', 'callNumber', 'location',
+               'Neighborhood', 'ZIPCode', 'Census_Tracts', 'Community_Statistical_Areas', 'incidentLocation',
+               'district', 'PoliceDistrict', 'PolicePost', 'CouncilDistrict', 'SheriffDistricts', 'NeedsSync',
+               'ESRI_OID')
+
+
+# Function to write a synthetic CSV
+def write_csv(path, rows, seed=0, location_count=20000):
+    """
+    Write `rows` synthetic calls in the format of the city CSV.
+
+    Parameters:
+    - path (str): Path of the CSV file to write.
+    - rows (int): Number of calls.
+    - seed (int, optional): Random seed; different seeds give different call keys. Defaults to 0.
+    - location_count (int, optional): Number of distinct reporter locations. Defaults to 20000.
+
+    Returns:
+    - str: The CSV path.
+    """
+    from benchmarks.synthetic import incidents, jurisdictions, locations
+
+    jurisdiction_rows = jurisdictions()
+    location_rows = locations(location_count, random.Random(0))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for number, (call_key, record_id, call_time, priority, description, call_number, incident_id,
+                     reporter_id, jurisdiction_id) in enumerate(incidents(rows, location_count, len(jurisdiction_rows),
+                                                                          seed=seed)):
+            writer.writerow((call_key, record_id, call_time, priority, description, call_number)
+                            + location_rows[reporter_id - 1] + (location_rows[incident_id - 1][0],)
+                            + jurisdiction_rows[jurisdiction_id - 1] + (number % 2, seed * rows + number + 1))
+    return path
+
+
+# Function to load one CSV and time it
+def measure(csv_path, db_path, chunksize):
+    """
+    Load a CSV with loader.load_csv and report its rate.
+
+    Parameters:
+    - csv_path (str): The CSV to load.
+    - db_path (str): The database to load it into.
+    - chunksize (int): Rows per chunk/transaction.
+
+    Returns:
+    - dict: rows, seconds, rows_per_sec, chunk_ms (mean time per chunk) and logged_changes.
+    """
+    from loader import load_csv
+
+    chunks = []
+    started = time.perf_counter()
+    summary = load_csv(csv_path, db_path, chunksize=chunksize, progress=lambda _: chunks.append(time.perf_counter()))
+    seconds = time.perf_counter() - started
+
+    conn = sqlite3.connect(db_path)
+    try:
+        logged = conn.execute("SELECT COUNT(*) FROM Call_Changes").fetchone()[0]
+    finally:
+        conn.close()
+    return {'rows': summary['processed'], 'seconds': seconds, 'rows_per_sec': summary['processed'] / seconds,
+            'chunk_ms': seconds * 1000 / max(len(chunks), 1), 'logged_changes': logged}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the streaming CSV loader.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[100000, 1000000],
+                        help="Numbers of calls to load (default: %(default)s).")
+    parser.add_argument('--workdir', default='benchmarks/data', help="Where the synthetic CSVs are kept.")
+    parser.add_argument('--chunksize', type=int, default=50000, help="Rows per chunk (default: %(default)s).")
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.scales:
+        first = os.path.join(args.workdir, f"calls_{rows}.csv")
+        more = os.path.join(args.workdir, f"calls_{rows}_more.csv")
+        for path, seed in ((first, 0), (more, 1)):
+            if not os.path.exists(path):
+                print(f"Generating {rows:,} calls in {path} ...", flush=True)
+                write_csv(path, rows, seed=seed)
+
+        db_path = os.path.join(args.workdir, f"loader_{rows}.db")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        for case, path in (('empty', first), ('loaded', more)):
+            result = measure(path, db_path, args.chunksize)
+            result.update(case=case, scale=rows)
+            results.append(result)
+            print(f"{rows:>10,} into {case:>6}: {result['rows']:>9,} rows in {result['seconds']:7.2f} s  "
+                  f"{result['rows_per_sec']:>9,.0f} rows/s  {result['chunk_ms']:8.1f} ms/chunk  "
+                  f"{result['logged_changes']:,} logged changes", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Description search benchmark: the Calls_FTS full-text index against a LIKE scan of Calls.
+
+Each case runs the same search both ways on a synthetic database and records the latency and
+the number of matches, so the two engines can also be checked against each other.
+
+Usage:
+    python -m benchmarks.bench_search --scales 100000 1000000 --output search.json
+"""
+import argparse
+import json
+import os
+import time
+
+# name: (search_incident keyword arguments, equivalent LIKE conditions, their parameters)
+CASES = {
+    'rare_word': ({'description': "robbery"}, ("description LIKE ?",), ('%ROBBERY%',)),
+    'common_word': ({'description': "assault"}, ("description LIKE ?",), ('%ASSAULT%',)),
+    'phrase': ({'description': '"hit and run"'}, ("description LIKE ?",), ('%HIT AND RUN%',)),
+    'prefix': ({'description': "burg*"}, ("(description LIKE ? OR description LIKE ?)",), ('BURG%', '% BURG%')),
+    'word_and_priority': ({'description': "alarm", 'priority': "High"},
+                          ("description LIKE ?", "priority = ?"), ('%ALARM%', 'High')),
+}
+
+
+# Function to time a callable
+def _timed(function, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+# Function to run every case on one database
+def measure(db_path, limit, repeat):
+    """
+    Time every search case with the full-text index and with a LIKE scan.
+
+    Parameters:
+    - db_path (str): Path to a synthetic database.
+    - limit (int): Result limit of the limited runs.
+    - repeat (int): Timed runs per measurement (the fastest is kept).
+
+    Returns:
+    - list of dict: One result per case.
+    """
+    import db
+    from backend import search_incident
+
+    pool = db.configure(db_path, pool_size=1)
+    results = []
+    try:
+        for name, (criteria, conditions, like_params) in CASES.items():
+            like_sql = f"SELECT * FROM Calls WHERE {' AND '.join(conditions)} ORDER BY call_epoch DESC"
+            with pool.connection() as conn:
+                like_all, like_rows = _timed(lambda: conn.execute(like_sql, like_params).fetchall(), repeat)
+                like_limited, _ = _timed(
+                    lambda: conn.execute(like_sql + " LIMIT ?", like_params + (limit,)).fetchall(), repeat)
+            fts_all, fts_rows = _timed(lambda: search_incident.uncached(**criteria), repeat)
+            fts_limited, _ = _timed(lambda: search_incident.uncached(limit=limit, **criteria), repeat)
+            fts_newest, _ = _timed(lambda: search_incident.uncached(limit=limit, order='newest', **criteria), repeat)
+
+            results.append({
+                'case': name,
+                'matches': len(fts_rows),
+                'like_matches': len(like_rows),
+                'fts_seconds': fts_all,
+                'like_seconds': like_all,
+                'fts_limited_seconds': fts_limited,
+                'fts_newest_limited_seconds': fts_newest,  # same order as the LIKE query
+                'like_limited_seconds': like_limited,
+            })
+    finally:
+        db.configure()
+    return results
+
+
+def main(argv=None):
+    from benchmarks.synthetic import call_count, create_database
+
+    parser = argparse.ArgumentParser(description="Benchmark full-text description search against LIKE.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[100000, 1000000],
+                        help="Numbers of calls to benchmark (default: %(default)s).")
+    parser.add_argument('--workdir', default='benchmarks/data', help="Where synthetic databases are kept.")
+    parser.add_argument('--limit', type=int, default=100, help="Result limit of the limited runs (default: %(default)s).")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per measurement (default: %(default)s).")
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.scales:
+        db_path = os.path.join(args.workdir, f"synthetic_{rows}.db")
+        if call_count(db_path) != rows:
+            print(f"Generating {rows:,} calls in {db_path} ...", flush=True)
+            create_database(db_path, rows)
+
+        for result in measure(db_path, args.limit, args.repeat):
+            result['rows'] = rows
+            results.append(result)
+            print(f"{rows:>10,} {result['case']:>18}: {result['matches']:>9,} matches  "
+                  f"fts {result['fts_seconds'] * 1000:9.1f} ms  like {result['like_seconds'] * 1000:9.1f} ms  "
+                  f"| limit {args.limit}: fts {result['fts_limited_seconds'] * 1000:7.1f} ms  "
+                  f"fts newest {result['fts_newest_limited_seconds'] * 1000:7.1f} ms  "
+                  f"like {result['like_limited_seconds'] * 1000:7.1f} ms", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Synthetic 911 call data for benchmarks.
+
+Generates Jurisdictions, Locations and Calls with a realistic shape: most calls are
+Non-Emergency or Low priority, call volume follows a daily cycle, and a minority of locations
+and neighborhoods receive most of the calls. Output is deterministic for a given seed.
+"""
+import os
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+
+from backend import INSERT_CALL_SQL
+from db import ConnectionPool
+from fulltext import rebuild_fulltext
+from geo import set_coordinates
+from rollups import rebuild_rollups
+from timestamps import CALL_TIME_FORMAT, to_epoch
+
+PRIORITIES = ('Non-Emergency', 'Low', 'Medium', 'High', 'Emergency')
+PRIORITY_WEIGHTS = (45, 25, 18, 10, 2)
+
+DESCRIPTIONS = ('911/NO  VOICE', 'DISORDERLY', 'Traffic Stop', 'COMMON ASSAULT', 'AUTO ACCIDENT', 'SILENT ALARM',
+                'NARCOTICSOutside', 'BURGLARY', 'LARCENY', 'HIT AND RUN', 'FAMILY DISTURB', 'INVESTIGATE',
+                'SUSPICIOUS PERS', 'NOISE COMPLAINT', 'CHECK WELL BEING', 'ROBBERY ARMED')
+DESCRIPTION_WEIGHTS = (20, 14, 12, 9, 8, 7, 6, 5, 5, 3, 3, 3, 2, 1, 1, 1)
+
+# Relative call volume per hour of day (UTC): quiet before dawn, busiest in the evening
+HOUR_WEIGHTS = (30, 22, 16, 12, 10, 10, 14, 22, 32, 40, 45, 48, 50, 52, 54, 56, 60, 64, 66, 64, 58, 50, 42, 36)
+
+DISTRICTS = ('CD', 'ED', 'ND', 'NE', 'NW', 'SD', 'SE', 'SW', 'WD')
+
+# (south, west, north, east) of the city the locations are scattered over
+CITY_BOUNDS = (39.197, -76.712, 39.372, -76.529)
+
+
+# Function to build the jurisdiction rows
+def jurisdictions(posts_per_district=12):
+    """Return (district, police_district, police_post, council_district, sheriff_district) tuples."""
+    return [(district, f"{district} Police", str(100 * (i + 1) + post), str(1 + (i * posts_per_district + post) % 14),
+             f"D{1 + i % 3}")
+            for i, district in enumerate(DISTRICTS) for post in range(posts_per_district)]
+
+
+# Function to build the location rows
+def locations(count, rng, neighborhoods=250):
+    """Return `count` distinct (address, neighborhood, zip_code, census_tract, community_statistical_area) tuples."""
+    rows = []
+    for i in range(count):
+        neighborhood = f"Neighborhood {rng.randrange(neighborhoods):03d}"
+        rows.append((f"{100 + i} {rng.choice(('MAIN', 'OAK', 'PARK', 'CHARLES', 'HOLLINS', 'PRATT'))} ST",
+                     neighborhood, f"212{rng.randrange(10, 40)}", f"Census Tract {rng.randrange(1, 2800)}",
+                     neighborhood))
+    return rows
+
+
+# Function to give the locations coordinates
+def locate(conn, seed=0, spread=0.004):
+    """
+    Set coordinates on the locations that have none, scattered around one center per neighborhood
+    within CITY_BOUNDS. The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to a migrated database.
+    - seed (int, optional): Random seed. Defaults to 0.
+    - spread (float, optional): Standard deviation around the neighborhood center, in degrees.
+
+    Returns:
+    - int: The number of locations updated.
+    """
+    rng = random.Random(seed)
+    south, west, north, east = CITY_BOUNDS
+    centers = {}
+    coordinates = []
+    for location_id, neighborhood in conn.execute("SELECT location_id, neighborhood FROM Locations "
+                                                  "WHERE latitude IS NULL ORDER BY location_id").fetchall():
+        if neighborhood not in centers:
+            centers[neighborhood] = (rng.uniform(south, north), rng.uniform(west, east))
+        latitude, longitude = centers[neighborhood]
+        coordinates.append((location_id, min(north, max(south, rng.gauss(latitude, spread))),
+                            min(east, max(west, rng.gauss(longitude, spread * 1.3)))))
+    return set_coordinates(conn, coordinates)
+
+
+# Function to generate incident tuples
+def incidents(rows, location_count, jurisdiction_count, seed=0, start='2021-01-01', days=365, chunk_size=10000):
+    """
+    Generate `rows` incidents as tuples in create_incident's positional order.
+
+    Parameters:
+    - rows (int): Number of incidents to generate.
+    - location_count (int): Number of Locations rows (ids 1..location_count).
+    - jurisdiction_count (int): Number of Jurisdictions rows (ids 1..jurisdiction_count).
+    - seed (int, optional): Random seed. Defaults to 0.
+    - start (str, optional): First day of the generated period (YYYY-MM-DD, UTC).
+    - days (int, optional): Length of the period. Later days get slightly more calls.
+    - chunk_size (int, optional): Number of random draws made at a time.
+
+    Yields:
+    - tuple: (call_key, record_id, call_date_time, priority, description, call_number,
+      incident_location_id, reporter_location_id, jurisdiction_id)
+    """
+    rng = random.Random(seed)
+    start_epoch = int(datetime.strptime(start, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+    day_weights = [1.0 + day / days for day in range(days)]  # Volume grows over the period
+    location_ids = range(1, location_count + 1)
+    # Zipf-like skew: a few locations receive most of the calls
+    location_weights = [1.0 / (rank ** 0.8) for rank in location_ids]
+    jurisdiction_ids = range(1, jurisdiction_count + 1)
+
+    produced = 0
+    while produced < rows:
+        n = min(chunk_size, rows - produced)
+        days_drawn = rng.choices(range(days), weights=day_weights, k=n)
+        hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=n)
+        priorities = rng.choices(PRIORITIES, weights=PRIORITY_WEIGHTS, k=n)
+        descriptions = rng.choices(DESCRIPTIONS, weights=DESCRIPTION_WEIGHTS, k=n)
+        reporters = rng.choices(location_ids, weights=location_weights, k=n)
+        incident_locations = rng.choices(location_ids, weights=location_weights, k=n)
+        districts = rng.choices(jurisdiction_ids, k=n)
+        for i in range(n):
+            epoch = start_epoch + days_drawn[i] * 86400 + hours[i] * 3600 + rng.randrange(3600)
+            number = produced + i
+            yield (str(uuid.UUID(int=rng.getrandbits(128), version=4)), str(number),
+                   datetime.fromtimestamp(epoch, tz=timezone.utc).strftime(CALL_TIME_FORMAT),
+                   priorities[i], descriptions[i], f"P{number:09d}", incident_locations[i], reporters[i], districts[i])
+        produced += n
+
+
+# Function to create a synthetic database
+def create_database(path, rows, seed=0, location_count=20000, days=365, chunk_size=50000):
+    """
+    Create (or replace) a fully migrated SQLite database filled with synthetic data.
+
+    Calls are bulk-loaded with the Calls triggers temporarily dropped; the trigger-maintained
+    structures are then rebuilt once, which is much faster than maintaining them row by row.
+
+    Parameters:
+    - path (str): Path of the database file to create.
+    - rows (int): Number of calls.
+    - seed (int, optional): Random seed. Defaults to 0.
+    - location_count (int, optional): Number of Locations rows. Defaults to 20000.
+    - days (int, optional): Number of days the calls are spread over. Defaults to 365.
+    - chunk_size (int, optional): Calls inserted per transaction. Defaults to 50000.
+
+    Returns:
+    - str: The database path.
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    conn = ConnectionPool(path, pool_size=1).open_connection()  # Applies PRAGMAs and migrations
+    rng = random.Random(seed)
+    try:
+        jurisdiction_rows = jurisdictions()
+        with conn:
+            conn.executemany("INSERT INTO Jurisdictions (district, police_district, police_post, council_district, "
+                             "sheriff_district) VALUES (?, ?, ?, ?, ?)", jurisdiction_rows)
+            conn.executemany("INSERT INTO Locations (address, neighborhood, zip_code, census_tract, "
+                             "community_statistical_area) VALUES (?, ?, ?, ?, ?)", locations(location_count, rng))
+            locate(conn, seed=seed)
+
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                                "AND tbl_name = 'Calls'").fetchall()
+        with conn:
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+
+        batch = []
+        for incident in incidents(rows, location_count, len(jurisdiction_rows), seed=seed, days=days):
+            batch.append(incident)
+            if len(batch) >= chunk_size:
+                _insert_calls(conn, batch)
+                batch = []
+        if batch:
+            _insert_calls(conn, batch)
+
+        with conn:
+            for _, sql in triggers:
+                conn.execute(sql)
+            rebuild_rollups(conn)
+            rebuild_fulltext(conn)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+# Function to insert a batch of generated calls
+def _insert_calls(conn, batch):
+    with conn:
+        conn.executemany(INSERT_CALL_SQL, [incident + (to_epoch(incident[2]),) for incident in batch])
+
+
+# Function to count the calls in an existing database
+def call_count(path):
+    """Return the number of calls in the database at `path`, or None if it cannot be read."""
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM Calls").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
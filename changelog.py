@@ -0,0 +1,189 @@
+"""
+Change log of the Calls table.
+
+Triggers on Calls (created by migration 8) append one row to Call_Changes for every insert,
+update and delete, in the same transaction as the change, whichever code path makes it. Each row gets an increasing seq
+number, so a consumer (e.g. the columnar snapshot in columnar.py) only has to remember the last
+seq it has applied and read the call_keys changed since.
+
+Calls moved to the archive (see archive.py) are not logged as deleted: they still exist.
+
+Retention: consumers record the last seq they applied in Sync_Checkpoints (the ArcGIS sync worker
+and every columnar snapshot), and prune_consumed() deletes the changes that all of them have
+applied and that are older than RETENTION_SECONDS. The latter keeps the recent changes for the live
+boards, which poll with a watermark but register nowhere; a board whose watermark was pruned
+reloads its page. The sync worker and the snapshot refreshes prune after each run. A consumer that
+is retired must have its Sync_Checkpoints row deleted, or the log keeps everything after it.
+
+The CSV loader does not log the calls it inserts (see loader.py): it resets the log instead, and
+every consumer starts over as if its position had been pruned (see reset_log()).
+
+Usage:
+    python changelog.py --db database/911_Call_Data.db --prune
+    python changelog.py --db database/911_Call_Data.db --prune-before 123456
+"""
+import argparse
+import sqlite3
+import time
+
+# Seconds of changes kept whatever the consumers, for the live boards (see backend.incident_changes)
+RETENTION_SECONDS = 3600
+
+# Function to get the newest seq
+def last_seq(conn):
+    """
+    Return the seq of the newest change ever logged (0 if none), including pruned ones.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+
+    Returns:
+    - int: The seq.
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'Call_Changes'").fetchone()
+    return row[0] if row else 0
+
+
+# Function to check whether the changes after a seq are still all in the log
+def has_changes_since(conn, seq):
+    """
+    Check that no change newer than seq has been pruned from the log.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - seq (int): The last seq a consumer has applied.
+
+    Returns:
+    - bool: True if every change after seq can still be read with changed_keys().
+    """
+    oldest = conn.execute("SELECT MIN(seq) FROM Call_Changes").fetchone()[0]
+    if oldest is None:
+        return seq >= last_seq(conn)  # Empty log: fine only if nothing was pruned after seq
+    return oldest <= seq + 1
+
+
+# Function to list the calls changed in a range of seqs
+def changed_keys(conn, after_seq, upto_seq=None):
+    """
+    Return the call_keys changed after one seq, up to another.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - after_seq (int): Exclusive lower bound.
+    - upto_seq (int, optional): Inclusive upper bound. Defaults to no bound.
+
+    Returns:
+    - list of str: Each changed call_key once, in the order of its first change.
+    """
+    rows = conn.execute("SELECT call_key FROM Call_Changes WHERE seq > ? AND (? IS NULL OR seq <= ?) "
+                        "GROUP BY call_key ORDER BY MIN(seq)", (after_seq, upto_seq, upto_seq))
+    return [call_key for call_key, in rows]
+
+
+# Function to record that calls were written without being logged
+def reset_log(conn):
+    """
+    Empty the log and skip one seq, after calls were inserted without being logged (see
+    loader.load_chunk). Every consumer then finds the changes after its position pruned and starts
+    over: live boards reload their page, columnar snapshots are rebuilt in full, and each ArcGIS
+    sync worker runs its backfill again (its '<consumer>:backfill' row is deleted) to find the dirty
+    calls. The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+
+    Returns:
+        None
+    """
+    conn.execute("DELETE FROM Call_Changes")
+    if not conn.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'Call_Changes'").rowcount:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('Call_Changes', 1)")
+    conn.execute("DELETE FROM Sync_Checkpoints WHERE name LIKE '%:backfill'")
+
+
+# Function to drop old changes
+def prune_changes(conn, before_seq):
+    """
+    Delete the changes with a seq lower than before_seq, once every consumer has applied them.
+    The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - before_seq (int): The first seq to keep.
+
+    Returns:
+    - int: The number of changes deleted.
+    """
+    return conn.execute("DELETE FROM Call_Changes WHERE seq < ?", (before_seq,)).rowcount
+
+
+# Function to record the progress of a consumer
+def set_checkpoint(conn, name, seq):
+    """
+    Record in Sync_Checkpoints that a consumer applied every change up to seq, so that
+    prune_consumed() keeps the changes it has not applied yet. The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - name (str): The consumer, e.g. 'arcgis'.
+    - seq (int): The last seq it applied.
+
+    Returns:
+        None
+    """
+    conn.execute("""
+        INSERT INTO Sync_Checkpoints (name, last_seq, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET last_seq = excluded.last_seq, updated_at = excluded.updated_at
+    """, (name, seq, int(time.time())))
+
+
+# Function to drop the changes every consumer has applied
+def prune_consumed(conn, retention=RETENTION_SECONDS, now=None):
+    """
+    Delete the changes applied by every consumer in Sync_Checkpoints and logged more than
+    `retention` seconds ago. Without any consumer, only the retention applies. Rows named
+    '<consumer>:backfill' mark a finished backfill, not a position in the log, and are ignored.
+    The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - retention (float, optional): Seconds of changes always kept. Defaults to RETENTION_SECONDS.
+    - now (int, optional): The current epoch. Defaults to the clock.
+
+    Returns:
+    - int: The number of changes deleted.
+    """
+    consumed = conn.execute("SELECT MIN(last_seq) FROM Sync_Checkpoints WHERE name NOT LIKE '%:backfill'").fetchone()[0]
+    if consumed is None:
+        consumed = last_seq(conn)
+    cutoff = (time.time() if now is None else now) - retention
+    return conn.execute("DELETE FROM Call_Changes WHERE seq <= ? AND changed_at < ?", (consumed, cutoff)).rowcount
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Inspect or prune the Calls change log.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--prune', action='store_true', help="Delete the changes every consumer has applied.")
+    parser.add_argument('--prune-before', type=int, help="Delete the changes with a lower seq.")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate(conn)
+        if args.prune_before is not None:
+            with conn:
+                print(f"Pruned {prune_changes(conn, args.prune_before):,} changes.")
+        if args.prune:
+            with conn:
+                print(f"Pruned {prune_consumed(conn):,} applied changes.")
+        count = conn.execute("SELECT COUNT(*) FROM Call_Changes").fetchone()[0]
+        print(f"{count:,} changes logged, last seq {last_seq(conn)}.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
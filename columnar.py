@@ -0,0 +1,457 @@
+"""
+Columnar analytics snapshot of the calls, for the dashboard's 'columnar' engine.
+
+The dashboard charts are analytical scans (group, count, bucket by time) that a column store
+answers much faster than row-oriented SQLite. This module keeps a DuckDB copy of the columns the
+charts need: Calls joined with Locations and Jurisdictions, archived calls included. The snapshot
+lives next to the SQLite database (database/911_Call_Data.duckdb) and is refreshed from the Calls
+change log (see changelog.py): only the calls changed since the last refresh are re-read, from the
+hot table or the archive partitions they moved to, and Arrow batches carry them from SQLite into
+DuckDB. It is rebuilt from scratch the first time, or when too many calls changed or the log no
+longer covers them.
+
+The dashboard does not wait for refreshes: aggregate() serves the snapshot as it is and, once it is
+more than MAX_STALENESS seconds old, refreshes it in a background thread with its own connection.
+Only the very first build (or an in-memory database) is refreshed in the request.
+
+A snapshot stored in a file records its position in Sync_Checkpoints, so the change log keeps the
+changes it has not applied yet, and prunes the log after each refresh.
+
+Like the rollups, the snapshot assumes Locations and Jurisdictions rows are not edited in place;
+after such an edit, run `python columnar.py --rebuild`.
+
+DuckDB and pyarrow are optional dependencies: they are only needed for the 'columnar' engine.
+DuckDB allows a single process to open a snapshot for writing.
+
+Usage:
+    python columnar.py --db database/911_Call_Data.db --refresh
+    python columnar.py --db database/911_Call_Data.db --rebuild
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import archive
+import changelog
+
+try:
+    import duckdb
+    import pyarrow as pa
+except ImportError:  # Only the columnar engine needs them
+    duckdb = pa = None
+
+logger = logging.getLogger('columnar')
+logger.addHandler(logging.NullHandler())
+
+# One snapshot row per call, with the lookup attributes the charts group by. The LEFT JOINs leave
+# district / neighborhood / location_id NULL when the lookup row does not exist, which is how the
+# charts skip those calls.
+SNAPSHOT_QUERY = """
+    SELECT C.call_key, C.call_epoch, C.priority, C.jurisdiction_id, J.district, L.location_id, L.neighborhood
+    FROM {schema}.Calls C
+    LEFT JOIN main.Jurisdictions J ON J.jurisdiction_id = C.jurisdiction_id
+    LEFT JOIN main.Locations L ON L.location_id = C.reporter_location_id
+"""
+
+SNAPSHOT_COLUMNS = (('call_key', 'VARCHAR'), ('call_epoch', 'BIGINT'), ('priority', 'VARCHAR'),
+                    ('jurisdiction_id', 'BIGINT'), ('district', 'VARCHAR'), ('location_id', 'BIGINT'),
+                    ('neighborhood', 'VARCHAR'))
+
+# name: (key columns, the aggregate of rollups.ROLLUPS[name] over the snapshot). {where} adds filters.
+AGGREGATES = {
+    'priority': (('priority',), """
+        SELECT priority, COUNT(*) AS count FROM calls
+        WHERE priority IS NOT NULL {where} GROUP BY priority
+    """),
+    'hour': (('hour',), """
+        SELECT hour(epoch_ms(call_epoch * 1000)) AS hour, COUNT(*) AS count FROM calls
+        WHERE call_epoch IS NOT NULL {where} GROUP BY hour
+    """),
+    'district': (('district',), """
+        SELECT district, COUNT(*) AS count FROM calls
+        WHERE district IS NOT NULL {where} GROUP BY district
+    """),
+    'neighborhood': (('neighborhood',), """
+        SELECT neighborhood, COUNT(*) AS count FROM calls
+        WHERE neighborhood IS NOT NULL {where} GROUP BY neighborhood
+    """),
+    'location': (('location_id',), """
+        SELECT location_id, COUNT(*) AS count FROM calls
+        WHERE location_id IS NOT NULL {where} GROUP BY location_id
+    """),
+    'date_priority': (('date', 'priority'), """
+        SELECT {bucket} AS date, priority, COUNT(*) AS count FROM calls
+        WHERE call_epoch IS NOT NULL AND priority IS NOT NULL {where} GROUP BY date, priority
+    """),
+}
+
+# Time bucket -> label of a call's bucket, like dashboard_data.TIME_BUCKETS (UTC, weeks start on Monday)
+TIME_BUCKETS = {
+    'hour': "strftime(epoch_ms(call_epoch * 1000), '%Y-%m-%d %H:00')",
+    'day': "strftime(epoch_ms(call_epoch * 1000), '%Y-%m-%d')",
+    'week': "strftime(date_trunc('week', epoch_ms(call_epoch * 1000)), '%Y-%m-%d')",
+    'month': "strftime(epoch_ms(call_epoch * 1000), '%Y-%m-01')",
+}
+
+# Rows read from SQLite per Arrow batch
+BATCH_SIZE = 100000
+
+# Seconds the dashboard may serve a snapshot before it is refreshed in the background
+MAX_STALENESS = 30
+
+# Name of the snapshot's position in the change log, in Sync_Checkpoints (see changelog.prune_consumed())
+CHECKPOINT_NAME = 'columnar'
+
+
+# Function to convert SQLite rows to an Arrow table
+def _arrow_batch(rows):
+    columns = list(zip(*rows)) if rows else [()] * len(SNAPSHOT_COLUMNS)
+    types = {'VARCHAR': pa.string(), 'BIGINT': pa.int64()}
+    return pa.table({name: pa.array(values, type=types[kind])
+                     for (name, kind), values in zip(SNAPSHOT_COLUMNS, columns)})
+
+
+# Function to get the path of the main SQLite database
+def database_path(conn):
+    """
+    Return the file of the main database of a connection ("" for an in-memory database).
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection.
+
+    Returns:
+    - str: The absolute path.
+    """
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path or ""
+    return ""
+
+
+class ColumnarSnapshot:
+    """
+    A DuckDB snapshot of the calls, refreshed incrementally from the SQLite change log.
+
+    Parameters:
+    - path (str): The DuckDB file, or ":memory:".
+    - rebuild_ratio (float, optional): Rebuild from scratch instead of applying the changes when
+      more than this fraction of the snapshot changed. Defaults to 0.2.
+    """
+
+    def __init__(self, path, rebuild_ratio=0.2):
+        if duckdb is None:
+            raise RuntimeError("The columnar engine needs the duckdb and pyarrow packages "
+                               "(pip install duckdb pyarrow).")
+        self.path = path
+        self.rebuild_ratio = rebuild_ratio
+        # A DuckDB connection must not be used by two threads at once: refreshes write through
+        # _duck and aggregates read through their own cursor, so a refresh never blocks the charts
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._duck = duckdb.connect(path)
+        self._duck.execute("CREATE TABLE IF NOT EXISTS snapshot_meta (last_seq BIGINT, refreshed_at DOUBLE)")
+        self._duck.execute(self._table_sql('calls'))
+        self._reader = self._duck.cursor()
+        self._checked_at = None  # time.monotonic() of the last refresh by this process
+        self._refresher = None
+
+    @staticmethod
+    def _table_sql(table):
+        columns = ', '.join(f"{name} {kind}" for name, kind in SNAPSHOT_COLUMNS)
+        return f"CREATE TABLE IF NOT EXISTS {table} ({columns})"
+
+    def _last_seq(self):
+        row = self._duck.execute("SELECT last_seq FROM snapshot_meta").fetchone()
+        return None if row is None else row[0]
+
+    def built(self):
+        """
+        Return whether the snapshot holds a copy of the calls, i.e. has been refreshed at least once.
+
+        Returns:
+        - bool: False for a new snapshot file.
+        """
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM snapshot_meta").fetchone()[0] > 0
+
+    def age(self):
+        """
+        Return the seconds since this process last brought the snapshot up to date.
+
+        Returns:
+        - float: None if it has not refreshed the snapshot yet.
+        """
+        return None if self._checked_at is None else time.monotonic() - self._checked_at
+
+    def _set_last_seq(self, seq):
+        self._duck.execute("DELETE FROM snapshot_meta")
+        self._duck.execute("INSERT INTO snapshot_meta VALUES (?, ?)", (seq, time.time()))
+
+    def _insert(self, table, rows):
+        batch = _arrow_batch(rows)
+        self._duck.register('arrow_batch', batch)
+        try:
+            self._duck.execute(f"INSERT INTO {table} SELECT * FROM arrow_batch")
+        finally:
+            self._duck.unregister('arrow_batch')
+
+    def _rebuild(self, conn):
+        # Changes committed while the stores are read get a higher seq, and are re-applied next time
+        seq = changelog.last_seq(conn)
+        self._duck.execute("DROP TABLE IF EXISTS calls_new")
+        self._duck.execute(self._table_sql('calls_new'))
+        count = 0
+
+        def copy(cursor):
+            nonlocal count
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                self._insert('calls_new', rows)
+                count += len(rows)
+
+        copy(conn.execute(SNAPSHOT_QUERY.format(schema='main')))
+        for _, path, _, _, _ in archive.partitions(conn):
+            with archive.attached(conn, [path]) as (name,):
+                copy(conn.execute(SNAPSHOT_QUERY.format(schema=name)))
+
+        self._duck.execute("BEGIN TRANSACTION")
+        self._duck.execute("DROP TABLE calls")
+        self._duck.execute("ALTER TABLE calls_new RENAME TO calls")
+        self._set_last_seq(seq)
+        self._duck.execute("COMMIT")
+        return count
+
+    @staticmethod
+    def _read_calls(conn, call_keys):
+        # Changed calls are usually hot, but a call may have been archived since it changed: only
+        # the keys missing from Calls are looked up in the partitions (deleted calls are in neither)
+        sql = SNAPSHOT_QUERY + " WHERE C.call_key IN (SELECT value FROM json_each(?))"
+        rows = conn.execute(sql.format(schema='main'), (json.dumps(call_keys),)).fetchall()
+        missing = set(call_keys).difference(row[0] for row in rows)
+        if missing:
+            rows += archive.query_stores(conn, sql, (json.dumps(sorted(missing)),))
+        return rows
+
+    def _apply(self, conn, call_keys, seq):
+        self._duck.execute("BEGIN TRANSACTION")
+        try:
+            for i in range(0, len(call_keys), BATCH_SIZE):
+                chunk = call_keys[i:i + BATCH_SIZE]
+                rows = self._read_calls(conn, chunk)
+                keys = pa.table({'call_key': pa.array(chunk, type=pa.string())})
+                self._duck.register('changed_keys', keys)
+                try:
+                    self._duck.execute("DELETE FROM calls WHERE call_key IN (SELECT call_key FROM changed_keys)")
+                finally:
+                    self._duck.unregister('changed_keys')
+                if rows:
+                    self._insert('calls', rows)
+            self._set_last_seq(seq)
+            self._duck.execute("COMMIT")
+        except BaseException:
+            self._duck.execute("ROLLBACK")
+            raise
+
+    def refresh(self, conn, full=False):
+        """
+        Bring the snapshot up to date with the SQLite database.
+
+        Parameters:
+        - conn (sqlite3.Connection): An open connection to the SQLite database, outside of a transaction.
+        - full (bool, optional): Rebuild from scratch. Defaults to False.
+
+        Returns:
+        - dict: mode ('none', 'incremental' or 'full'), rows (calls written), last_seq and elapsed seconds.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            applied = self._last_seq()
+            seq = changelog.last_seq(conn)
+            if not full and applied is not None and applied == seq:
+                mode, rows = 'none', 0
+            else:
+                call_keys = None
+                if not full and applied is not None and applied < seq and changelog.has_changes_since(conn, applied):
+                    call_keys = changelog.changed_keys(conn, applied, seq)
+                    size = self._duck.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+                    if len(call_keys) > self.rebuild_ratio * max(size, 1):
+                        call_keys = None  # Cheaper to start over
+                if call_keys is None:
+                    mode, rows = 'full', self._rebuild(conn)
+                else:
+                    mode, rows = 'incremental', len(call_keys)
+                    self._apply(conn, call_keys, seq)
+            if mode != 'none' and self.path != ':memory:':  # Keep its unapplied changes in the log
+                with conn:
+                    changelog.set_checkpoint(conn, CHECKPOINT_NAME, seq)
+                    changelog.prune_consumed(conn)
+            self._checked_at = time.monotonic()
+        return {'mode': mode, 'rows': rows, 'last_seq': seq, 'elapsed': time.perf_counter() - started}
+
+    def _refresh_from(self, db_path):
+        from db import ConnectionPool
+
+        try:
+            conn = ConnectionPool(db_path, pool_size=1, auto_migrate=False).open_connection()
+            try:
+                self.refresh(conn)
+            finally:
+                conn.close()
+        except Exception:
+            logger.exception("Background refresh of the columnar snapshot of %s failed", db_path)
+
+    def refresh_in_background(self, db_path):
+        """
+        Start refreshing the snapshot in a daemon thread with its own connection, unless a
+        background refresh is already running. Aggregates keep reading the current snapshot meanwhile.
+
+        Parameters:
+        - db_path (str): The SQLite database file.
+
+        Returns:
+        - threading.Thread: The refresh thread, or None if one was already running.
+        """
+        with self._read_lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return None
+            self._refresher = threading.Thread(target=self._refresh_from, args=(db_path,),
+                                               name="columnar-refresh", daemon=True)
+            self._refresher.start()
+            return self._refresher
+
+    def aggregate(self, name, start=None, end=None, jurisdiction_id=None, bucket='day'):
+        """
+        Compute one dashboard aggregate (see rollups.ROLLUPS) from the snapshot.
+
+        Parameters:
+        - name (str): One of the keys of AGGREGATES.
+        - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+        - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+        - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+        - bucket (str, optional): Time bucket of 'date_priority', one of TIME_BUCKETS. Defaults to 'day'.
+
+        Returns:
+        - pandas.DataFrame: The key columns and count of every group.
+        """
+        _, sql = AGGREGATES[name]
+        clauses, params = [], []
+        if jurisdiction_id is not None:
+            clauses.append("AND jurisdiction_id = ?")
+            params.append(jurisdiction_id)
+        if start is not None:
+            clauses.append("AND call_epoch >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("AND call_epoch < ?")
+            params.append(end)
+        sql = sql.format(where=' '.join(clauses), bucket=TIME_BUCKETS[bucket])
+        with self._read_lock:
+            return self._reader.execute(sql, params).df()
+
+    def close(self):
+        refresher = self._refresher
+        if refresher is not None:
+            refresher.join()
+        with self._lock, self._read_lock:
+            self._reader.close()
+            self._duck.close()
+
+
+# Open snapshots by SQLite database path, shared by the whole process
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+# Function to get the snapshot of a SQLite database
+def snapshot_for(conn):
+    """
+    Return the shared snapshot of the database behind conn, opening it the first time.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the SQLite database.
+
+    Returns:
+    - ColumnarSnapshot: Stored next to the database file, with the .duckdb extension (in memory
+      for an in-memory database).
+    """
+    db_path = database_path(conn)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(db_path)
+        if snapshot is None:
+            path = os.path.splitext(db_path)[0] + '.duckdb' if db_path else ':memory:'
+            snapshot = _snapshots[db_path] = ColumnarSnapshot(path)
+    return snapshot
+
+
+# Function to compute a dashboard aggregate from a recent snapshot
+def aggregate(conn, name, start=None, end=None, jurisdiction_id=None, bucket='day', max_staleness=MAX_STALENESS):
+    """
+    Compute one dashboard aggregate from the snapshot of the database behind conn.
+
+    The snapshot is only refreshed in the request when it has never been built (or the database is
+    in memory). Otherwise it is served as it is, and refreshed in the background when it is older
+    than max_staleness seconds: the aggregate may miss the writes of the last max_staleness seconds
+    plus the duration of a refresh.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the SQLite database, outside of a transaction.
+    - name (str): One of the keys of AGGREGATES.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+    - bucket (str, optional): Time bucket of 'date_priority', one of TIME_BUCKETS. Defaults to 'day'.
+    - max_staleness (float, optional): Seconds after which the snapshot is refreshed in the
+      background. Defaults to MAX_STALENESS.
+
+    Returns:
+    - pandas.DataFrame: The key columns and count of every group.
+    """
+    snapshot = snapshot_for(conn)
+    db_path = database_path(conn)
+    if not db_path or not snapshot.built():
+        snapshot.refresh(conn)  # Nothing to serve yet, or no other connection can see the database
+    else:
+        age = snapshot.age()
+        if age is None or age > max_staleness:
+            snapshot.refresh_in_background(db_path)
+    return snapshot.aggregate(name, start, end, jurisdiction_id, bucket)
+
+
+# Function to close every open snapshot
+def close_snapshots():
+    """
+    Close the snapshots opened by snapshot_for(), e.g. before the DuckDB files are moved or deleted.
+    """
+    with _snapshots_lock:
+        for snapshot in _snapshots.values():
+            snapshot.close()
+        _snapshots.clear()
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH, ConnectionPool
+
+    parser = argparse.ArgumentParser(description="Refresh or rebuild the columnar snapshot used by the dashboard.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--refresh', action='store_true', help="Apply the changes since the last refresh.")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the snapshot from scratch.")
+    args = parser.parse_args(argv)
+
+    conn = ConnectionPool(args.db, pool_size=1).open_connection()  # Applies PRAGMAs and migrations
+    try:
+        if args.refresh or args.rebuild:
+            summary = snapshot_for(conn).refresh(conn, full=args.rebuild)
+            print(f"Snapshot refresh ({summary['mode']}): {summary['rows']:,} calls written "
+                  f"in {summary['elapsed']:.2f} s, up to change {summary['last_seq']}.")
+    finally:
+        close_snapshots()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
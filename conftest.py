@@ -0,0 +1,20 @@
+import pytest
+
+import db
+
+
+# Fixture pointing the shared connection pool at a fresh, fully migrated temporary database
+@pytest.fixture
+def temp_db(tmp_path):
+    path = str(tmp_path / "911_Call_Data.db")
+    db.configure(path)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO Jurisdictions (district, police_district, police_post, council_district, "
+                         "sheriff_district) VALUES (?, ?, ?, ?, ?)",
+                         [("CD", "Central", "111", "11", "D1"), ("ED", "Eastern", "222", "12", "D2")])
+        conn.executemany("INSERT INTO Locations (address, neighborhood, zip_code, census_tract, "
+                         "community_statistical_area) VALUES (?, ?, ?, ?, ?)",
+                         [("100 MAIN ST", "Downtown", "21201", "401", "Downtown"),
+                          ("200 OAK ST", "Midtown", "21202", "402", "Midtown")])
+    yield path
+    db.configure()  # Back to the default database
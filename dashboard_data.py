@@ -0,0 +1,376 @@
+"""
+Data access for the dashboard charts.
+
+Every chart gets a small, already-aggregated DataFrame. Three engines are available:
+
+- 'rollup' (default) reads the trigger-maintained Rollup_* tables (see rollups.py), so the cost
+  does not depend on the number of calls.
+- 'sql' pushes the GROUP BY down into SQLite over the indexed Calls columns. It needs no rollups
+  and is used to cross-check them.
+- 'columnar' runs the GROUP BY in DuckDB over an incrementally refreshed columnar snapshot (see
+  columnar.py). It needs the optional duckdb and pyarrow packages, and is the fastest engine for
+  time-ranged charts. The snapshot is refreshed in the background, so it may lag the latest writes
+  by up to columnar.MAX_STALENESS seconds.
+
+Charts can be limited to a time window (start/end epochs) and a jurisdiction. Rollups hold
+all-time totals, so a filtered chart is aggregated with SQL over the hot Calls table and only the
+archive partitions that overlap the window (see archive.aggregate()), or from the columnar
+snapshot. Payloads stay small whatever the window: the priority time series is bucketed by hour,
+day, week or month to stay under a number of points, and the neighborhood and location charts
+can keep their top N bars and sum the rest into an "Other" bar.
+
+Neither engine loads Calls rows into pandas. Frames use compact dtypes: categorical labels and
+32-bit counts.
+"""
+import math
+
+import pandas as pd
+
+import columnar
+from archive import aggregate, partitions
+from db import connection
+from query_cache import cached
+from rollups import ROLLUPS
+
+ENGINES = ('rollup', 'sql', 'columnar')
+
+# Time bucket -> (approximate length in seconds, SQLite label of a call's bucket, label format).
+# Buckets are UTC; weeks start on Monday.
+TIME_BUCKETS = {
+    'hour': (3600, "strftime('%Y-%m-%d %H:00', call_epoch, 'unixepoch')", '%Y-%m-%d %H:%M'),
+    'day': (86400, "date(call_epoch, 'unixepoch')", '%Y-%m-%d'),
+    'week': (7 * 86400, "date(call_epoch, 'unixepoch', 'weekday 0', '-6 days')", '%Y-%m-%d'),
+    'month': (30.44 * 86400, "strftime('%Y-%m-01', call_epoch, 'unixepoch')", '%Y-%m-%d'),
+}
+
+# Bucket -> label of a Rollup_Date_Priority date's bucket, for the buckets the daily rollup can serve
+_ROLLUP_BUCKETS = {
+    'day': "date",
+    'week': "date(date, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', date)",
+}
+
+# The bucketed version of ROLLUPS['date_priority']
+_TIME_SERIES = """
+    SELECT {bucket} AS date, priority, COUNT(*) AS count
+    FROM Calls
+    WHERE call_epoch IS NOT NULL AND priority IS NOT NULL
+    GROUP BY date, priority
+"""
+
+# Label of the bar that sums the groups beyond the top N
+OTHER = "Other"
+
+
+# Function to read one aggregate as a compact DataFrame
+def _aggregate(conn, name, engine, start=None, end=None, jurisdiction_id=None, bucket='day'):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown dashboard engine {engine!r}; expected one of {', '.join(ENGINES)}.")
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unknown time bucket {bucket!r}; expected one of {', '.join(TIME_BUCKETS)}.")
+
+    table, keys, sql = ROLLUPS[name]
+    if engine == 'columnar':
+        return columnar.aggregate(conn, name, start, end, jurisdiction_id, bucket)
+
+    unfiltered = start is None and end is None and jurisdiction_id is None
+    if name == 'date_priority':
+        if engine == 'rollup' and unfiltered and bucket in _ROLLUP_BUCKETS:
+            return pd.read_sql_query(f"SELECT {_ROLLUP_BUCKETS[bucket]} AS bucket, priority, SUM(count) AS count "
+                                     f"FROM {table} GROUP BY bucket, priority", conn).rename(columns={'bucket': 'date'})
+        sql = _TIME_SERIES.format(bucket=TIME_BUCKETS[bucket][1])
+    elif engine == 'rollup' and unfiltered:
+        return pd.read_sql_query(f"SELECT {', '.join(keys)}, count FROM {table}", conn)
+
+    where, where_params = ("jurisdiction_id = ?", (jurisdiction_id,)) if jurisdiction_id is not None else (None, ())
+    rows = aggregate(conn, sql, start=start, end=end, where=where, where_params=where_params)
+    return pd.DataFrame(rows, columns=[*keys, 'count'])
+
+
+# Function to shrink a frame's dtypes
+def _compact(df, labels=(), integers=()):
+    for column in labels:
+        df[column] = df[column].astype('category')
+    for column in integers:
+        df[column] = df[column].astype('int32')
+    df['count'] = df['count'].astype('int32')
+    return df
+
+
+# Function to keep the largest groups and sum the others
+def _top(df, column, top):
+    """
+    Keep the `top` largest groups, ordered by count, followed by one OTHER row summing the rest.
+
+    The labels are converted to text, so that OTHER fits in the same column.
+    """
+    df = df.sort_values(['count', column], ascending=[False, True], ignore_index=True)
+    df[column] = df[column].astype(str)
+    if len(df) <= top:
+        return df
+    other = pd.DataFrame({column: [OTHER], 'count': [df['count'].iloc[top:].sum()]})
+    return pd.concat([df.iloc[:top], other], ignore_index=True)
+
+
+# Function to get the time range covered by the calls
+def data_span(conn, start=None, end=None):
+    """
+    Return the time range a chart covers: the given bounds, or those of the data (hot and archived).
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - start (int, optional): Epoch lower bound. Defaults to the oldest call.
+    - end (int, optional): Epoch upper bound. Defaults to just after the newest call.
+
+    Returns:
+    - tuple: (start, end) epochs, or (None, None) if there are no timed calls.
+    """
+    if start is None or end is None:
+        oldest, newest = conn.execute("SELECT (SELECT MIN(call_epoch) FROM Calls), "
+                                      "(SELECT MAX(call_epoch) FROM Calls)").fetchone()
+        cold = partitions(conn)
+        if cold:
+            oldest = min([cold[-1][2]] + ([oldest] if oldest is not None else []))
+            newest = max([cold[0][3] - 1] + ([newest] if newest is not None else []))
+        if oldest is None:
+            return None, None
+        start = oldest if start is None else start
+        end = newest + 1 if end is None else end
+    return start, end
+
+
+# Function to pick the time bucket of a time series
+def choose_bucket(start, end, max_points):
+    """
+    Pick the finest time bucket that splits [start, end) in at most max_points buckets.
+
+    Parameters:
+    - start (int or None): Epoch lower bound.
+    - end (int or None): Epoch upper bound (exclusive).
+    - max_points (int): Maximum number of buckets per series.
+
+    Returns:
+    - str: 'hour', 'day', 'week' or 'month' (the coarsest bucket when none is fine enough).
+    """
+    if max_points < 1:
+        raise ValueError("max_points must be at least 1.")
+    if start is None or end is None:
+        return 'day'
+    for bucket, (seconds, _, _) in TIME_BUCKETS.items():
+        if math.ceil(max(end - start, 1) / seconds) <= max_points:
+            return bucket
+    return 'month'
+
+
+# Function to get the priority distribution
+def priority_counts(conn, engine='rollup', start=None, end=None, jurisdiction_id=None):
+    """
+    Number of calls per priority, largest first.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+
+    Returns:
+    - pandas.DataFrame: Columns priority, count.
+    """
+    df = _aggregate(conn, 'priority', engine, start, end, jurisdiction_id).sort_values(
+        ['count', 'priority'], ascending=[False, True], ignore_index=True)  # Ties in a stable order
+    return _compact(df, labels=['priority'])
+
+
+# Function to get the calls per hour of day
+def hourly_counts(conn, engine='rollup', start=None, end=None, jurisdiction_id=None):
+    """
+    Number of calls per hour of day (0-23, UTC).
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+
+    Returns:
+    - pandas.DataFrame: Columns hour, count, ordered by hour.
+    """
+    df = _aggregate(conn, 'hour', engine, start, end, jurisdiction_id).sort_values('hour', ignore_index=True)
+    return _compact(df, integers=['hour'])
+
+
+# Function to get the calls per district
+def district_counts(conn, engine='rollup', start=None, end=None, jurisdiction_id=None):
+    """
+    Number of calls per district.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+
+    Returns:
+    - pandas.DataFrame: Columns district, count, ordered by district. Calls whose jurisdiction has
+      no district are not counted.
+    """
+    df = _aggregate(conn, 'district', engine, start, end, jurisdiction_id).sort_values('district', ignore_index=True)
+    return _compact(df, labels=['district'])
+
+
+# Function to get the calls per reporter neighborhood
+def neighborhood_counts(conn, engine='rollup', start=None, end=None, jurisdiction_id=None, top=None):
+    """
+    Number of calls per reporter neighborhood.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+    - top (int, optional): Keep the top neighborhoods and sum the others into an "Other" row.
+      Defaults to every neighborhood.
+
+    Returns:
+    - pandas.DataFrame: Columns neighborhood, count, ordered by neighborhood (by count, with
+      "Other" last, when top is given). Calls whose reporter location has no neighborhood are not
+      counted.
+    """
+    df = _aggregate(conn, 'neighborhood', engine, start, end, jurisdiction_id)
+    df = _top(df, 'neighborhood', top) if top is not None else df.sort_values('neighborhood', ignore_index=True)
+    return _compact(df, labels=['neighborhood'])
+
+
+# Function to get the calls per priority over time
+def priority_over_time(conn, engine='rollup', start=None, end=None, jurisdiction_id=None, bucket=None,
+                       max_points=None):
+    """
+    Number of calls per time bucket and priority.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+    - bucket (str, optional): 'hour', 'day', 'week' or 'month'. Defaults to the finest bucket that
+      keeps each series within max_points, or 'day' without max_points.
+    - max_points (int, optional): Maximum number of buckets per priority when bucket is not given.
+
+    Returns:
+    - pandas.DataFrame: Columns date (datetime64, start of the bucket), priority, count, ordered by
+      date. The bucket used is in df.attrs['bucket'].
+    """
+    if bucket is None:
+        bucket = 'day' if max_points is None else choose_bucket(*data_span(conn, start, end), max_points)
+    df = _aggregate(conn, 'date_priority', engine, start, end, jurisdiction_id, bucket)
+    df = df.sort_values(['date', 'priority'], ignore_index=True)
+    df['date'] = pd.to_datetime(df['date'], format=TIME_BUCKETS[bucket][2])  # One value per bucket, not per call
+    df = _compact(df, labels=['priority'])
+    df.attrs['bucket'] = bucket
+    return df
+
+
+# Function to get the calls per reporter location
+def location_counts(conn, engine='rollup', start=None, end=None, jurisdiction_id=None, top=None):
+    """
+    Number of calls per reporter location.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+    - top (int, optional): Keep the top locations and sum the others into an "Other" row.
+      Defaults to every location.
+
+    Returns:
+    - pandas.DataFrame: Columns location_id, count, ordered by location_id. With top, location_id
+      holds text labels ordered by count, with "Other" last.
+    """
+    df = _aggregate(conn, 'location', engine, start, end, jurisdiction_id)
+    if top is not None:
+        return _compact(_top(df, 'location_id', top), labels=['location_id'])
+    return _compact(df.sort_values('location_id', ignore_index=True), integers=['location_id'])
+
+
+# Chart name -> function, in the order the dashboard draws them
+CHARTS = {
+    'priority': priority_counts,
+    'hour': hourly_counts,
+    'district': district_counts,
+    'neighborhood': neighborhood_counts,
+    'priority_over_time': priority_over_time,
+    'location': location_counts,
+}
+
+
+# Function to load the data of every chart
+def load_dashboard(conn, engine='rollup', start=None, end=None, jurisdiction_id=None, max_points=None, top=None):
+    """
+    Load the data of all six dashboard charts.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - engine (str, optional): 'rollup', 'sql' or 'columnar'. Defaults to 'rollup'.
+    - start (int, optional): Count only calls at or after this epoch. Defaults to no bound.
+    - end (int, optional): Count only calls strictly before this epoch. Defaults to no bound.
+    - jurisdiction_id (int, optional): Count only calls in this jurisdiction. Defaults to all.
+    - max_points (int, optional): Maximum number of buckets per priority in the time series.
+      Defaults to daily buckets.
+    - top (int, optional): Number of bars kept in the neighborhood and location charts, before
+      the "Other" bar. Defaults to every bar.
+
+    Returns:
+    - dict: Maps each key of CHARTS to its DataFrame.
+    """
+    options = {'priority_over_time': {'max_points': max_points}, 'neighborhood': {'top': top}, 'location': {'top': top}}
+    return {name: load(conn, engine, start, end, jurisdiction_id, **options.get(name, {}))
+            for name, load in CHARTS.items()}
+
+
+# Function to load the dashboard through the shared query cache
+@cached()
+def get_dashboard(engine='rollup', start=None, end=None, jurisdiction_id=None, max_points=None, top=None):
+    """
+    Load the data of all six dashboard charts on a pooled connection, reusing the cached frames
+    until the data changes or the cache TTL expires. The frames are shared between sessions:
+    callers must not modify them in place.
+
+    Parameters:
+    - engine, start, end, jurisdiction_id, max_points, top: See load_dashboard().
+
+    Returns:
+    - dict: Maps each key of CHARTS to its DataFrame.
+    """
+    with connection() as conn:
+        return load_dashboard(conn, engine, start, end, jurisdiction_id, max_points, top)
+
+
+# Function to load selected Calls columns with compact dtypes
+def call_columns(conn, columns=('priority', 'call_epoch')):
+    """
+    Load only the given Calls columns, for ad-hoc analysis that the aggregates do not cover.
+
+    Text columns become categoricals and call_epoch becomes a UTC datetime64 column named
+    call_time, so a million calls take a few megabytes instead of a full SELECT * frame.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - columns (tuple of str, optional): Calls columns to load. Defaults to priority and call_epoch.
+
+    Returns:
+    - pandas.DataFrame: One row per call with the requested columns.
+    """
+    df = pd.read_sql_query(f"SELECT {', '.join(columns)} FROM Calls", conn)
+    for column in columns:
+        if column == 'call_epoch':
+            df['call_time'] = pd.to_datetime(df.pop('call_epoch'), unit='s', utc=True)
+        elif pd.api.types.is_string_dtype(df[column]):
+            df[column] = df[column].astype('category')
+    return df
@@ -0,0 +1,352 @@
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from fulltext import repair_fulltext
+from instrumentation import InstrumentedConnection
+from migrations import migrate
+
+# Default location of the incident database. It can be overridden with the
+# INCIDENT_DB_PATH environment variable or at runtime with configure().
+DEFAULT_DB_PATH = os.environ.get('INCIDENT_DB_PATH', 'database/911_Call_Data.db')
+
+# PRAGMAs applied once to every new connection when it is opened.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',        # readers never block the writer (and vice versa)
+    'synchronous': 'NORMAL',      # safe with WAL, avoids an fsync on every commit
+    'mmap_size': 268435456,       # 256 MiB of memory-mapped I/O
+    'cache_size': -65536,         # 64 MiB page cache (negative value means KiB)
+    'temp_store': 'MEMORY',
+}
+
+
+# Distinguishes pools in data version tokens (ids of closed pools can be reused)
+_pool_serials = itertools.count(1)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available within the timeout."""
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of persistent SQLite connections.
+
+    Connections are opened lazily up to `pool_size` and then reused. Each connection is
+    opened with `check_same_thread=False` so it can be checked out by any thread (Streamlit
+    runs every session in its own thread), but a connection is only ever used by the thread
+    that currently holds it. PRAGMAs are applied once when a connection is opened, and the
+    connection keeps its prepared statement cache for its whole lifetime.
+
+    Parameters:
+    - db_path (str): Path to the SQLite database file.
+    - pool_size (int, optional): Maximum number of open connections. Defaults to 8.
+    - pragmas (dict, optional): PRAGMAs to apply to every new connection. Defaults to DEFAULT_PRAGMAS.
+    - cached_statements (int, optional): Size of the per-connection prepared statement cache.
+    - busy_timeout (float, optional): Seconds SQLite waits on a locked database before failing.
+    - acquire_timeout (float, optional): Seconds to wait for a free connection before raising PoolTimeoutError.
+    - auto_migrate (bool, optional): Apply pending schema migrations, and rebuild full-text indexes
+      whose rowids drifted (see fulltext.repair_fulltext()), when the first connection is opened.
+      Defaults to True.
+    - instrument (bool, optional): Record every statement in the shared query metrics (see
+      instrumentation.py). Defaults to True.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, pool_size=8, pragmas=None, cached_statements=256,
+                 busy_timeout=30.0, acquire_timeout=30.0, auto_migrate=True, instrument=True):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1.")
+
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.acquire_timeout = acquire_timeout
+        self.auto_migrate = auto_migrate
+        self.instrument = instrument
+
+        self._migrated = not auto_migrate
+        self._migrate_lock = threading.Lock()
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest connections in use
+        self._lock = threading.Lock()
+        self._closed = False
+        self._serial = next(_pool_serials)
+        self._generation = 0      # bumped after every commit made through transaction()
+        self._version_conn = None  # dedicated connection used only for PRAGMA data_version
+        self._version_lock = threading.Lock()
+        self._stats = {
+            'opened': 0,
+            'closed': 0,
+            'in_use': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+        }
+
+    def open_connection(self):
+        """
+        Open a new connection configured like the pooled ones, without adding it to the pool.
+
+        Returns:
+        - sqlite3.Connection: A connection with the pool's PRAGMAs and row factory applied.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements,
+                               factory=InstrumentedConnection if self.instrument else sqlite3.Connection)
+        conn.row_factory = sqlite3.Row  # Ensure we can access columns by name
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+        if not self._migrated:
+            with self._migrate_lock:
+                if not self._migrated:
+                    migrate(conn)
+                    repair_fulltext(conn)  # A VACUUM may have renumbered the rowids of Calls
+                    self._migrated = True
+        return conn
+
+    def acquire(self):
+        """
+        Check a connection out of the pool, opening a new one if the pool is not yet full.
+
+        Raises:
+        - PoolTimeoutError: If every connection stays busy for longer than acquire_timeout.
+
+        Returns:
+        - sqlite3.Connection: A connection reserved for the calling thread until release().
+        """
+        if self._closed:
+            raise RuntimeError("The connection pool has been closed.")
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._stats['opened'] - self._stats['closed'] < self.pool_size:
+                    self._stats['opened'] += 1
+                    opening = True
+                else:
+                    opening = False
+            if opening:
+                try:
+                    conn = self.open_connection()
+                except Exception:
+                    with self._lock:
+                        self._stats['opened'] -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection became available within {self.acquire_timeout} seconds.")
+                with self._lock:
+                    self._stats['waits'] += 1
+                    self._stats['wait_time'] += time.perf_counter() - started
+
+        with self._lock:
+            self._stats['in_use'] += 1
+            self._stats['checkouts'] += 1
+        return conn
+
+    def release(self, conn):
+        """
+        Return a connection to the pool. Any transaction left open is rolled back.
+
+        Parameters:
+        - conn (sqlite3.Connection): A connection previously obtained from acquire().
+        """
+        with self._lock:
+            self._stats['in_use'] -= 1
+
+        if conn.in_transaction:
+            conn.rollback()
+
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._stats['closed'] += 1
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it to the pool.
+
+        Yields:
+        - sqlite3.Connection: A pooled connection.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager that checks out a connection and commits on success or rolls back on error.
+
+        Yields:
+        - sqlite3.Connection: A pooled connection.
+        """
+        with self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()  # Save changes to the database
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                with self._lock:
+                    self._generation += 1
+
+    def data_version(self):
+        """
+        Return a value that changes whenever the database may have changed.
+
+        It combines this pool's commit counter with SQLite's `PRAGMA data_version`, read on a
+        dedicated connection that never writes, so commits made by other connections and other
+        processes are detected as well as the pool's own. Caches use it to tell stale entries apart.
+
+        Returns:
+        - tuple: An opaque, comparable version token.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                                                     check_same_thread=False)
+            external = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+        return (self._serial, self._generation, external)
+
+    def stats(self):
+        """
+        Return a snapshot of the pool's counters.
+
+        Returns:
+        - dict: Pool size, open/idle/in-use connection counts, checkouts, waits and timeouts.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['db_path'] = self.db_path
+        stats['pool_size'] = self.pool_size
+        stats['open'] = stats['opened'] - stats['closed']
+        stats['idle'] = self._idle.qsize()
+        stats['cached_statements'] = self.cached_statements
+        return stats
+
+    def close(self):
+        """
+        Close every idle connection. Connections still checked out are closed when released.
+        """
+        self._closed = True
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._stats['closed'] += 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to (re)configure the shared connection pool
+def configure(db_path=None, **options):
+    """
+    Replace the shared connection pool with a new one.
+
+    The previous pool, if any, is closed. This is how the app, tests and tools point the
+    backend at a different database file.
+
+    Parameters:
+    - db_path (str, optional): Path to the SQLite database file. Defaults to DEFAULT_DB_PATH.
+    - **options: Extra keyword arguments passed to ConnectionPool.
+
+    Returns:
+    - ConnectionPool: The new shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(db_path or DEFAULT_DB_PATH, **options)
+        return _pool
+
+
+# Function to get the shared connection pool
+def get_pool():
+    """
+    Return the shared connection pool, creating it with the default settings on first use.
+
+    Returns:
+    - ConnectionPool: The shared pool.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DEFAULT_DB_PATH)
+    return _pool
+
+
+# Function to check out a pooled connection
+def connection():
+    """
+    Check out a connection from the shared pool.
+
+    Returns:
+    - contextmanager: Yields a sqlite3.Connection and returns it to the pool on exit.
+    """
+    return get_pool().connection()
+
+
+# Function to run statements in a pooled transaction
+def transaction():
+    """
+    Check out a connection from the shared pool and wrap it in a transaction.
+
+    Returns:
+    - contextmanager: Yields a sqlite3.Connection, committing on success and rolling back on error.
+    """
+    return get_pool().transaction()
+
+
+# Function to get the current data version
+def data_version():
+    """
+    Return the shared pool's data version token (see ConnectionPool.data_version()).
+
+    Returns:
+    - tuple: A value that changes whenever the database may have changed.
+    """
+    return get_pool().data_version()
+
+
+# Function to report pool statistics
+def pool_stats():
+    """
+    Return the statistics of the shared pool.
+
+    Returns:
+    - dict: See ConnectionPool.stats().
+    """
+    return get_pool().stats()
@@ -0,0 +1,183 @@
+"""
+Writers for exporting incidents, joined with their locations and jurisdiction, to CSV, NDJSON or
+Parquet files chunk by chunk (see backend.export_incidents()).
+
+CSV and NDJSON files can be compressed with gzip, bz2 or xz; Parquet files with snappy, zstd or
+gzip. Parquet needs the optional pyarrow package.
+
+Usage:
+    python export.py calls.csv.gz --compression gzip --start 2021/12/01 --end 2022/01/01
+    python export.py calls.parquet --format parquet --priority High --description "burg*"
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import sys
+
+from records import INCIDENT_FIELDS, INTEGER_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only Parquet exports need it
+    pa = pq = None
+
+# Exported columns: the incident, its incident and reporter locations, and its jurisdiction
+LOCATION_ATTRIBUTES = ('address', 'neighborhood', 'zip_code', 'census_tract', 'community_statistical_area')
+JURISDICTION_ATTRIBUTES = ('district', 'police_district', 'police_post', 'council_district', 'sheriff_district')
+EXPORT_FIELDS = (INCIDENT_FIELDS + tuple(f"incident_{name}" for name in LOCATION_ATTRIBUTES)
+                 + tuple(f"reporter_{name}" for name in LOCATION_ATTRIBUTES) + JURISDICTION_ATTRIBUTES)
+
+# Select list and joins of the export query, around a subquery C returning Calls rows
+EXPORT_SELECT = (
+    "SELECT " + ", ".join([f"C.{name}" for name in INCIDENT_FIELDS]
+                          + [f"IL.{name} AS incident_{name}" for name in LOCATION_ATTRIBUTES]
+                          + [f"RL.{name} AS reporter_{name}" for name in LOCATION_ATTRIBUTES]
+                          + [f"J.{name}" for name in JURISDICTION_ATTRIBUTES])
+    + " FROM ({calls}) C"
+    " LEFT JOIN main.Locations IL ON IL.location_id = C.incident_location_id"
+    " LEFT JOIN main.Locations RL ON RL.location_id = C.reporter_location_id"
+    " LEFT JOIN main.Jurisdictions J ON J.jurisdiction_id = C.jurisdiction_id"
+)
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+# Compressions of each format; the first one is the default
+COMPRESSIONS = {
+    'csv': (None, 'gzip', 'bz2', 'xz'),
+    'ndjson': (None, 'gzip', 'bz2', 'xz'),
+    'parquet': ('snappy', 'zstd', 'gzip', None),
+}
+_OPENERS = {
+    'gzip': lambda file: gzip.GzipFile(fileobj=file, mode='wb', compresslevel=6),  # gzip's default; 9 is much slower
+    'bz2': lambda file: bz2.BZ2File(file, mode='wb'),
+    'xz': lambda file: lzma.LZMAFile(file, mode='wb'),
+}
+
+
+class ExportWriter:
+    """
+    Writes exported rows (tuples in EXPORT_FIELDS order) to a file, one chunk at a time.
+
+    Use it as a context manager, or call close() to finish the file.
+
+    Parameters:
+    - destination (str or binary file object): The output path, or an open binary file (e.g. a
+      BytesIO), which is left open.
+    - format (str, optional): 'csv', 'ndjson' or 'parquet'. Defaults to 'csv'.
+    - compression (str, optional): One of COMPRESSIONS[format]. Defaults to the format's default
+      (no compression for CSV and NDJSON, snappy for Parquet).
+
+    Raises:
+    - ValueError: If the format or compression is unknown.
+    - RuntimeError: If Parquet is requested without pyarrow installed.
+    """
+
+    def __init__(self, destination, format='csv', compression='default'):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format {format!r}, expected one of {', '.join(FORMATS)}.")
+        if compression == 'default':
+            compression = COMPRESSIONS[format][0]
+        if compression not in COMPRESSIONS[format]:
+            raise ValueError(f"Unsupported compression {compression!r} for {format}.")
+        if format == 'parquet' and pa is None:
+            raise RuntimeError("Parquet exports need the pyarrow package (pip install pyarrow).")
+
+        self.format = format
+        self.compression = compression
+        self.rows = 0
+        self._owned = isinstance(destination, str)
+        self._file = open(destination, 'wb') if self._owned else destination
+        if format == 'parquet':
+            self._schema = pa.schema([(name, pa.int64() if name in INTEGER_FIELDS else pa.string())
+                                      for name in EXPORT_FIELDS])
+            self._writer = pq.ParquetWriter(self._file, self._schema, compression=compression or 'none')
+            return
+
+        self._compressed = _OPENERS[compression](self._file) if compression else None
+        self._text = io.TextIOWrapper(self._compressed or self._file, encoding='utf-8', newline='',
+                                      write_through=False)
+        if format == 'csv':
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(EXPORT_FIELDS)
+
+    def write(self, rows):
+        """
+        Append a chunk of rows.
+
+        Parameters:
+        - rows (list of tuple): Rows in EXPORT_FIELDS order.
+        """
+        if self.format == 'csv':
+            self._csv.writerows(rows)
+        elif self.format == 'ndjson':
+            self._text.writelines(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+        else:
+            columns = list(zip(*rows)) if rows else [()] * len(EXPORT_FIELDS)
+            self._writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for field, values in zip(self._schema, columns)],
+                schema=self._schema))
+        self.rows += len(rows)
+
+    def close(self):
+        """
+        Flush and finish the file (and close it if it was opened from a path).
+        """
+        if self.format == 'parquet':
+            self._writer.close()
+        else:
+            self._text.flush()
+            self._text.detach()  # Keeps the underlying file open
+            if self._compressed is not None:
+                self._compressed.close()  # Writes the compression trailer, leaves self._file open
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def main(argv=None):
+    import backend
+    import db
+
+    parser = argparse.ArgumentParser(description="Export incidents with their locations and jurisdiction.")
+    parser.add_argument('output', help="Output file.")
+    parser.add_argument('--db', default=db.DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--format', choices=FORMATS, default='csv', help="Output format (default: %(default)s).")
+    parser.add_argument('--compression', default='default',
+                        help="gzip, bz2 or xz for CSV/NDJSON; snappy, zstd or gzip for Parquet; 'none' to disable.")
+    parser.add_argument('--priority', nargs='+', help="Keep only these priorities.")
+    parser.add_argument('--jurisdiction-id', type=int, help="Keep only calls in this jurisdiction.")
+    parser.add_argument('--start', help="Keep only calls at or after this time, e.g. 2021/12/01.")
+    parser.add_argument('--end', help="Keep only calls before this time.")
+    parser.add_argument('--description', help="Full-text search of the description, e.g. 'burg*'.")
+    parser.add_argument('--ordered', action='store_true', help="Export newest first (slower).")
+    parser.add_argument('--count', action='store_true', help="Count the incidents first, to show the total (slower).")
+    args = parser.parse_args(argv)
+
+    db.configure(args.db)
+
+    def progress(written, total, elapsed):
+        done = f"{written:,} / {total:,}" if total is not None else f"{written:,}"
+        print(f"\r{done} incidents, {written / elapsed if elapsed else 0:,.0f} rows/s",
+              end='', file=sys.stderr, flush=True)
+
+    summary = backend.export_incidents(
+        args.output, format=args.format, compression=None if args.compression == 'none' else args.compression,
+        priority=args.priority, jurisdiction_id=args.jurisdiction_id, start=args.start, end=args.end,
+        description=args.description, ordered=args.ordered, progress=progress, count=args.count)
+    print(f"\nExported {summary['rows']:,} incidents to {args.output} in {summary['elapsed']:.1f} s "
+          f"({summary['rows_per_sec']:,.0f} rows/s).", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
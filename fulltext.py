@@ -0,0 +1,170 @@
+"""
+Full-text index over Calls.description.
+
+Calls_FTS is an FTS5 external-content table: it stores only the inverted index and reads the
+description text back from Calls by rowid. Triggers on Calls (created by migration 6) keep it in
+the same transaction as every insert, delete and description change, whichever code path makes
+them.
+
+Calls has no INTEGER PRIMARY KEY, so VACUUM may renumber its rowids and leave the index pointing
+at the wrong calls. repair_fulltext() detects that cheaply (the smallest and largest rowid of Calls
+no longer match those of the index) and rebuilds the index; the connection pool runs it on the main
+database and every archive partition when it opens its first connection. After a VACUUM while the
+application is running, restart it or run `python fulltext.py --rebuild`.
+
+Usage:
+    python fulltext.py --db database/911_Call_Data.db --rebuild
+"""
+import argparse
+import re
+import sqlite3
+
+import archive
+
+# A double-quoted phrase, or a run of non-space characters
+_TERM_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+# Function to re-index every description
+def rebuild_fulltext(conn, schema='main'):
+    """
+    Rebuild Calls_FTS from Calls. The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - schema (str, optional): The database holding the tables, e.g. an attached partition.
+      Defaults to 'main'.
+
+    Returns:
+        None
+    """
+    conn.execute(f"INSERT INTO {schema}.Calls_FTS (Calls_FTS) VALUES ('rebuild')")
+
+
+# Function to index newly inserted calls
+def index_calls(conn, after_rowid):
+    """
+    Index the descriptions of the calls with a rowid above after_rowid, inserted while the
+    'loading' maintenance flag kept the insert trigger off (see loader.load_chunk). The caller is
+    responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - after_rowid (int): The largest rowid of Calls before the insert.
+
+    Returns:
+        None
+    """
+    conn.execute("INSERT INTO Calls_FTS (rowid, description) SELECT rowid, description FROM Calls WHERE rowid > ?",
+                 (after_rowid,))
+
+
+# Function to check whether the index still matches the rowids of Calls
+def fulltext_drifted(conn, schema='main'):
+    """
+    Return whether the rowids of Calls moved under Calls_FTS, e.g. after a VACUUM renumbered them.
+
+    The index keeps one Calls_FTS_docsize row per indexed call, keyed by its rowid. A renumbering
+    packs the rowids from 1, so the smallest or largest rowid of Calls stops matching the index.
+    Both are primary key lookups, whatever the size of the table.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - schema (str, optional): The database holding the tables. Defaults to 'main'.
+
+    Returns:
+    - bool: True if the index must be rebuilt (False if the database has no index yet).
+    """
+    exists = conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'Calls_FTS_docsize'").fetchone()
+    if not exists:
+        return False
+    calls = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {schema}.Calls").fetchone()
+    indexed = conn.execute(f"SELECT MIN(id), MAX(id) FROM {schema}.Calls_FTS_docsize").fetchone()
+    return tuple(calls) != tuple(indexed)
+
+
+# Function to rebuild the indexes whose rowids drifted
+def repair_fulltext(conn):
+    """
+    Rebuild the full-text index of the main database and of every archive partition whose rowids
+    drifted (see fulltext_drifted()). Must be called outside of a transaction.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the main database.
+
+    Returns:
+    - list of str: The databases whose index was rebuilt ('main' or a partition file).
+    """
+    def repair(schema, label):
+        if not fulltext_drifted(conn, schema):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if fulltext_drifted(conn, schema):  # Not repaired by another process while we waited
+                rebuild_fulltext(conn, schema)
+                repaired.append(label)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    repaired = []
+    repair('main', 'main')
+    for _, path, _, _, _ in archive.partitions(conn):
+        with archive.attached(conn, [path]) as (name,):
+            repair(name, path)
+    return repaired
+
+
+# Function to turn user search text into an FTS5 query
+def fts_query(text):
+    """
+    Convert search text into a safe FTS5 MATCH expression.
+
+    Every word must match (implicit AND). A word ending in "*" matches as a prefix ("burg*" finds
+    BURGLARY) and text in double quotes matches as a phrase ("hit and run"). Any other FTS5 syntax
+    is treated as plain words, so user input can never raise a query syntax error.
+
+    Parameters:
+    - text (str): The search text.
+
+    Returns:
+    - str or None: The MATCH expression, or None if the text contains no searchable word.
+    """
+    terms = []
+    for phrase, word in _TERM_PATTERN.findall(text or ''):
+        prefix = False
+        if word:
+            prefix = word.endswith('*')
+            phrase = word.rstrip('*')
+        if not re.search(r'\w', phrase):
+            continue  # Only punctuation: nothing the tokenizer would index
+        term = '"' + phrase.replace('"', '""') + '"'
+        terms.append(term + '*' if prefix else term)
+    return ' '.join(terms) or None
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Rebuild the full-text index of call descriptions.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--rebuild', action='store_true', help="Re-index every description.")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate(conn)
+        if args.rebuild:
+            with conn:
+                rebuild_fulltext(conn)
+            print("Full-text index rebuilt.")
+        for path in repair_fulltext(conn):
+            print(f"Full-text index of {path} rebuilt: its rowids had drifted.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Geocoded coordinates of Locations and their R*Tree spatial index.
+
+Migration 11 adds latitude and longitude (WGS84 degrees) to Locations and a Locations_RTree
+virtual table indexing every location that has coordinates, kept in sync by triggers. A box
+query on the R*Tree finds the locations in an area without scanning Locations, and the calls at
+those locations are then read through the (incident_location_id, call_epoch) index (see
+backend.incidents_near, incidents_in_bbox and incident_grid).
+
+Coordinates come from a local lookup file, since the city CSV carries addresses only: a CSV with
+the columns address, latitude and longitude, and optionally zip_code to tell apart identical
+addresses in different ZIP codes. Every location with a matching address gets the coordinates;
+locations without a ZIP code (such as the incident locations of the city CSV) match on the address
+alone.
+
+Usage:
+    python geo.py geocodes.csv --db database/911_Call_Data.db
+"""
+import argparse
+import csv
+import math
+import sqlite3
+
+# Mean Earth radius, for great-circle distances
+EARTH_RADIUS_M = 6371008.8
+# Meters per degree of latitude
+METERS_PER_DEGREE = 111195.0
+
+# Function to check a coordinate pair
+def valid_coordinates(latitude, longitude):
+    """
+    Check that a latitude and longitude are finite numbers within their ranges.
+
+    Parameters:
+    - latitude (float): Degrees north.
+    - longitude (float): Degrees east.
+
+    Returns:
+    - bool: True if both are usable.
+    """
+    try:
+        return -90 <= float(latitude) <= 90 and -180 <= float(longitude) <= 180
+    except (TypeError, ValueError):
+        return False
+
+
+# Function to compute the distance between two points
+def distance_m(latitude1, longitude1, latitude2, longitude2):
+    """
+    Return the great-circle (haversine) distance between two points.
+
+    Parameters:
+    - latitude1, longitude1 (float): The first point, in degrees.
+    - latitude2, longitude2 (float): The second point, in degrees.
+
+    Returns:
+    - float: The distance in meters.
+    """
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Function to compute the box around a circle
+def bounding_box(latitude, longitude, radius_m):
+    """
+    Return the smallest latitude/longitude box containing a circle.
+
+    Parameters:
+    - latitude (float): Latitude of the center, in degrees.
+    - longitude (float): Longitude of the center, in degrees.
+    - radius_m (float): Radius in meters.
+
+    Returns:
+    - tuple: (south, west, north, east) in degrees.
+    """
+    delta_lat = radius_m / METERS_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    delta_lon = 180.0 if cos_lat < 1e-9 else min(180.0, delta_lat / cos_lat)
+    return (max(-90.0, latitude - delta_lat), longitude - delta_lon,
+            min(90.0, latitude + delta_lat), longitude + delta_lon)
+
+
+# Function to find the located locations inside a box
+def locations_in_bbox(conn, south, west, north, east):
+    """
+    Return the locations whose coordinates fall inside a box, through the R*Tree.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - south, west, north, east (float): The box, in degrees.
+
+    Returns:
+    - list of tuple: (location_id, latitude, longitude) per location.
+    """
+    rows = conn.execute("""
+        SELECT L.location_id, L.latitude, L.longitude
+        FROM Locations_RTree R JOIN Locations L ON L.location_id = R.location_id
+        WHERE R.min_lat <= ? AND R.max_lat >= ? AND R.min_lon <= ? AND R.max_lon >= ?
+          AND L.latitude BETWEEN ? AND ? AND L.longitude BETWEEN ? AND ?
+    """, (north, south, east, west, south, north, west, east))  # R*Tree boxes are rounded outwards
+    return [tuple(row) for row in rows]
+
+
+# Function to find the located locations within a distance
+def locations_near(conn, latitude, longitude, radius_m):
+    """
+    Return the locations within a distance of a point.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - latitude (float): Latitude of the point, in degrees.
+    - longitude (float): Longitude of the point, in degrees.
+    - radius_m (float): The distance in meters.
+
+    Returns:
+    - dict: Maps each location_id to its distance in meters.
+    """
+    nearby = {}
+    for location_id, lat, lon in locations_in_bbox(conn, *bounding_box(latitude, longitude, radius_m)):
+        distance = distance_m(latitude, longitude, lat, lon)
+        if distance <= radius_m:
+            nearby[location_id] = distance
+    return nearby
+
+
+# Function to store coordinates by location id
+def set_coordinates(conn, coordinates):
+    """
+    Set the coordinates of locations by id. The triggers update the R*Tree. The caller is
+    responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - coordinates (iterable of tuple): (location_id, latitude, longitude) tuples.
+
+    Returns:
+    - int: The number of locations updated.
+    """
+    return conn.executemany("UPDATE Locations SET latitude = ?, longitude = ? WHERE location_id = ?",
+                            ((latitude, longitude, location_id)
+                             for location_id, latitude, longitude in coordinates)).rowcount
+
+
+# Function to load coordinates from a lookup file
+def load_geocodes(conn, path):
+    """
+    Set the coordinates of the locations listed in a geocode CSV file, matched by address (and
+    ZIP code when the file has a zip_code column and the location has one). Rows with invalid
+    coordinates are skipped.
+    The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - path (str): Path to the CSV file, with the columns address, latitude, longitude and
+      optionally zip_code.
+
+    Raises:
+    - ValueError: If a required column is missing.
+
+    Returns:
+    - dict: read (rows in the file), skipped (invalid rows) and updated (locations updated).
+    """
+    summary = {'read': 0, 'skipped': 0, 'updated': 0}
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        missing = {'address', 'latitude', 'longitude'} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Geocode file {path} lacks the columns: {', '.join(sorted(missing))}.")
+        by_zip = 'zip_code' in reader.fieldnames
+
+        rows = []
+        for row in reader:
+            summary['read'] += 1
+            if not row['address'] or not valid_coordinates(row['latitude'], row['longitude']):
+                summary['skipped'] += 1
+                continue
+            rows.append((float(row['latitude']), float(row['longitude']), row['address'].strip())
+                        + ((row['zip_code'].strip(),) if by_zip else ()))
+
+    # Incident locations are stored without a ZIP code: they match on the address alone
+    where = "address = ? AND (zip_code = ? OR zip_code = '')" if by_zip else "address = ?"
+    summary['updated'] = conn.executemany(f"UPDATE Locations SET latitude = ?, longitude = ? WHERE {where}",
+                                          rows).rowcount
+    return summary
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Load location coordinates from a geocode CSV file.")
+    parser.add_argument('geocodes', help="CSV file with address, latitude, longitude and optionally zip_code.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate(conn)
+        with conn:
+            summary = load_geocodes(conn, args.geocodes)
+        located = conn.execute("SELECT COUNT(*) FROM Locations_RTree").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"Read {summary['read']:,} geocodes ({summary['skipped']:,} invalid), updated {summary['updated']:,} "
+          f"locations; {located:,} locations have coordinates.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""
+Instrumentation of every SQLite statement run through the connection pool.
+
+Pooled connections are InstrumentedConnection objects (see db.ConnectionPool): each statement is
+timed from execute() until its last row has been fetched, counting only the time spent inside
+SQLite (not the caller's work between fetches), and recorded under its template, the SQL with
+whitespace collapsed and literals replaced by '?'. For every template the registry keeps the
+number of calls, rows, total and maximum time, a window of recent durations for p50/p95/p99, and
+the functions that issued it. Statements slower than a threshold also go to a bounded slow-query
+log with their EXPLAIN QUERY PLAN, and to the 'instrumentation' logger.
+
+snapshot() returns all of it as plain data; the app's "Query Metrics" page displays it.
+
+Settings:
+- INCIDENT_SLOW_QUERY_MS environment variable, or configure(slow_ms=...): slow-query threshold in
+  milliseconds. Defaults to 100.
+- ConnectionPool(instrument=False): open plain connections, without any overhead.
+"""
+import functools
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('instrumentation')
+logger.addHandler(logging.NullHandler())  # Slow queries are shown once the application configures logging
+
+# Modules skipped when looking for the function that issued a statement: the pool and the helpers
+# that only run statements on behalf of their caller
+INFRASTRUCTURE_MODULES = frozenset(('instrumentation', 'db', 'archive', 'query_cache', 'contextlib'))
+
+# Rows fetched at a time when a cursor is iterated
+ITERATION_BATCH = 256
+
+# Statements that have a query plan
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+# Function to turn a statement into its template
+@functools.lru_cache(maxsize=2048)
+def template(sql):
+    """
+    Return the template of a statement: whitespace collapsed, string and number literals replaced
+    by '?', and lists of placeholders (e.g. IN (?, ?, ?)) shortened to '?, ...'.
+
+    Parameters:
+    - sql (str): The statement.
+
+    Returns:
+    - str: Its template.
+    """
+    text = " ".join(sql.split())
+    text = _LITERALS.sub("?", text)
+    return _PLACEHOLDER_LISTS.sub("?, ...", text)
+
+
+# Function to name the function that issued a statement
+def _caller():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__') in INFRASTRUCTURE_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    # Report the public function rather than its private helpers (e.g. _aggregate)
+    while (frame.f_code.co_name.startswith('_') and not frame.f_code.co_name.startswith('__')
+           and frame.f_back is not None and frame.f_back.f_globals is frame.f_globals):
+        frame = frame.f_back
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class _Entry:
+    """Counters of one statement template."""
+
+    __slots__ = ('calls', 'rows', 'total', 'max', 'durations', 'callers')
+
+    def __init__(self, samples):
+        self.calls = self.rows = 0
+        self.total = self.max = 0.0
+        self.durations = deque(maxlen=samples)
+        self.callers = {}
+
+
+class QueryMetrics:
+    """
+    A thread-safe registry of statement timings and slow queries.
+
+    Parameters:
+    - slow_ms (float, optional): Statements slower than this (milliseconds) are logged as slow.
+      Defaults to INCIDENT_SLOW_QUERY_MS or 100.
+    - samples (int, optional): Recent durations kept per template for the percentiles. Defaults to 1024.
+    - slow_log_size (int, optional): Slow queries kept (the oldest are dropped). Defaults to 200.
+    - explain (bool, optional): Capture EXPLAIN QUERY PLAN for slow queries. Defaults to True.
+    """
+
+    def __init__(self, slow_ms=None, samples=1024, slow_log_size=200, explain=True):
+        if slow_ms is None:
+            slow_ms = float(os.environ.get('INCIDENT_SLOW_QUERY_MS', 100))
+        self.slow_ms = slow_ms
+        self.samples = samples
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._queries = {}  # template -> per-template counters
+        self._slow = deque(maxlen=slow_log_size)
+        self._since = time.time()
+
+    def record(self, sql, seconds, rows, caller, conn=None, params=None, plan=None):
+        """
+        Record one statement.
+
+        Parameters:
+        - sql (str): The statement.
+        - seconds (float): Time spent in SQLite.
+        - rows (int): Rows returned (SELECT) or changed (other statements).
+        - caller (str or None): The function that issued it, as 'module.function'.
+        - conn (sqlite3.Connection, optional): Its connection, to explain a slow statement.
+        - params (tuple or dict, optional): Its parameters, to explain a slow statement.
+        - plan (list of str, optional): Its plan, if already captured. Otherwise a slow statement is
+          explained on conn, which must belong to the calling thread.
+        """
+        key = template(sql)
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                entry = self._queries[key] = _Entry(self.samples)
+            entry.calls += 1
+            if rows > 0:
+                entry.rows += rows
+            entry.total += seconds
+            if seconds > entry.max:
+                entry.max = seconds
+            entry.durations.append(seconds)
+            callers = entry.callers
+            callers[caller] = callers.get(caller, 0) + 1
+
+        if seconds * 1000 >= self.slow_ms:
+            if plan is None and self.explain and conn is not None:
+                plan = self._plan(conn, sql, params)
+            slow = {'at': time.time(), 'template': key, 'sql': sql, 'ms': seconds * 1000, 'rows': rows,
+                    'caller': caller, 'plan': plan}
+            with self._lock:
+                self._slow.append(slow)
+            logger.warning("Slow query (%.1f ms, %d rows) from %s: %s | plan: %s",
+                           slow['ms'], rows, caller, key, " | ".join(plan or ()))
+
+    # Function to capture the plan of a slow statement
+    @staticmethod
+    def _plan(conn, sql, params):
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        try:
+            # A plain cursor, so the EXPLAIN itself is not recorded
+            cursor = sqlite3.Cursor(conn)
+            return [row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, params or ())]
+        except sqlite3.Error as e:  # e.g. a partition detached since
+            return [f"unavailable: {e}"]
+
+    def snapshot(self, top=None):
+        """
+        Return the metrics collected so far.
+
+        Parameters:
+        - top (int, optional): Keep only the templates with the largest total time.
+
+        Returns:
+        - dict: With the keys:
+            - queries (list of dict): Per template, by total time descending: template, calls, rows,
+              total_ms, mean_ms, p50_ms, p95_ms, p99_ms (over the recent samples), max_ms, callers
+              (dict of caller to calls).
+            - slow_queries (list of dict): Newest first: at, template, sql, ms, rows, caller, plan.
+            - slow_ms (float): The slow-query threshold.
+            - since (float): Unix time of the start of the collection.
+        """
+        with self._lock:
+            entries = [(key, {'calls': entry.calls, 'rows': entry.rows, 'total': entry.total, 'max': entry.max,
+                              'durations': sorted(entry.durations), 'callers': dict(entry.callers)})
+                       for key, entry in self._queries.items()]
+            slow = list(reversed(self._slow))
+
+        queries = []
+        for key, entry in entries:
+            durations = entry['durations']
+
+            def percentile(p):
+                return durations[min(len(durations) - 1, int(p / 100 * len(durations)))] * 1000
+
+            queries.append({'template': key, 'calls': entry['calls'], 'rows': entry['rows'],
+                            'total_ms': entry['total'] * 1000, 'mean_ms': entry['total'] / entry['calls'] * 1000,
+                            'p50_ms': percentile(50), 'p95_ms': percentile(95), 'p99_ms': percentile(99),
+                            'max_ms': entry['max'] * 1000, 'callers': entry['callers']})
+        queries.sort(key=lambda query: query['total_ms'], reverse=True)
+        return {'queries': queries[:top] if top else queries, 'slow_queries': slow, 'slow_ms': self.slow_ms,
+                'since': self._since}
+
+    def reset(self):
+        """
+        Drop every metric and slow query.
+        """
+        with self._lock:
+            self._queries.clear()
+            self._slow.clear()
+            self._since = time.time()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A cursor recording each statement in the shared metrics once its result is consumed.
+
+    Statements without a result (INSERT, UPDATE...) are recorded right after execute(), with the
+    number of changed rows. Queries are recorded when their last row has been fetched, when the
+    cursor runs another statement, or when it is closed or garbage collected.
+
+    A garbage-collected cursor is recorded without running any SQL, since the collecting thread
+    may not own the connection any more: its plan is only known if execute() alone was slow.
+    """
+
+    _pending = None  # [sql, params, seconds, rows, caller, plan] of the query being fetched
+
+    def _finish(self, explain=True):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, params, seconds, rows, caller, plan = pending
+            metrics.record(sql, seconds, rows, caller, self.connection if explain else None, params, plan)
+
+    def _run(self, method, sql, params, explain_params):
+        self._finish()
+        caller = _caller()
+        started = time.perf_counter()
+        method(sql, params) if params is not None else method(sql)
+        seconds = time.perf_counter() - started
+        if self.description is None:
+            metrics.record(sql, seconds, self.rowcount, caller, self.connection, explain_params)
+        else:
+            # A query already slow to start is explained now, while this thread owns the connection
+            plan = (metrics._plan(self.connection, sql, explain_params)
+                    if metrics.explain and seconds * 1000 >= metrics.slow_ms else None)
+            self._pending = [sql, explain_params, seconds, 0, caller, plan]
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # A slow batch is explained with its first parameters, put back in front of the others
+        rows = iter(seq_of_parameters)
+        first = next(rows, None)
+        if first is not None:
+            rows = itertools.chain((first,), rows)
+        return self._run(super().executemany, sql, rows, first)
+
+    def executescript(self, sql_script):
+        return self._run(super().executescript, sql_script, None, None)
+
+    def _fetched(self, started, rows, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - started
+            pending[3] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        # Rows are fetched in batches, so the timing costs little per row of a large scan
+        fetchmany = super().fetchmany
+        while True:
+            started = time.perf_counter()
+            rows = fetchmany(ITERATION_BATCH)
+            self._fetched(started, len(rows), len(rows) < ITERATION_BATCH)
+            yield from rows
+            if len(rows) < ITERATION_BATCH:
+                return
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish(explain=False)
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose cursors, including the implicit ones of execute(), are InstrumentedCursors.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+# Shared registry used by every pooled connection
+metrics = QueryMetrics()
+
+
+# Function to change the shared registry's settings
+def configure(slow_ms=None, explain=None):
+    """
+    Change the settings of the shared registry.
+
+    Parameters:
+    - slow_ms (float, optional): New slow-query threshold in milliseconds.
+    - explain (bool, optional): Whether to capture EXPLAIN QUERY PLAN for slow queries.
+    """
+    if slow_ms is not None:
+        metrics.slow_ms = slow_ms
+    if explain is not None:
+        metrics.explain = explain
+
+
+# Function to read the shared metrics
+def snapshot(top=None):
+    """
+    Return the shared metrics (see QueryMetrics.snapshot()).
+
+    Parameters:
+    - top (int, optional): Keep only the templates with the largest total time.
+
+    Returns:
+    - dict: queries, slow_queries, slow_ms and since.
+    """
+    return metrics.snapshot(top=top)
+
+
+# Function to clear the shared metrics
+def reset():
+    """
+    Drop every shared metric and slow query.
+    """
+    metrics.reset()
@@ -0,0 +1,248 @@
+"""
+Streaming loader for the city 911 call CSV.
+
+This replaces the row-by-row pipeline in database/db_creation.ipynb. The CSV is read in chunks,
+Location and Jurisdiction keys are resolved against bounded LRU caches (lookups.LookupCache) warmed
+from the database, and every table is written with executemany, one transaction per chunk. Memory
+stays bounded by the chunk size plus the cache size, so the full multi-million-row dataset can be
+loaded without truncating it.
+
+The calls are inserted with the 'loading' maintenance flag set, which turns off the insert
+triggers on Calls: the chunk's calls are then added to the rollups and the full-text index with one
+statement each, their ArcGIS metadata comes from the CSV, and instead of one change log row per
+call the log is reset once (see changelog.reset_log()), so its consumers start over.
+
+Usage:
+    python loader.py part_1.csv --db database/911_Call_Data.db --chunksize 50000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+import changelog
+import fulltext
+import rollups
+from db import DEFAULT_DB_PATH, ConnectionPool
+from lookups import JURISDICTION_FIELDS, LOCATION_FIELDS, LookupCache
+from timestamps import to_epoch
+
+# CSV columns that make up a Jurisdiction and a reporter Location
+JURISDICTION_COLUMNS = ('district', 'PoliceDistrict', 'PolicePost', 'CouncilDistrict', 'SheriffDistricts')
+LOCATION_COLUMNS = ('location', 'Neighborhood', 'ZIPCode', 'Census_Tracts', 'Community_Statistical_Areas')
+
+
+# Function to normalize a CSV value into a dedup-friendly string
+def clean_field(value):
+    """Convert None or NaN values to empty strings and ensure a string type for key consistency."""
+    if pd.isnull(value):
+        return ""
+    try:
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+    except Exception:
+        pass
+    return str(value).strip()
+
+
+# Function to parse the NeedsSync column
+def parse_needs_sync(value):
+    """Return 1 if the NeedsSync value is truthy ("1", "1.0", "True"), otherwise 0."""
+    return 1 if str(value).strip() in ["1", "1.0", "True"] else 0
+
+
+# Function to parse the ESRI_OID column
+def parse_esri_oid(value):
+    """Return the ESRI object id as an int, or None if it is missing or not numeric."""
+    try:
+        return int(float(value)) if not pd.isnull(value) else None
+    except (TypeError, ValueError):
+        return None
+
+
+# Function to resolve keys to ids, inserting the ones that are not cached yet
+def _resolve_keys(conn, cache, keys):
+    """
+    Return the ids of `keys`, inserting the missing rows with executemany on conn.
+
+    New rows are read back in one query by selecting every id above the previous maximum instead
+    of one SELECT per key. Keys that were already in the table without being cached (evicted from
+    the bounded cache, or inserted by another writer) are looked up individually.
+
+    Returns:
+    - dict: Maps every key of `keys` to its id.
+    """
+    unique = list(dict.fromkeys(keys))
+    ids = cache.lookup_many(unique)
+    missing = [key for key in unique if key not in ids]
+    if not missing:
+        return ids
+
+    table, id_column, columns = cache.table, cache.id_column, ', '.join(cache.fields)
+    max_id = conn.execute(f"SELECT COALESCE(MAX({id_column}), 0) FROM {table}").fetchone()[0]
+    created = conn.executemany(f"INSERT OR IGNORE INTO {table} ({columns}) "
+                               f"VALUES ({', '.join('?' * len(cache.fields))})", missing).rowcount
+    wanted = set(missing)
+    found = {tuple(row[1:]): row[0]
+             for row in conn.execute(f"SELECT {id_column}, {columns} FROM {table} WHERE {id_column} > ?", (max_id,))}
+    resolved = {key: row_id for key, row_id in found.items() if key in wanted}
+
+    where = ' AND '.join(f"{field}=?" for field in cache.fields)
+    for key in missing:
+        if key not in resolved:
+            result = conn.execute(f"SELECT {id_column} FROM {table} WHERE {where}", key).fetchone()
+            if result is None:
+                raise Exception(f"Error retrieving {table} row with key: " + str(key))
+            resolved[key] = result[0]
+    cache.store_many(resolved, created)
+    ids.update(resolved)
+    return ids
+
+
+# Function to load one CSV chunk into the database
+def load_chunk(conn, chunk, locations_cache, jurisdictions_cache):
+    """
+    Insert one DataFrame chunk of the CSV into the Jurisdictions, Locations, Calls and
+    ArcGIS_Metadata tables, then add the new calls to the rollups and the full-text index and
+    reset the change log. The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - chunk (pandas.DataFrame): A chunk of the CSV, already filtered of incomplete rows.
+    - locations_cache (lookups.LookupCache): Bounded cache of the Locations ids, by cleaned 5-field tuple.
+    - jurisdictions_cache (lookups.LookupCache): Bounded cache of the Jurisdictions ids.
+
+    Returns:
+    - int: The number of rows inserted into Calls (duplicate call keys are ignored).
+    """
+    def clean(column):
+        # Vectorized clean_field: the CSV is read as text, so only NaN and whitespace need handling
+        return chunk[column].fillna("").str.strip().tolist()
+
+    jurisdiction_keys = list(zip(*(clean(column) for column in JURISDICTION_COLUMNS)))
+    reporter_keys = list(zip(*(clean(column) for column in LOCATION_COLUMNS)))
+    incident_keys = [(address, "", "", "", "") for address in clean('incidentLocation')]
+
+    jurisdiction_ids = _resolve_keys(conn, jurisdictions_cache, jurisdiction_keys)
+    location_ids = _resolve_keys(conn, locations_cache, reporter_keys + incident_keys)
+
+    call_keys = chunk['callKey'].tolist()
+    call_times = chunk['callDateTime'].tolist()
+    calls = zip(
+        call_keys,
+        chunk['recordId'].tolist(),  # Preserved as text from CSV.
+        call_times,
+        chunk['priority'].tolist(),
+        chunk['description'].tolist(),
+        chunk['callNumber'].tolist(),
+        [location_ids[key] for key in incident_keys],
+        [location_ids[key] for key in reporter_keys],
+        [jurisdiction_ids[key] for key in jurisdiction_keys],
+        [to_epoch(value) for value in call_times],
+    )
+    # New calls get rowids above the current largest one
+    after_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM Calls").fetchone()[0]
+    conn.execute("INSERT INTO Maintenance_Flags (name) VALUES ('loading')")  # Rolled back with a failed chunk
+    cursor = conn.executemany("""
+        INSERT OR IGNORE INTO Calls
+        (call_key, record_id, call_date_time, priority, description, call_number, incident_location_id, reporter_location_id, jurisdiction_id, call_epoch)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, calls)
+    inserted = cursor.rowcount
+    conn.execute("DELETE FROM Maintenance_Flags WHERE name = 'loading'")
+    if inserted:
+        rollups.add_calls(conn, after_rowid)
+        fulltext.index_calls(conn, after_rowid)
+        changelog.reset_log(conn)
+
+    metadata = zip(
+        call_keys,
+        [parse_needs_sync(value) for value in chunk['NeedsSync'].tolist()],
+        [parse_esri_oid(value) for value in chunk['ESRI_OID'].tolist()],
+    )
+    conn.executemany("""
+        INSERT INTO ArcGIS_Metadata (call_key, needs_sync, esri_oid)
+        VALUES (?, ?, ?)
+        ON CONFLICT(call_key) DO UPDATE SET needs_sync = excluded.needs_sync, esri_oid = excluded.esri_oid
+        WHERE ArcGIS_Metadata.esri_oid IS NULL  -- Row just marked by the sync triggers, not yet synced
+    """, metadata)
+    return inserted
+
+
+# Function to stream a whole CSV file into the database
+def load_csv(csv_path, db_path=DEFAULT_DB_PATH, chunksize=50000, limit=None, progress=None, cache_size=100000):
+    """
+    Load the 911 call CSV into the SQLite database in bounded-memory chunks.
+
+    Rows with any missing value are dropped, as in the notebook pipeline, and Locations and
+    Jurisdictions are deduplicated on their cleaned 5-field keys. Each chunk is committed in its
+    own transaction, so an interrupted load keeps every completed chunk and can simply be re-run
+    (rows already present are ignored).
+
+    Parameters:
+    - csv_path (str): Path to the CSV file.
+    - db_path (str, optional): Path to the SQLite database. Created if it does not exist.
+    - chunksize (int, optional): Number of CSV rows read and committed at a time. Defaults to 50000.
+    - limit (int, optional): Stop after reading this many CSV rows. Defaults to the whole file.
+    - progress (callable, optional): Called after each chunk with the running summary dict.
+    - cache_size (int, optional): Locations and Jurisdictions ids cached in memory, each. Defaults
+      to 100000.
+
+    Returns:
+    - dict: A summary with the number of rows read, processed (inserted into Calls) and skipped,
+      the elapsed seconds and the rows processed per second.
+    """
+    # Opening through a pool applies the PRAGMAs and brings the schema up to date
+    pool = ConnectionPool(db_path, pool_size=1)
+    conn = pool.open_connection()
+    summary = {'read': 0, 'processed': 0, 'skipped': 0, 'elapsed': 0.0, 'rows_per_sec': 0.0}
+    started = time.perf_counter()
+
+    try:
+        # Private to this connection, so they never mix ids with the shared caches of lookups.py
+        locations_cache = LookupCache('Locations', 'location_id', LOCATION_FIELDS, maxsize=cache_size)
+        jurisdictions_cache = LookupCache('Jurisdictions', 'jurisdiction_id', JURISDICTION_FIELDS, maxsize=cache_size)
+        locations_cache.warm(conn)
+        jurisdictions_cache.warm(conn)
+
+        for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize):
+            if limit is not None:
+                chunk = chunk.head(limit - summary['read'])
+            summary['read'] += len(chunk)
+
+            complete = chunk.dropna()
+            with conn:  # One transaction per chunk
+                inserted = load_chunk(conn, complete, locations_cache, jurisdictions_cache)
+            summary['processed'] += inserted
+            summary['skipped'] += len(chunk) - inserted
+
+            summary['elapsed'] = time.perf_counter() - started
+            summary['rows_per_sec'] = summary['processed'] / summary['elapsed'] if summary['elapsed'] > 0 else 0.0
+            if progress:
+                progress(summary)
+            if limit is not None and summary['read'] >= limit:
+                break
+    finally:
+        conn.close()
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the 911 call CSV into the SQLite database.")
+    parser.add_argument('csv_path', help="Path to the 911 call CSV file.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--chunksize', type=int, default=50000, help="Rows per chunk/transaction (default: %(default)s).")
+    parser.add_argument('--limit', type=int, default=None, help="Only load the first N rows of the CSV.")
+    args = parser.parse_args(argv)
+
+    def report(summary):
+        print(f"Read {summary['read']:,} rows, processed {summary['processed']:,} "
+              f"({summary['rows_per_sec']:,.0f} rows/sec)", flush=True)
+
+    summary = load_csv(args.csv_path, args.db, chunksize=args.chunksize, limit=args.limit, progress=report)
+    print(f"Processing complete. Processed: {summary['processed']} records, Skipped: {summary['skipped']} records.")
+
+
+if __name__ == '__main__':
+    main()
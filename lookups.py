@@ -0,0 +1,311 @@
+"""
+Resolve locations and jurisdictions by their attributes instead of raw ids.
+
+Locations and Jurisdictions are deduplicated on their 5 text fields (a UNIQUE constraint in the
+schema), with missing values stored as "" like the CSV loader does. resolve_location() and
+resolve_jurisdiction() return the id of the matching row and create it when it does not exist.
+
+Ids are cached in a bounded LRU per table, warmed with the newest rows of the table the first time
+it is used with a given connection pool. Creation is safe with concurrent writers, in this process
+or others: rows are inserted with ON CONFLICT DO NOTHING and read back in the same write
+transaction, so two writers resolving the same new key always get the same id. Rows are assumed
+to be neither deleted nor edited in place (the app never does either).
+"""
+import threading
+from collections import OrderedDict
+
+from db import connection, get_pool, transaction
+
+LOCATION_FIELDS = ('address', 'neighborhood', 'zip_code', 'census_tract', 'community_statistical_area')
+JURISDICTION_FIELDS = ('district', 'police_district', 'police_post', 'council_district', 'sheriff_district')
+
+
+# Function to normalize one attribute value like the CSV loader
+def normalize_field(value):
+    """
+    Normalize a location or jurisdiction attribute for deduplication.
+
+    Parameters:
+    - value (object): The raw value.
+
+    Returns:
+    - str: "" for None, "12" for 12 or 12.0, otherwise the stripped text.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+class LookupCache:
+    """
+    A bounded LRU from attribute tuples to ids for one lookup table, with get-or-create.
+
+    Parameters:
+    - table (str): The lookup table, e.g. 'Locations'.
+    - id_column (str): Its id column, e.g. 'location_id'.
+    - fields (tuple of str): The attribute columns forming the unique key.
+    - maxsize (int, optional): Maximum number of cached keys. Defaults to 100000.
+    """
+
+    def __init__(self, table, id_column, fields, maxsize=100000):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+
+        self.table = table
+        self.id_column = id_column
+        self.fields = fields
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None  # The pool whose database the cached ids belong to
+        self._stats = {'hits': 0, 'misses': 0, 'created': 0, 'evictions': 0}
+
+        columns = ', '.join(fields)
+        where = ' AND '.join(f"{field} = ?" for field in fields)
+        self._select_sql = f"SELECT {id_column} FROM {table} WHERE {where}"
+        self._insert_sql = (f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(fields))}) "
+                            "ON CONFLICT DO NOTHING")
+        self._warm_sql = f"SELECT {id_column}, {columns} FROM {table} ORDER BY {id_column} DESC LIMIT ?"
+
+    def key(self, values):
+        """
+        Build the normalized cache key of a row.
+
+        Parameters:
+        - values (dict or sequence): The attributes, by field name or in field order. Missing ones are "".
+
+        Returns:
+        - tuple of str: The key.
+        """
+        if isinstance(values, dict):
+            unknown = set(values) - set(self.fields)
+            if unknown:
+                raise ValueError(f"Unknown {self.table} fields: {', '.join(sorted(unknown))}")
+            values = [values.get(field) for field in self.fields]
+        values = list(values)
+        if len(values) > len(self.fields):
+            raise ValueError(f"Expected at most {len(self.fields)} {self.table} values, got {len(values)}.")
+        values += [None] * (len(self.fields) - len(values))
+        return tuple(normalize_field(value) for value in values)
+
+    def _store(self, key, row_id):
+        # Called with the lock held
+        self._entries[key] = row_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def warm(self, conn=None):
+        """
+        Replace the cached keys with the newest rows of the table, up to maxsize. The counters
+        start over when the shared pool points at another database.
+
+        Parameters:
+        - conn (sqlite3.Connection, optional): Read the rows on this connection instead of the
+          shared pool, for a cache private to one connection (see lookup_many()).
+
+        Returns:
+        - int: The number of keys cached.
+        """
+        if conn is None:
+            pool = get_pool()
+            with connection() as conn:
+                rows = conn.execute(self._warm_sql, (self.maxsize,)).fetchall()
+        else:
+            pool, rows = self._pool, conn.execute(self._warm_sql, (self.maxsize,)).fetchall()
+        with self._lock:
+            if self._pool is not pool:
+                self._stats = dict.fromkeys(self._stats, 0)
+            self._entries.clear()
+            for row in reversed(rows):  # Newest rows end up most recently used
+                self._store(tuple(row[1:]), row[0])
+            self._pool = pool
+        return len(rows)
+
+    def lookup_many(self, keys):
+        """
+        Return the cached ids of normalized keys, without reading the database. With store_many(),
+        this lets a caller resolve keys on its own connection and transaction (see loader.py).
+
+        Parameters:
+        - keys (iterable of tuple): Normalized keys (see key()).
+
+        Returns:
+        - dict: Maps each cached key to its id.
+        """
+        ids = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    ids[key] = self._entries[key]
+                    self._stats['hits'] += 1
+                else:
+                    self._stats['misses'] += 1
+        return ids
+
+    def store_many(self, ids, created=0):
+        """
+        Cache ids resolved by the caller (see lookup_many()).
+
+        Parameters:
+        - ids (dict): Maps normalized keys to their ids.
+        - created (int, optional): How many of them the caller inserted, for the counters.
+        """
+        with self._lock:
+            for key, row_id in ids.items():
+                self._store(key, row_id)
+            self._stats['created'] += created
+
+    def resolve_many(self, rows, create=True):
+        """
+        Resolve many attribute rows to ids, with at most one read and one write transaction.
+
+        Parameters:
+        - rows (iterable): Attributes as dicts or sequences (see key()).
+        - create (bool, optional): Insert the rows that do not exist yet. Defaults to True.
+
+        Returns:
+        - list of int or None: The id of each row, in order (None for rows that do not exist
+          when create is False).
+        """
+        if self._pool is not get_pool():
+            self.warm()  # First use, or the shared pool now points at another database
+
+        keys = [self.key(row) for row in rows]
+        ids = self.lookup_many(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in ids]
+        if missing:
+            with connection() as conn:
+                for key in missing:
+                    row = conn.execute(self._select_sql, key).fetchone()
+                    if row is not None:
+                        ids[key] = row[0]
+
+            to_create = [key for key in missing if key not in ids]
+            if to_create and create:
+                # The INSERT starts the write transaction, so the SELECTs below see every row
+                # committed by other writers as well as our own
+                with transaction() as conn:
+                    created = sum(conn.execute(self._insert_sql, key).rowcount for key in to_create)
+                    for key in to_create:
+                        ids[key] = conn.execute(self._select_sql, key).fetchone()[0]
+            else:
+                created = 0
+            self.store_many({key: ids[key] for key in missing if key in ids}, created)
+
+        return [ids.get(key) for key in keys]
+
+    def resolve(self, values, create=True):
+        """
+        Resolve one attribute row to its id (see resolve_many()).
+
+        Returns:
+        - int or None: The id, or None if the row does not exist and create is False.
+        """
+        return self.resolve_many([values], create=create)[0]
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+        - dict: hits, misses, created (rows inserted), evictions, size and maxsize.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['maxsize'] = self.maxsize
+        return stats
+
+
+# Shared caches used by resolve_location() and resolve_jurisdiction()
+locations = LookupCache('Locations', 'location_id', LOCATION_FIELDS)
+jurisdictions = LookupCache('Jurisdictions', 'jurisdiction_id', JURISDICTION_FIELDS)
+
+
+# Function to get the id of a location, creating it if needed
+def resolve_location(address, neighborhood="", zip_code="", census_tract="", community_statistical_area="",
+                     create=True):
+    """
+    Return the location_id of the location with these attributes.
+
+    Parameters:
+    - address (str): The street address.
+    - neighborhood (str, optional): The neighborhood.
+    - zip_code (str, optional): The ZIP code.
+    - census_tract (str, optional): The census tract.
+    - community_statistical_area (str, optional): The community statistical area.
+    - create (bool, optional): Create the location if it does not exist. Defaults to True.
+
+    Returns:
+    - int or None: The location_id, or None if it does not exist and create is False.
+    """
+    return locations.resolve((address, neighborhood, zip_code, census_tract, community_statistical_area),
+                             create=create)
+
+
+# Function to get the id of a jurisdiction, creating it if needed
+def resolve_jurisdiction(district, police_district="", police_post="", council_district="", sheriff_district="",
+                         create=True):
+    """
+    Return the jurisdiction_id of the jurisdiction with these attributes.
+
+    Parameters:
+    - district (str): The district, e.g. "CD".
+    - police_district (str, optional): The police district.
+    - police_post (str, optional): The police post.
+    - council_district (str, optional): The council district.
+    - sheriff_district (str, optional): The sheriff district.
+    - create (bool, optional): Create the jurisdiction if it does not exist. Defaults to True.
+
+    Returns:
+    - int or None: The jurisdiction_id, or None if it does not exist and create is False.
+    """
+    return jurisdictions.resolve((district, police_district, police_post, council_district, sheriff_district),
+                                 create=create)
+
+
+# Function to resolve many locations at once
+def resolve_locations(rows, create=True):
+    """
+    Resolve many locations at once, for ingestion (see LookupCache.resolve_many()).
+
+    Parameters:
+    - rows (iterable): Locations as dicts keyed by LOCATION_FIELDS or tuples in that order.
+    - create (bool, optional): Create the missing locations. Defaults to True.
+
+    Returns:
+    - list of int or None: The location_id of each row, in order.
+    """
+    return locations.resolve_many(rows, create=create)
+
+
+# Function to resolve many jurisdictions at once
+def resolve_jurisdictions(rows, create=True):
+    """
+    Resolve many jurisdictions at once, for ingestion (see LookupCache.resolve_many()).
+
+    Parameters:
+    - rows (iterable): Jurisdictions as dicts keyed by JURISDICTION_FIELDS or tuples in that order.
+    - create (bool, optional): Create the missing jurisdictions. Defaults to True.
+
+    Returns:
+    - list of int or None: The jurisdiction_id of each row, in order.
+    """
+    return jurisdictions.resolve_many(rows, create=create)
+
+
+# Function to report the lookup cache statistics
+def lookup_stats():
+    """
+    Return the statistics of both shared caches.
+
+    Returns:
+    - dict: {'locations': ..., 'jurisdictions': ...}, see LookupCache.stats().
+    """
+    return {'locations': locations.stats(), 'jurisdictions': jurisdictions.stats()}
@@ -0,0 +1,855 @@
+"""
+Versioned schema migrations for the 911 call database.
+
+The schema version is stored in SQLite's `PRAGMA user_version`. Every migration runs in its own
+transaction together with the version bump, and only migrations newer than the stored version
+are applied, so migrate() is safe to call on every start-up.
+
+Each migration spells out its DDL as it was when the migration was released, instead of calling
+the modules that use the tables: a version number must mean the same schema whatever later edits
+are made to rollups.py, fulltext.py and the others. To change a table or a trigger, append a
+migration.
+
+Usage:
+    python migrations.py --db database/911_Call_Data.db           # apply pending migrations
+    python migrations.py --db database/911_Call_Data.db --check   # also verify the query plans
+"""
+import argparse
+import re
+import sqlite3
+
+from archive import aggregate
+from arcgis_sync import BACKFILL_QUERIES
+from export import EXPORT_SELECT
+from records import INCIDENT_FIELDS
+from rollups import ROLLUPS
+from timestamps import to_epoch
+
+
+# Function to run a script of statements without triggers
+def _execute_script(conn, script):
+    # executescript() would commit the migration's transaction, so run the statements one by one
+    for statement in script.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+# Function to replace the rows of a rollup table with a GROUP BY over the hot and archived calls
+def _fill_rollup(conn, table, keys, sql):
+    rows = aggregate(conn, sql)
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(f"INSERT INTO {table} ({', '.join(keys)}, count) VALUES ({', '.join('?' * (len(keys) + 1))})",
+                     rows)
+
+
+# Migration 1: the base tables from database/db_creation.ipynb
+def _create_base_tables(conn):
+    _execute_script(conn, """
+        CREATE TABLE IF NOT EXISTS Jurisdictions (
+            jurisdiction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            district TEXT,
+            police_district TEXT,
+            police_post TEXT,
+            council_district TEXT,
+            sheriff_district TEXT,
+            UNIQUE(district, police_district, police_post, council_district, sheriff_district)
+        );
+        CREATE TABLE IF NOT EXISTS Locations (
+            location_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            address TEXT,
+            neighborhood TEXT,
+            zip_code TEXT,
+            census_tract TEXT,
+            community_statistical_area TEXT,
+            UNIQUE(address, neighborhood, zip_code, census_tract, community_statistical_area)
+        );
+        CREATE TABLE IF NOT EXISTS Calls (
+            call_key TEXT PRIMARY KEY,
+            record_id TEXT,
+            call_date_time TEXT,  -- stored as TEXT (ISO format) in SQLite
+            priority TEXT,
+            description TEXT,
+            call_number TEXT,
+            incident_location_id INTEGER,
+            reporter_location_id INTEGER,
+            jurisdiction_id INTEGER,
+            FOREIGN KEY (incident_location_id) REFERENCES Locations(location_id),
+            FOREIGN KEY (reporter_location_id) REFERENCES Locations(location_id),
+            FOREIGN KEY (jurisdiction_id) REFERENCES Jurisdictions(jurisdiction_id)
+        );
+        CREATE TABLE IF NOT EXISTS ArcGIS_Metadata (
+            call_key TEXT PRIMARY KEY,
+            needs_sync INTEGER,  -- booleans stored as 0 (False) or 1 (True)
+            esri_oid INTEGER,
+            FOREIGN KEY (call_key) REFERENCES Calls(call_key)
+        )
+    """)
+
+
+# Migration 2: indexes for the backend lookups and the dashboard aggregates
+def _create_indexes(conn):
+    # executescript() would commit the migration's transaction, so run the statements one by one
+    for statement in (
+        # read_incidents(): ORDER BY call_date_time DESC LIMIT 10
+        "CREATE INDEX IF NOT EXISTS idx_calls_call_date_time ON Calls(call_date_time)",
+        # Priority filters, and a covering index for the priority/time dashboard charts
+        "CREATE INDEX IF NOT EXISTS idx_calls_priority_time ON Calls(priority, call_date_time)",
+        # Foreign keys used by the dashboard joins
+        "CREATE INDEX IF NOT EXISTS idx_calls_jurisdiction ON Calls(jurisdiction_id)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_incident_location ON Calls(incident_location_id)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_reporter_location ON Calls(reporter_location_id)",
+        # Covering indexes so GROUP BY district / neighborhood walk the lookup tables in order
+        "CREATE INDEX IF NOT EXISTS idx_jurisdictions_district ON Jurisdictions(district, jurisdiction_id)",
+        "CREATE INDEX IF NOT EXISTS idx_locations_neighborhood ON Locations(neighborhood, location_id)",
+    ):
+        conn.execute(statement)
+    conn.execute("ANALYZE")  # Give the query planner statistics for the new indexes
+
+
+# Migration 3: a sortable integer epoch next to the free-text call_date_time
+def _add_call_epoch(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Calls)")]
+    if 'call_epoch' not in columns:
+        conn.execute("ALTER TABLE Calls ADD COLUMN call_epoch INTEGER")  # seconds since 1970-01-01 UTC
+
+    # Backfill existing rows by parsing call_date_time once, here, instead of on every render
+    conn.create_function('to_epoch', 1, to_epoch, deterministic=True)
+    conn.execute("UPDATE Calls SET call_epoch = to_epoch(call_date_time) WHERE call_epoch IS NULL")
+
+    for statement in (
+        # Ordering and time-range filters, and hour/day bucketing for the dashboard
+        "CREATE INDEX IF NOT EXISTS idx_calls_epoch ON Calls(call_epoch)",
+        # Covering index for priority counts and priority over time
+        "CREATE INDEX IF NOT EXISTS idx_calls_priority_epoch ON Calls(priority, call_epoch)",
+        # Superseded by the epoch indexes above
+        "DROP INDEX IF EXISTS idx_calls_call_date_time",
+        "DROP INDEX IF EXISTS idx_calls_priority_time",
+    ):
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+
+
+# Trigger statements of migration 4, adding one call (the NEW row) to every rollup
+_V4_ADD_NEW = """
+    INSERT INTO Rollup_Priority (priority, count)
+        SELECT NEW.priority, 1 WHERE NEW.priority IS NOT NULL
+        ON CONFLICT(priority) DO UPDATE SET count = count + 1;
+    INSERT INTO Rollup_Hour (hour, count)
+        SELECT CAST(strftime('%H', NEW.call_epoch, 'unixepoch') AS INTEGER), 1 WHERE NEW.call_epoch IS NOT NULL
+        ON CONFLICT(hour) DO UPDATE SET count = count + 1;
+    INSERT INTO Rollup_District (district, count)
+        SELECT J.district, 1 FROM Jurisdictions J
+        WHERE J.jurisdiction_id = NEW.jurisdiction_id AND J.district IS NOT NULL
+        ON CONFLICT(district) DO UPDATE SET count = count + 1;
+    INSERT INTO Rollup_Neighborhood (neighborhood, count)
+        SELECT L.neighborhood, 1 FROM Locations L
+        WHERE L.location_id = NEW.reporter_location_id AND L.neighborhood IS NOT NULL
+        ON CONFLICT(neighborhood) DO UPDATE SET count = count + 1;
+    INSERT INTO Rollup_Location (location_id, count)
+        SELECT L.location_id, 1 FROM Locations L WHERE L.location_id = NEW.reporter_location_id
+        ON CONFLICT(location_id) DO UPDATE SET count = count + 1;
+    INSERT INTO Rollup_Date_Priority (date, priority, count)
+        SELECT date(NEW.call_epoch, 'unixepoch'), NEW.priority, 1
+        WHERE NEW.call_epoch IS NOT NULL AND NEW.priority IS NOT NULL
+        ON CONFLICT(date, priority) DO UPDATE SET count = count + 1;
+"""
+
+# Trigger statements of migration 4, removing one call (the OLD row) from every rollup. Empty
+# groups are deleted so the rollups contain exactly the groups a GROUP BY over Calls would return.
+_V4_REMOVE_OLD = """
+    UPDATE Rollup_Priority SET count = count - 1 WHERE priority = OLD.priority;
+    DELETE FROM Rollup_Priority WHERE priority = OLD.priority AND count <= 0;
+    UPDATE Rollup_Hour SET count = count - 1
+        WHERE hour = CAST(strftime('%H', OLD.call_epoch, 'unixepoch') AS INTEGER);
+    DELETE FROM Rollup_Hour
+        WHERE hour = CAST(strftime('%H', OLD.call_epoch, 'unixepoch') AS INTEGER) AND count <= 0;
+    UPDATE Rollup_District SET count = count - 1
+        WHERE district = (SELECT district FROM Jurisdictions WHERE jurisdiction_id = OLD.jurisdiction_id);
+    DELETE FROM Rollup_District
+        WHERE district = (SELECT district FROM Jurisdictions WHERE jurisdiction_id = OLD.jurisdiction_id)
+        AND count <= 0;
+    UPDATE Rollup_Neighborhood SET count = count - 1
+        WHERE neighborhood = (SELECT neighborhood FROM Locations WHERE location_id = OLD.reporter_location_id);
+    DELETE FROM Rollup_Neighborhood
+        WHERE neighborhood = (SELECT neighborhood FROM Locations WHERE location_id = OLD.reporter_location_id)
+        AND count <= 0;
+    UPDATE Rollup_Location SET count = count - 1 WHERE location_id = OLD.reporter_location_id;
+    DELETE FROM Rollup_Location WHERE location_id = OLD.reporter_location_id AND count <= 0;
+    UPDATE Rollup_Date_Priority SET count = count - 1
+        WHERE date = date(OLD.call_epoch, 'unixepoch') AND priority = OLD.priority;
+    DELETE FROM Rollup_Date_Priority
+        WHERE date = date(OLD.call_epoch, 'unixepoch') AND priority = OLD.priority AND count <= 0;
+"""
+
+
+# Migration 4: trigger-maintained rollup tables for the dashboard
+def _add_rollups(conn):
+    _execute_script(conn, """
+        CREATE TABLE IF NOT EXISTS Rollup_Priority (
+            priority TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS Rollup_Hour (
+            hour INTEGER PRIMARY KEY,  -- 0-23, UTC
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS Rollup_District (
+            district TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS Rollup_Neighborhood (
+            neighborhood TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS Rollup_Location (
+            location_id INTEGER PRIMARY KEY,  -- reporter location
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS Rollup_Date_Priority (
+            date TEXT NOT NULL,  -- YYYY-MM-DD, UTC
+            priority TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (date, priority)
+        ) WITHOUT ROWID;
+    """)
+    for statement in (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_insert AFTER INSERT ON Calls
+        BEGIN
+            {_V4_ADD_NEW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_delete AFTER DELETE ON Calls
+        BEGIN
+            {_V4_REMOVE_OLD}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_update
+        AFTER UPDATE OF priority, call_epoch, jurisdiction_id, reporter_location_id ON Calls
+        BEGIN
+            {_V4_REMOVE_OLD}
+            {_V4_ADD_NEW}
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+    # Fill the rollups from the calls already loaded (there is no archive yet)
+    _execute_script(conn, """
+        INSERT INTO Rollup_Priority (priority, count)
+            SELECT priority, COUNT(*) FROM Calls WHERE priority IS NOT NULL GROUP BY priority;
+        INSERT INTO Rollup_Hour (hour, count)
+            SELECT CAST(strftime('%H', call_epoch, 'unixepoch') AS INTEGER) AS hour, COUNT(*) FROM Calls
+            WHERE call_epoch IS NOT NULL GROUP BY hour;
+        INSERT INTO Rollup_District (district, count)
+            SELECT J.district, COUNT(*) FROM Calls C JOIN Jurisdictions J ON C.jurisdiction_id = J.jurisdiction_id
+            WHERE J.district IS NOT NULL GROUP BY J.district;
+        INSERT INTO Rollup_Neighborhood (neighborhood, count)
+            SELECT L.neighborhood, COUNT(*) FROM Calls C JOIN Locations L ON C.reporter_location_id = L.location_id
+            WHERE L.neighborhood IS NOT NULL GROUP BY L.neighborhood;
+        INSERT INTO Rollup_Location (location_id, count)
+            SELECT C.reporter_location_id, COUNT(*) FROM Calls C JOIN Locations L ON C.reporter_location_id = L.location_id
+            GROUP BY C.reporter_location_id;
+        INSERT INTO Rollup_Date_Priority (date, priority, count)
+            SELECT date(call_epoch, 'unixepoch') AS date, priority, COUNT(*) FROM Calls
+            WHERE call_epoch IS NOT NULL AND priority IS NOT NULL GROUP BY date, priority
+    """)
+
+
+# Migration 5: indexes for keyset pagination on (call_epoch, call_key)
+def _add_keyset_indexes(conn):
+    for statement in (
+        # list_incidents(): ORDER BY call_epoch DESC, call_key DESC with a (call_epoch, call_key) < (?, ?) seek.
+        # Each index ends with the tie-breaker so pages never need a sort, whatever the filter.
+        "CREATE INDEX IF NOT EXISTS idx_calls_epoch_key ON Calls(call_epoch, call_key)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_priority_epoch_key ON Calls(priority, call_epoch, call_key)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_jurisdiction_epoch_key ON Calls(jurisdiction_id, call_epoch, call_key)",
+        # Prefixes of the indexes above
+        "DROP INDEX IF EXISTS idx_calls_epoch",
+        "DROP INDEX IF EXISTS idx_calls_priority_epoch",
+        "DROP INDEX IF EXISTS idx_calls_jurisdiction",
+    ):
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+
+
+# Migration 6: FTS5 index over Calls.description
+def _add_fulltext(conn):
+    # An external-content table: only the inverted index, the text is read back from Calls by rowid
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS Calls_FTS USING fts5(
+            description,
+            content='Calls',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    for statement in (
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_fts_insert AFTER INSERT ON Calls
+        BEGIN
+            INSERT INTO Calls_FTS (rowid, description) VALUES (NEW.rowid, NEW.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_fts_delete AFTER DELETE ON Calls
+        BEGIN
+            INSERT INTO Calls_FTS (Calls_FTS, rowid, description) VALUES ('delete', OLD.rowid, OLD.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_fts_update AFTER UPDATE OF description ON Calls
+        BEGIN
+            INSERT INTO Calls_FTS (Calls_FTS, rowid, description) VALUES ('delete', OLD.rowid, OLD.description);
+            INSERT INTO Calls_FTS (rowid, description) VALUES (NEW.rowid, NEW.description);
+        END
+        """,
+    ):
+        conn.execute(statement)
+    conn.execute("INSERT INTO Calls_FTS (Calls_FTS) VALUES ('rebuild')")  # Index the calls already loaded
+
+
+# Migration 7: bookkeeping for the monthly archive, and rollups that survive archiving
+def _add_archive(conn):
+    _execute_script(conn, """
+        -- Flags set inside a maintenance transaction and checked by triggers, e.g. 'archiving' makes
+        -- the rollup triggers ignore calls that are moved to the archive rather than deleted
+        CREATE TABLE IF NOT EXISTS Maintenance_Flags (
+            name TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        -- One row per monthly archive database (see archive.py)
+        CREATE TABLE IF NOT EXISTS Archive_Partitions (
+            month TEXT PRIMARY KEY,         -- YYYY-MM
+            path TEXT NOT NULL,             -- relative to the main database's directory
+            start_epoch INTEGER NOT NULL,   -- first second of the month, UTC
+            end_epoch INTEGER NOT NULL,     -- first second of the next month
+            row_count INTEGER NOT NULL,
+            archived_at INTEGER NOT NULL    -- epoch of the last archive run that wrote to it
+        )
+    """)
+    # Recreate the delete trigger of migration 4 with an 'archiving' WHEN clause
+    conn.execute("DROP TRIGGER IF EXISTS trg_calls_rollup_delete")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_delete AFTER DELETE ON Calls
+        WHEN NOT EXISTS (SELECT 1 FROM Maintenance_Flags WHERE name = 'archiving')
+        BEGIN
+            {_V4_REMOVE_OLD}
+        END
+    """)
+
+
+# Migration 8: trigger-maintained change log of Calls (the calls already loaded are not logged)
+def _add_changelog(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Call_Changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- never reused, even after pruning
+            call_key TEXT NOT NULL,
+            operation TEXT NOT NULL,                -- 'insert', 'update' or 'delete'
+            changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    """)
+    for statement in (
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_changes_insert AFTER INSERT ON Calls
+        BEGIN
+            INSERT INTO Call_Changes (call_key, operation) VALUES (NEW.call_key, 'insert');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_changes_update AFTER UPDATE ON Calls
+        BEGIN
+            INSERT INTO Call_Changes (call_key, operation)
+                SELECT OLD.call_key, 'delete' WHERE OLD.call_key IS NOT NEW.call_key;
+            INSERT INTO Call_Changes (call_key, operation) VALUES (NEW.call_key, 'update');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_changes_delete AFTER DELETE ON Calls
+        WHEN NOT EXISTS (SELECT 1 FROM Maintenance_Flags WHERE name = 'archiving')
+        BEGIN
+            INSERT INTO Call_Changes (call_key, operation) VALUES (OLD.call_key, 'delete');
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+# Migration 9: covering index for neighborhood and location charts limited to a time window
+def _add_reporter_epoch_index(conn):
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS idx_calls_reporter_epoch ON Calls(reporter_location_id, call_epoch)",
+        "DROP INDEX IF EXISTS idx_calls_reporter_location",  # Prefix of the index above
+    ):
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+
+
+# Migration 10: ArcGIS sync triggers and checkpoints (SyncWorker backfills the calls never synced)
+def _add_arcgis_sync(conn):
+    _execute_script(conn, """
+        -- Progress of each consumer of the Call_Changes log (see arcgis_sync.py)
+        CREATE TABLE IF NOT EXISTS Sync_Checkpoints (
+            name TEXT PRIMARY KEY,          -- consumer, e.g. 'arcgis'
+            last_seq INTEGER NOT NULL,      -- last Call_Changes.seq fully applied
+            updated_at INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        -- The later changes of a call, to keep it dirty when it changed again during its sync
+        CREATE INDEX IF NOT EXISTS idx_call_changes_key ON Call_Changes(call_key, seq)
+    """)
+    for statement in (
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_sync_insert AFTER INSERT ON Calls
+        BEGIN
+            INSERT INTO ArcGIS_Metadata (call_key, needs_sync) VALUES (NEW.call_key, 1)
+                ON CONFLICT(call_key) DO UPDATE SET needs_sync = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_sync_update AFTER UPDATE ON Calls
+        BEGIN
+            UPDATE ArcGIS_Metadata SET needs_sync = 1 WHERE call_key = OLD.call_key AND OLD.call_key IS NOT NEW.call_key;
+            INSERT INTO ArcGIS_Metadata (call_key, needs_sync) VALUES (NEW.call_key, 1)
+                ON CONFLICT(call_key) DO UPDATE SET needs_sync = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_calls_sync_delete AFTER DELETE ON Calls
+        WHEN NOT EXISTS (SELECT 1 FROM Maintenance_Flags WHERE name = 'archiving')
+        BEGIN
+            UPDATE ArcGIS_Metadata SET needs_sync = 1 WHERE call_key = OLD.call_key;
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+# Trigger statements of migration 11: those of migration 4, plus the incident location rollup
+_V11_ADD_NEW = _V4_ADD_NEW + """
+    INSERT INTO Rollup_Incident_Location (location_id, count)
+        SELECT L.location_id, 1 FROM Locations L WHERE L.location_id = NEW.incident_location_id
+        ON CONFLICT(location_id) DO UPDATE SET count = count + 1;
+"""
+_V11_REMOVE_OLD = _V4_REMOVE_OLD + """
+    UPDATE Rollup_Incident_Location SET count = count - 1 WHERE location_id = OLD.incident_location_id;
+    DELETE FROM Rollup_Incident_Location WHERE location_id = OLD.incident_location_id AND count <= 0;
+"""
+
+
+# Migration 11: location coordinates, their R*Tree index, calls per incident location for hot-spot maps
+def _add_spatial_index(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Locations)")]
+    for column in ('latitude', 'longitude'):  # WGS84 degrees
+        if column not in columns:
+            conn.execute(f"ALTER TABLE Locations ADD COLUMN {column} REAL")
+    # One-point boxes (min = max) of the located Locations rows
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS Locations_RTree USING rtree(
+            location_id,
+            min_lat, max_lat,
+            min_lon, max_lon
+        )
+    """)
+    for statement in (
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_locations_rtree_insert AFTER INSERT ON Locations
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT INTO Locations_RTree VALUES (NEW.location_id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_locations_rtree_update AFTER UPDATE OF latitude, longitude ON Locations
+        BEGIN
+            DELETE FROM Locations_RTree WHERE location_id = OLD.location_id;
+            INSERT INTO Locations_RTree SELECT NEW.location_id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+                WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_locations_rtree_delete AFTER DELETE ON Locations
+        BEGIN
+            DELETE FROM Locations_RTree WHERE location_id = OLD.location_id;
+        END
+        """,
+    ):
+        conn.execute(statement)
+    conn.execute("INSERT OR REPLACE INTO Locations_RTree SELECT location_id, latitude, latitude, longitude, longitude "
+                 "FROM Locations WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+
+    for statement in (
+        # Calls at the locations found in an area: newest first (covering the sort), or counted over a time window
+        "CREATE INDEX IF NOT EXISTS idx_calls_incident_epoch_key ON Calls(incident_location_id, call_epoch, call_key)",
+        "DROP INDEX IF EXISTS idx_calls_incident_location",  # Prefix of the index above
+    ):
+        conn.execute(statement)
+
+    # Recreate the rollup triggers so they maintain Rollup_Incident_Location too
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Rollup_Incident_Location (
+            location_id INTEGER PRIMARY KEY,  -- incident location, for the hot-spot map
+            count INTEGER NOT NULL
+        )
+    """)
+    for name in ('trg_calls_rollup_insert', 'trg_calls_rollup_delete', 'trg_calls_rollup_update'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for statement in (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_insert AFTER INSERT ON Calls
+        BEGIN
+            {_V11_ADD_NEW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_delete AFTER DELETE ON Calls
+        WHEN NOT EXISTS (SELECT 1 FROM Maintenance_Flags WHERE name = 'archiving')
+        BEGIN
+            {_V11_REMOVE_OLD}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_update
+        AFTER UPDATE OF priority, call_epoch, jurisdiction_id, reporter_location_id, incident_location_id ON Calls
+        BEGIN
+            {_V11_REMOVE_OLD}
+            {_V11_ADD_NEW}
+        END
+        """,
+    ):
+        conn.execute(statement)
+    _fill_rollup(conn, 'Rollup_Incident_Location', ('location_id',), """
+        SELECT C.incident_location_id AS location_id, COUNT(*) AS count
+        FROM Calls C
+        JOIN Locations L ON C.incident_location_id = L.location_id
+        GROUP BY C.incident_location_id
+    """)
+    conn.execute("ANALYZE")
+
+
+# Function to normalize a jurisdiction value stored by database/db_creation.ipynb
+def _notebook_field(value):
+    # The notebook bound the raw pandas values: NaN as NULL and whole numbers as REAL ("11.0")
+    if value is None:
+        return ""
+    text = str(value).strip()
+    return text[:-2] if re.fullmatch(r"-?\d+\.0", text) else text
+
+
+# Migration 12: jurisdiction values normalized like the loader and lookups.py ("11", not "11.0")
+def _normalize_jurisdictions(conn):
+    fields = ('district', 'police_district', 'police_post', 'council_district', 'sheriff_district')
+    rows = conn.execute(f"SELECT jurisdiction_id, {', '.join(fields)} FROM Jurisdictions "
+                        f"ORDER BY jurisdiction_id").fetchall()
+    ids = {tuple(row[1:]): row[0] for row in rows}
+    changed = False
+    for row in rows:
+        key = tuple(row[1:])
+        normalized = tuple(_notebook_field(value) for value in key)
+        if normalized == key:
+            continue
+        changed = True
+        target = ids.get(normalized)
+        if target is None:
+            conn.execute(f"UPDATE Jurisdictions SET {', '.join(f'{field} = ?' for field in fields)} "
+                         f"WHERE jurisdiction_id = ?", normalized + (row[0],))
+            ids[normalized] = row[0]
+        else:
+            # The loader already created the normalized row: move the hot calls to it. The old row
+            # stays, as archived calls may still point at it.
+            conn.execute("UPDATE Calls SET jurisdiction_id = ? WHERE jurisdiction_id = ?", (target, row[0]))
+    if changed:
+        # District names may have lost whitespace
+        _fill_rollup(conn, 'Rollup_District', ('district',), """
+            SELECT J.district, COUNT(*) AS count
+            FROM Calls C
+            JOIN Jurisdictions J ON C.jurisdiction_id = J.jurisdiction_id
+            WHERE J.district IS NOT NULL
+            GROUP BY J.district
+        """)
+
+
+# Migration 13: the located locations, which incident_grid() places in cells without a bounding box
+def _add_coordinates_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_locations_coordinates ON Locations(latitude, longitude) "
+                 "WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+
+
+# Migration 14: insert triggers that leave the calls of a bulk load to the loader (see loader.load_chunk)
+def _add_loading_flag(conn):
+    loading = "NOT EXISTS (SELECT 1 FROM Maintenance_Flags WHERE name = 'loading')"
+    for name in ('trg_calls_rollup_insert', 'trg_calls_fts_insert', 'trg_calls_changes_insert', 'trg_calls_sync_insert'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for statement in (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_insert AFTER INSERT ON Calls
+        WHEN {loading}
+        BEGIN
+            {_V11_ADD_NEW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_fts_insert AFTER INSERT ON Calls
+        WHEN {loading}
+        BEGIN
+            INSERT INTO Calls_FTS (rowid, description) VALUES (NEW.rowid, NEW.description);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_changes_insert AFTER INSERT ON Calls
+        WHEN {loading}
+        BEGIN
+            INSERT INTO Call_Changes (call_key, operation) VALUES (NEW.call_key, 'insert');
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_sync_insert AFTER INSERT ON Calls
+        WHEN {loading}
+        BEGIN
+            INSERT INTO ArcGIS_Metadata (call_key, needs_sync) VALUES (NEW.call_key, 1)
+                ON CONFLICT(call_key) DO UPDATE SET needs_sync = 1;
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+# Ordered list of (version, description, function). Append new migrations at the end.
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "indexes for backend and dashboard queries", _create_indexes),
+    (3, "call_epoch column with backfill and indexes", _add_call_epoch),
+    (4, "dashboard rollup tables and triggers", _add_rollups),
+    (5, "keyset pagination indexes", _add_keyset_indexes),
+    (6, "full-text index over call descriptions", _add_fulltext),
+    (7, "archive partitions and archive-aware rollups", _add_archive),
+    (8, "change log of Calls", _add_changelog),
+    (9, "reporter location and time index", _add_reporter_epoch_index),
+    (10, "ArcGIS sync triggers and checkpoints", _add_arcgis_sync),
+    (11, "location coordinates and spatial index", _add_spatial_index),
+    (12, "normalized jurisdiction values", _normalize_jurisdictions),
+    (13, "index of located locations", _add_coordinates_index),
+    (14, "insert triggers skipped by bulk loads", _add_loading_flag),
+]
+
+# Every query issued by backend.py and the dashboard, with example parameters, for check_query_plans().
+QUERY_PLAN_CHECKS = {
+    'list_incidents': ("SELECT * FROM Calls WHERE call_epoch IS NOT NULL AND (call_epoch, call_key) < (?, ?) "
+                       "ORDER BY call_epoch DESC, call_key DESC LIMIT 11", (1638352800, 'key')),
+    'list_incidents_priority': ("SELECT * FROM Calls WHERE call_epoch IS NOT NULL AND priority IN (?) "
+                                "AND (call_epoch, call_key) < (?, ?) ORDER BY call_epoch DESC, call_key DESC LIMIT 11",
+                                ('High', 1638352800, 'key')),
+    'list_incidents_jurisdiction': ("SELECT * FROM Calls WHERE call_epoch IS NOT NULL AND jurisdiction_id = ? "
+                                    "AND call_epoch >= ? AND call_epoch < ? "
+                                    "ORDER BY call_epoch DESC, call_key DESC LIMIT 11", (1, 1638316800, 1638403200)),
+    'list_incidents_untimed': ("SELECT * FROM Calls WHERE call_epoch IS NULL AND call_key < ? "
+                               "ORDER BY call_key DESC LIMIT 11", ('key',)),
+    'search_incident': ("SELECT * FROM Calls WHERE call_key = ? ORDER BY call_epoch DESC, call_key DESC", ('key',)),
+    'search_incident_fulltext': ("SELECT C.* FROM main.Calls_FTS F JOIN main.Calls C ON C.rowid = F.rowid "
+                                 "WHERE F.Calls_FTS MATCH ? AND priority IN (?) ORDER BY F.rank LIMIT 100",
+                                 ('"burglary"', 'High')),
+    'update_incident': ("UPDATE Calls SET priority = ? WHERE call_key = ?", ('High', 'key')),
+    'delete_incident': ("DELETE FROM Calls WHERE call_key = ?", ('key',)),
+    'update_incidents_many': ("UPDATE Calls SET priority = ? WHERE call_key IN (SELECT value FROM json_each(?))",
+                              ('High', '["a", "b"]')),
+    'delete_incidents_many': ("DELETE FROM Calls WHERE priority IN (?) AND call_epoch >= ? AND call_epoch < ?",
+                              ('Low', 1638316800, 1638403200)),
+    # backend.incident_changes: the calls changed since a live board's watermark
+    'incident_changes': ("SELECT * FROM Calls WHERE call_key IN (SELECT value FROM json_each(?)) AND priority IN (?)",
+                         ('["a", "b"]', 'High')),
+    # backend.incidents_near / incidents_in_bbox: the located locations in a box, then their newest calls
+    'locations_in_bbox': ("SELECT L.location_id, L.latitude, L.longitude FROM Locations_RTree R "
+                          "JOIN Locations L ON L.location_id = R.location_id "
+                          "WHERE R.min_lat <= ? AND R.max_lat >= ? AND R.min_lon <= ? AND R.max_lon >= ? "
+                          "AND L.latitude BETWEEN ? AND ? AND L.longitude BETWEEN ? AND ?",
+                          (39.3, 39.2, -76.5, -76.7, 39.2, 39.3, -76.7, -76.5)),
+    'incidents_near': ("SELECT * FROM main.Calls WHERE rowid IN (SELECT rowid FROM main.Calls "
+                       "WHERE incident_location_id IN (SELECT value FROM json_each(?)) AND call_epoch >= ? "
+                       "ORDER BY call_epoch DESC, call_key DESC LIMIT 100) ORDER BY call_epoch DESC, call_key DESC",
+                       ('[1, 2]', 1638316800)),
+    # backend.incident_grid: calls per location in a box, for the heatmap cells
+    'incident_grid_bbox': ("SELECT C.incident_location_id, COUNT(*) FROM Locations_RTree R "
+                           "JOIN Locations L ON L.location_id = R.location_id "
+                           "JOIN Calls C ON C.incident_location_id = L.location_id "
+                           "WHERE R.min_lat <= ? AND R.max_lat >= ? AND R.min_lon <= ? AND R.max_lon >= ? "
+                           "GROUP BY C.incident_location_id", (39.3, 39.2, -76.5, -76.7)),
+    # backend.incident_grid: the middle latitude, the whole-history counts from the rollup, and the
+    # calls per location over a long unfiltered window (location index) or a filtered one (epoch index)
+    'incident_grid_middle': ("SELECT (MIN(L.latitude) + MAX(L.latitude)) / 2 FROM main.Locations L "
+                             "WHERE L.latitude IS NOT NULL AND L.longitude IS NOT NULL", ()),
+    'incident_grid_rollup': ("SELECT CAST((L.latitude + 90) / ? AS INTEGER) AS cell_y, "
+                             "CAST((L.longitude + 180) / ? AS INTEGER) AS cell_x, SUM(RI.count) FROM main.Locations L "
+                             "JOIN Rollup_Incident_Location RI ON RI.location_id = L.location_id "
+                             "WHERE L.latitude IS NOT NULL AND L.longitude IS NOT NULL GROUP BY cell_y, cell_x",
+                             (0.002, 0.003)),
+    **{f'incident_grid_{kind}': ("SELECT CAST((L.latitude + 90) / ? AS INTEGER) AS cell_y, "
+                                 "CAST((L.longitude + 180) / ? AS INTEGER) AS cell_x, SUM(C.count) FROM main.Locations L "
+                                 "JOIN (SELECT incident_location_id, COUNT(*) AS count FROM main.Calls "
+                                 f"WHERE {where} GROUP BY {group}) C ON C.incident_location_id = L.location_id "
+                                 "WHERE L.latitude IS NOT NULL AND L.longitude IS NOT NULL GROUP BY cell_y, cell_x",
+                                 (0.002, 0.003) + params)
+       for kind, where, group, params in (
+           ('long_window', "call_epoch >= ? AND call_epoch < ?", "incident_location_id", (1633046400, 1638316800)),
+           ('short_window', "call_epoch >= ? AND call_epoch < ?", "+incident_location_id", (1638316800, 1638403200)),
+           ('filtered', "priority IN (?) AND call_epoch >= ?", "+incident_location_id", ('High', 1638316800)))},
+    # backend.iter_incidents: every incident newest first, or those matching the filters
+    'iter_incidents': (f"SELECT {', '.join(INCIDENT_FIELDS)} FROM main.Calls ORDER BY call_epoch DESC, call_key DESC", ()),
+    'iter_incidents_filtered': (f"SELECT {', '.join(INCIDENT_FIELDS)} FROM main.Calls WHERE priority IN (?) "
+                                "AND call_epoch >= ? AND call_epoch < ? ORDER BY call_epoch DESC, call_key DESC",
+                                ('High', 1638316800, 1638403200)),
+    # backend.export_incidents: the matching calls joined with their lookups, then counted if asked
+    'export_incidents': (EXPORT_SELECT.format(calls="SELECT * FROM main.Calls WHERE jurisdiction_id = ? "
+                                                    "AND call_epoch >= ? AND call_epoch < ?"),
+                         (1, 1638316800, 1638403200)),
+    'export_incidents_ordered': (EXPORT_SELECT.format(calls="SELECT * FROM main.Calls")
+                                 + " ORDER BY C.call_epoch DESC, C.call_key DESC", ()),
+    'export_incidents_fulltext': (EXPORT_SELECT.format(
+        calls="SELECT H.* FROM main.Calls_FTS F JOIN main.Calls H ON H.rowid = F.rowid "
+              "WHERE F.Calls_FTS MATCH ? AND priority IN (?)"), ('"burglary"', 'High')),
+    'export_incidents_count': ("SELECT COUNT(*) FROM (SELECT * FROM main.Calls WHERE priority IN (?) AND call_epoch >= ?)",
+                               ('High', 1638316800)),
+    # arcgis_sync.SyncWorker: the next batch, and whether a call changed again since
+    'sync_batch': ("SELECT seq, call_key FROM Call_Changes WHERE seq > ? ORDER BY seq LIMIT 500", (0,)),
+    'sync_changed_since': ("SELECT 1 FROM Call_Changes WHERE call_key = ? AND seq > ?", ('key', 0)),
+    **{f'sync_backfill_{index}': (sql, ('', 500)) for index, sql in enumerate(BACKFILL_QUERIES)},
+    # The dashboard reads the rollup tables; the aggregates they materialize are checked too
+    **{f'dashboard_{name}': (f"SELECT * FROM {table}", ()) for name, (table, _, _) in ROLLUPS.items()},
+    **{f'aggregate_{name}': (aggregate, ()) for name, (_, _, aggregate) in ROLLUPS.items()},
+    # Dashboard charts limited to a time window (see archive.aggregate)
+    **{f'aggregate_{name}_window': (f"WITH Calls AS (SELECT * FROM main.Calls WHERE call_epoch >= ? AND call_epoch < ?) "
+                                    f"{aggregate}", (1638316800, 1638403200))
+       for name, (_, _, aggregate) in ROLLUPS.items()},
+}
+
+
+# Function to read the current schema version
+def schema_version(conn):
+    """
+    Return the schema version stored in the database.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+
+    Returns:
+    - int: The value of PRAGMA user_version (0 for a database that was never migrated).
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Function to apply pending migrations
+def migrate(conn, target=None):
+    """
+    Apply every migration newer than the database's schema version, in order.
+
+    Each migration runs inside a BEGIN IMMEDIATE transaction that also bumps user_version, so a
+    failed migration leaves no partial changes and concurrent processes never apply the same
+    migration twice.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - target (int, optional): Stop after this version. Defaults to the latest migration.
+
+    Returns:
+    - list of int: The versions that were applied (empty if the schema was already current).
+    """
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if schema_version(conn) >= version:
+            continue
+
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:  # Applied by another process while we waited
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# Function to get the query plan of a statement
+def explain(conn, sql, params=()):
+    """
+    Return the EXPLAIN QUERY PLAN details of a statement.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - sql (str): The statement to explain.
+    - params (tuple, optional): Parameters for the statement's placeholders.
+
+    Returns:
+    - list of str: One detail line per plan step, e.g. "SEARCH Calls USING INDEX ...".
+    """
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+# Function to check that queries are served by indexes
+def check_query_plans(conn, queries=None, allowed_scans=None):
+    """
+    Assert that none of the given queries scans a table without an index.
+
+    A plan step such as "SCAN Calls" means a full table scan, while "SCAN C USING COVERING INDEX ..."
+    (walking an index in order), "SEARCH ..." steps and scans of a subquery SQLite materialized
+    (whose own plan is checked) are accepted.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to a migrated database.
+    - queries (dict, optional): Maps a name to (sql, params). Defaults to QUERY_PLAN_CHECKS.
+    - allowed_scans (set of str, optional): Tables that may be scanned in full because they are small
+      by construction. Defaults to the rollup tables.
+
+    Raises:
+    - AssertionError: If any query plan contains a full table scan. The message lists every offender.
+
+    Returns:
+    - dict: Maps each query name to its plan details.
+    """
+    if allowed_scans is None:
+        allowed_scans = {table for table, _, _ in ROLLUPS.values()}
+
+    plans = {}
+    failures = []
+    for name, (sql, params) in (queries or QUERY_PLAN_CHECKS).items():
+        plans[name] = explain(conn, sql, params)
+        subqueries = {step.split()[1] for step in plans[name] if step.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+        scans = [step for step in plans[name] if step.startswith('SCAN ') and ' INDEX' not in step
+                 and step.split()[1] not in allowed_scans | subqueries]
+        if scans:
+            failures.append(f"{name}: {'; '.join(scans)}")
+
+    if failures:
+        raise AssertionError("Queries without an index:\n" + "\n".join(failures))
+    return plans
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the 911 call database.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--check', action='store_true', help="Verify that every query uses an index.")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        applied = migrate(conn)
+        print(f"Schema version {schema_version(conn)} (applied: {applied or 'none'})")
+        if args.check:
+            for name, plan in check_query_plans(conn).items():
+                print(f"{name}: {' | '.join(plan)}")
+            print("All queries use an index.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
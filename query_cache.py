@@ -0,0 +1,152 @@
+"""
+In-process cache for read queries, shared by every Streamlit session of the server.
+
+Entries are bounded in number (least recently used entries are evicted first), expire after a
+TTL, and are tied to the database's data version (see db.data_version()): any commit, from this
+process or another one, makes every older entry stale. Cached values are shared between callers
+and must be treated as read-only.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import db
+
+
+class QueryCache:
+    """
+    A thread-safe LRU cache whose entries expire after a TTL or when the data version changes.
+
+    Parameters:
+    - maxsize (int, optional): Maximum number of entries. Defaults to 256.
+    - ttl (float, optional): Seconds an entry stays valid even if the data does not change. Defaults to 60.
+    - version (callable, optional): Returns the current data version. Defaults to db.data_version.
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0, version=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version or db.data_version
+        self._entries = OrderedDict()  # key -> (value, version, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evictions': 0}
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """
+        Return the cached value for `key`, or compute, store and return it.
+
+        The data version is read before computing, so a write that lands while the value is being
+        computed makes the new entry stale rather than hiding the write.
+
+        Parameters:
+        - key (hashable): The cache key.
+        - compute (callable): Called without arguments to produce the value on a miss.
+        - ttl (float, optional): Overrides the cache's TTL for this entry.
+
+        Returns:
+        - object: The cached or freshly computed value.
+        """
+        version = self.version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, expires_at = entry
+                if entry_version != version:
+                    self._stats['stale'] += 1
+                    del self._entries[key]
+                elif expires_at <= now:
+                    self._stats['expired'] += 1
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+            self._stats['misses'] += 1
+
+        value = compute()
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, version, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return value
+
+    def stats(self):
+        """
+        Return the cache's hit/miss counters.
+
+        Returns:
+        - dict: hits, misses, stale (dropped because the data changed), expired (dropped by TTL),
+          evictions, size, maxsize, ttl and hit_rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['maxsize'] = self.maxsize
+        stats['ttl'] = self.ttl
+        return stats
+
+    def cached(self, ttl=None):
+        """
+        Decorator caching a function's results by its arguments.
+
+        Parameters:
+        - ttl (float, optional): Overrides the cache's TTL for this function.
+
+        Returns:
+        - callable: The decorator. The wrapped function gets an `uncached` attribute pointing to
+          the original function.
+        """
+        def decorator(function):
+            name = f"{function.__module__}.{function.__qualname__}"
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                key = (name, args, tuple(sorted(kwargs.items())))
+                try:
+                    hash(key)
+                except TypeError:  # e.g. a list argument: run uncached
+                    return function(*args, **kwargs)
+                return self.get_or_compute(key, lambda: function(*args, **kwargs), ttl=ttl)
+
+            wrapper.uncached = function
+            return wrapper
+        return decorator
+
+
+# Shared cache used by backend.py and dashboard_data.py
+default_cache = QueryCache()
+
+
+# Function to cache a read function in the shared cache
+def cached(ttl=None):
+    """
+    Decorator caching a function's results in the shared cache (see QueryCache.cached()).
+
+    Parameters:
+    - ttl (float, optional): Overrides the shared cache's TTL for this function.
+
+    Returns:
+    - callable: The decorator.
+    """
+    return default_cache.cached(ttl=ttl)
+
+
+# Function to report the shared cache's statistics
+def cache_stats():
+    """
+    Return the shared cache's statistics (see QueryCache.stats()).
+
+    Returns:
+    - dict: The cache counters.
+    """
+    return default_cache.stats()
@@ -0,0 +1,119 @@
+"""
+Compact shapes for the incidents returned by the backend read functions.
+
+The functions take a `shape` argument:
+- 'row': sqlite3.Row objects, as returned by SQLite (the default of the paged functions).
+- 'incident': Incident named tuples. They have no per-instance __dict__, support attribute access
+  (incident.priority) and `_asdict()` for callers that need a dict.
+- 'numpy': one dict of NumPy arrays (column name -> array) per batch. Text columns are object
+  arrays; integer columns are int64, or float64 with NaN where a value is NULL.
+- 'arrow': one pyarrow.RecordBatch per batch, with ARROW_SCHEMA.
+
+NumPy and pyarrow are optional dependencies, only needed for their shape.
+"""
+from collections import namedtuple
+
+from schema import CALL_COLUMNS
+
+try:
+    import numpy as np
+except ImportError:  # Only the 'numpy' shape needs it
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Only the 'arrow' shape needs it
+    pa = None
+
+# Columns of an incident: the Calls columns, then call_epoch
+INCIDENT_FIELDS = CALL_COLUMNS + ('call_epoch',)
+INTEGER_FIELDS = frozenset(('incident_location_id', 'reporter_location_id', 'jurisdiction_id', 'call_epoch'))
+
+# One incident as an immutable tuple with named fields
+Incident = namedtuple('Incident', INCIDENT_FIELDS)
+
+SHAPES = ('row', 'incident', 'numpy', 'arrow')
+# Shapes holding a batch of incidents rather than one incident per object
+BATCH_SHAPES = ('numpy', 'arrow')
+
+ARROW_SCHEMA = pa.schema([(name, pa.int64() if name in INTEGER_FIELDS else pa.string())
+                          for name in INCIDENT_FIELDS]) if pa is not None else None
+
+
+# Function to validate a shape
+def check_shape(shape):
+    """
+    Check that a shape is known and that its optional dependency is installed.
+
+    Parameters:
+    - shape (str): One of SHAPES.
+
+    Raises:
+    - ValueError: If the shape is unknown.
+    - RuntimeError: If NumPy or pyarrow is needed but not installed.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape!r}, expected one of {', '.join(SHAPES)}.")
+    if shape == 'numpy' and np is None:
+        raise RuntimeError("The 'numpy' shape needs the numpy package (pip install numpy).")
+    if shape == 'arrow' and pa is None:
+        raise RuntimeError("The 'arrow' shape needs the pyarrow package (pip install pyarrow).")
+
+
+# Function to convert rows into NumPy columns
+def to_numpy(rows):
+    """
+    Convert incident rows (in INCIDENT_FIELDS order) into NumPy columns.
+
+    Parameters:
+    - rows (list of tuple or sqlite3.Row): The incidents.
+
+    Returns:
+    - dict: Maps each of INCIDENT_FIELDS to an array of len(rows) values.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(INCIDENT_FIELDS)
+    batch = {}
+    for name, values in zip(INCIDENT_FIELDS, columns):
+        if name not in INTEGER_FIELDS:
+            batch[name] = np.array(values, dtype=object)
+        elif None in values:
+            batch[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            batch[name] = np.array(values, dtype=np.int64)
+    return batch
+
+
+# Function to convert rows into an Arrow record batch
+def to_arrow(rows):
+    """
+    Convert incident rows (in INCIDENT_FIELDS order) into an Arrow record batch.
+
+    Parameters:
+    - rows (list of tuple or sqlite3.Row): The incidents.
+
+    Returns:
+    - pyarrow.RecordBatch: The incidents, with ARROW_SCHEMA.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(INCIDENT_FIELDS)
+    return pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for field, values in zip(ARROW_SCHEMA, columns)],
+                                      schema=ARROW_SCHEMA)
+
+
+# Function to convert a list of rows to a shape
+def convert(rows, shape):
+    """
+    Convert incident rows (in INCIDENT_FIELDS order) to a shape.
+
+    Parameters:
+    - rows (list of tuple or sqlite3.Row): The incidents.
+    - shape (str): One of SHAPES.
+
+    Returns:
+    - list or dict or pyarrow.RecordBatch: A list of sqlite3.Row or Incident for the 'row' and
+      'incident' shapes, a single batch for the others.
+    """
+    if shape == 'row':
+        return rows
+    if shape == 'incident':
+        return list(map(Incident._make, rows))
+    return to_numpy(rows) if shape == 'numpy' else to_arrow(rows)
@@ -0,0 +1,184 @@
+"""
+Pre-aggregated rollup tables for the dashboard.
+
+Each dashboard chart reads a small Rollup_* table instead of aggregating Calls. The rollups are
+kept exactly consistent by triggers on Calls (created by migrations.py), so every write path
+(backend.py, the CSV loader, bulk operations, manual SQL) updates them in the same transaction as
+the change itself.
+
+Rollups skip NULL keys: a call without a priority is not counted in the priority chart, and a
+call whose jurisdiction has no district (or whose reporter location has no neighborhood) is left
+out of the district (neighborhood) chart. The 'sql' and 'columnar' dashboard engines skip them
+too, so every engine draws the same bars. The district, neighborhood and location rollups only
+count calls whose jurisdiction / reporter location (incident location for the hot-spot map)
+exists. They assume Locations and Jurisdictions rows are not edited in place; after such an edit,
+run `python rollups.py --rebuild`.
+
+Rollups count every call, including the ones moved to the archive: deletes made while the
+'archiving' maintenance flag is set (see archive.py) are not subtracted, and rebuilds and
+verifications aggregate the archive partitions too.
+
+Usage:
+    python rollups.py --db database/911_Call_Data.db --verify
+    python rollups.py --db database/911_Call_Data.db --rebuild
+"""
+import argparse
+import sqlite3
+
+from archive import aggregate
+
+# name: (rollup table, key columns, the GROUP BY over Calls that the rollup materializes)
+ROLLUPS = {
+    'priority': ('Rollup_Priority', ('priority',), """
+        SELECT priority, COUNT(*) AS count
+        FROM Calls
+        WHERE priority IS NOT NULL
+        GROUP BY priority
+    """),
+    'hour': ('Rollup_Hour', ('hour',), """
+        SELECT CAST(strftime('%H', call_epoch, 'unixepoch') AS INTEGER) AS hour, COUNT(*) AS count
+        FROM Calls
+        WHERE call_epoch IS NOT NULL
+        GROUP BY hour
+    """),
+    'district': ('Rollup_District', ('district',), """
+        SELECT J.district, COUNT(*) AS count
+        FROM Calls C
+        JOIN Jurisdictions J ON C.jurisdiction_id = J.jurisdiction_id
+        WHERE J.district IS NOT NULL
+        GROUP BY J.district
+    """),
+    'neighborhood': ('Rollup_Neighborhood', ('neighborhood',), """
+        SELECT L.neighborhood, COUNT(*) AS count
+        FROM Calls C
+        JOIN Locations L ON C.reporter_location_id = L.location_id
+        WHERE L.neighborhood IS NOT NULL
+        GROUP BY L.neighborhood
+    """),
+    'location': ('Rollup_Location', ('location_id',), """
+        SELECT C.reporter_location_id AS location_id, COUNT(*) AS count
+        FROM Calls C
+        JOIN Locations L ON C.reporter_location_id = L.location_id
+        GROUP BY C.reporter_location_id
+    """),
+    'incident_location': ('Rollup_Incident_Location', ('location_id',), """
+        SELECT C.incident_location_id AS location_id, COUNT(*) AS count
+        FROM Calls C
+        JOIN Locations L ON C.incident_location_id = L.location_id
+        GROUP BY C.incident_location_id
+    """),
+    'date_priority': ('Rollup_Date_Priority', ('date', 'priority'), """
+        SELECT date(call_epoch, 'unixepoch') AS date, priority, COUNT(*) AS count
+        FROM Calls
+        WHERE call_epoch IS NOT NULL AND priority IS NOT NULL
+        GROUP BY date, priority
+    """),
+}
+
+
+# Function to add newly inserted calls to every rollup
+def add_calls(conn, after_rowid):
+    """
+    Add the calls of the hot table with a rowid above after_rowid to every rollup, with one
+    GROUP BY per rollup. For calls inserted while the 'loading' maintenance flag kept the insert
+    trigger off (see loader.load_chunk). The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - after_rowid (int): The largest rowid of Calls before the insert.
+
+    Returns:
+        None
+    """
+    for table, keys, sql in ROLLUPS.values():
+        groups = conn.execute(f"WITH Calls AS (SELECT * FROM main.Calls WHERE rowid > ?) {sql}", (after_rowid,))
+        conn.executemany(f"INSERT INTO {table} ({', '.join(keys)}, count) VALUES ({', '.join('?' * (len(keys) + 1))}) "
+                         f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET count = count + excluded.count",
+                         groups.fetchall())
+
+
+# Function to recompute every rollup from Calls
+def rebuild_rollups(conn, names=None):
+    """
+    Recompute rollup tables from scratch with a GROUP BY over Calls and its archive partitions.
+    The caller is responsible for committing.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - names (list of str, optional): Rebuild only these rollups (keys of ROLLUPS). Defaults to all.
+
+    Returns:
+        None
+    """
+    rollups = [ROLLUPS[name] for name in (names or ROLLUPS)]
+    groups = {table: aggregate(conn, sql) for table, _, sql in rollups}
+    for table, keys, _ in rollups:
+        conn.execute(f"DELETE FROM {table}")
+        conn.executemany(f"INSERT INTO {table} ({', '.join(keys)}, count) VALUES ({', '.join('?' * (len(keys) + 1))})",
+                         groups[table])
+
+
+# Function to compare the rollups with a fresh aggregation
+def verify_rollups(conn):
+    """
+    Check every rollup against the GROUP BY query it materializes, over Calls and its archive partitions.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+
+    Returns:
+    - list of str: The names of the rollups that differ (empty when everything is consistent).
+    """
+    mismatched = []
+    for name, (table, keys, sql) in ROLLUPS.items():
+        stored = set(tuple(row) for row in conn.execute(f"SELECT {', '.join(keys)}, count FROM {table}"))
+        expected = set(aggregate(conn, sql))
+        if stored != expected:
+            mismatched.append(name)
+    return mismatched
+
+
+# Function to read one rollup
+def read_rollup(conn, name):
+    """
+    Read one rollup table.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+    - name (str): One of the keys of ROLLUPS ('priority', 'hour', 'district', 'neighborhood',
+      'location', 'incident_location' or 'date_priority').
+
+    Returns:
+    - list of sqlite3.Row or tuple: The key columns and count of every group, ordered by key.
+    """
+    table, keys, _ = ROLLUPS[name]
+    columns = ', '.join(keys)
+    return conn.execute(f"SELECT {columns}, count FROM {table} ORDER BY {columns}").fetchall()
+
+
+def main(argv=None):
+    from db import DEFAULT_DB_PATH
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the dashboard rollup tables.")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database (default: %(default)s).")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute every rollup from Calls.")
+    parser.add_argument('--verify', action='store_true', help="Compare every rollup with a fresh aggregation.")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate(conn)
+        if args.rebuild:
+            with conn:
+                rebuild_rollups(conn)
+            print("Rollups rebuilt.")
+        if args.verify:
+            mismatched = verify_rollups(conn)
+            print(f"Rollups out of date: {', '.join(mismatched)}" if mismatched else "All rollups are consistent.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Table definitions for the 911 call database. These are the same tables created in
+# database/db_creation.ipynb, kept here so that scripts and tests can build the schema.
+
+JURISDICTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS Jurisdictions (
+    jurisdiction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    district TEXT,
+    police_district TEXT,
+    police_post TEXT,
+    council_district TEXT,
+    sheriff_district TEXT,
+    UNIQUE(district, police_district, police_post, council_district, sheriff_district)
+);
+"""
+
+LOCATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS Locations (
+    location_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    address TEXT,
+    neighborhood TEXT,
+    zip_code TEXT,
+    census_tract TEXT,
+    community_statistical_area TEXT,
+    UNIQUE(address, neighborhood, zip_code, census_tract, community_statistical_area)
+);
+"""
+
+CALLS_TABLE = """
+CREATE TABLE IF NOT EXISTS Calls (
+    call_key TEXT PRIMARY KEY,
+    record_id TEXT,
+    call_date_time TEXT,  -- stored as TEXT (ISO format) in SQLite
+    priority TEXT,
+    description TEXT,
+    call_number TEXT,
+    incident_location_id INTEGER,
+    reporter_location_id INTEGER,
+    jurisdiction_id INTEGER,
+    FOREIGN KEY (incident_location_id) REFERENCES Locations(location_id),
+    FOREIGN KEY (reporter_location_id) REFERENCES Locations(location_id),
+    FOREIGN KEY (jurisdiction_id) REFERENCES Jurisdictions(jurisdiction_id)
+);
+"""
+
+ARCGIS_METADATA_TABLE = """
+CREATE TABLE IF NOT EXISTS ArcGIS_Metadata (
+    call_key TEXT PRIMARY KEY,
+    needs_sync INTEGER,  -- booleans stored as 0 (False) or 1 (True)
+    esri_oid INTEGER,
+    FOREIGN KEY (call_key) REFERENCES Calls(call_key)
+);
+"""
+
+TABLES = (JURISDICTIONS_TABLE, LOCATIONS_TABLE, CALLS_TABLE, ARCGIS_METADATA_TABLE)
+
+# Columns of the Calls table, in the same order as backend.create_incident's positional parameters.
+# call_epoch (added by migration 3) follows them.
+CALL_COLUMNS = ('call_key', 'record_id', 'call_date_time', 'priority', 'description', 'call_number',
+                'incident_location_id', 'reporter_location_id', 'jurisdiction_id')
+
+# Function to create the base tables
+def create_schema(conn):
+    """
+    Create the Jurisdictions, Locations, Calls and ArcGIS_Metadata tables if they do not exist.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the database.
+
+    Returns:
+        None
+    """
+    for statement in TABLES:
+        conn.execute(statement)
+    conn.commit()
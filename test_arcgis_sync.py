@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import archive
+import backend
+import changelog
+from arcgis_sync import FileSink, MockSink, SyncError, SyncWorker
+from db import connection, transaction
+from timestamps import to_epoch
+
+
+def metadata(call_key):
+    with connection() as conn:
+        row = conn.execute("SELECT needs_sync, esri_oid FROM ArcGIS_Metadata WHERE call_key = ?", (call_key,)).fetchone()
+    return tuple(row) if row else None
+
+
+def seed(count=5):
+    backend.create_incidents_many((f"K{i}", f"R{i}", "2021/12/01 10:00:00+00", "Low", "NOISE", f"P{i}", 1, 1, 1)
+                                  for i in range(count))
+
+
+# 1. Writes mark calls dirty and the worker pushes only the changes, in batches
+def test_sync_pushes_changes(temp_db):
+    seed()
+    assert metadata("K0") == (1, None), f"Test failed! Insert did not mark the call, got {metadata('K0')}."
+
+    sink = MockSink(first_oid=100)
+    worker = SyncWorker(sink, batch_size=2, backoff=0)
+    totals = worker.drain()
+    assert totals['upserts'] == 5 and totals['batches'] == 3, f"Test failed! Unexpected totals {totals}."
+    assert metadata("K0") == (0, 100), f"Test failed! Expected K0 synced as oid 100, got {metadata('K0')}."
+    assert worker.drain()['upserts'] == 0, "Test failed! A second drain pushed unchanged calls."
+
+    backend.update_incident("K1", priority="High")
+    backend.delete_incident("K2")
+    sink.batches.clear()
+    totals = worker.drain()
+    pushed = [(change['operation'], change['call_key'], change['esri_oid']) for batch in sink.batches for change in batch]
+    assert pushed == [("upsert", "K1", 101), ("delete", "K2", 102)], f"Test failed! Unexpected pushes {pushed}."
+    assert sink.features[101]['priority'] == "High", "Test failed! The update was not pushed."
+    assert 102 not in sink.features and metadata("K2") is None, "Test failed! The delete was not synced."
+    assert worker.checkpoint() == totals['last_seq'], "Test failed! The checkpoint was not stored."
+
+
+# 2. Failed pushes are retried, and a batch that keeps failing leaves the checkpoint unchanged
+def test_sync_retries_and_file_sink(temp_db, tmp_path):
+    seed(3)
+    assert SyncWorker(MockSink(failures=2), max_retries=2, backoff=0).drain()['upserts'] == 3, \
+        "Test failed! The worker did not retry a failing sink."
+
+    backend.update_incident("K0", priority="High")
+    worker = SyncWorker(MockSink(failures=5), max_retries=1, backoff=0)
+    checkpoint = worker.checkpoint()
+    with pytest.raises(SyncError):
+        worker.sync_once()
+    assert worker.checkpoint() == checkpoint and metadata("K0")[0] == 1, "Test failed! A failed batch was committed."
+
+    path = str(tmp_path / "changes.ndjson")
+    SyncWorker(FileSink(path), backoff=0).drain()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r['operation'], r['call_key'], r['esri_oid']) for r in records] == [("upsert", "K0", 1)], \
+        f"Test failed! Unexpected file records {records}."
+
+
+# 3. Calls from before the sync triggers are backfilled without going through the change log
+def test_sync_backfills_unlogged_calls(temp_db):
+    seed(4)
+    with transaction() as conn:  # As if loaded before migration 10: no metadata, nothing logged
+        conn.execute("DELETE FROM ArcGIS_Metadata")
+        conn.execute("DELETE FROM Call_Changes")
+        conn.execute("INSERT INTO ArcGIS_Metadata (call_key, needs_sync, esri_oid) VALUES ('GONE', 1, 7)")
+    backend.update_incident("K3", priority="High")
+
+    sink = MockSink(first_oid=100)
+    worker = SyncWorker(sink, batch_size=2, backoff=0)
+    totals = worker.drain()
+    pushed = sorted((change['operation'], change['call_key']) for batch in sink.batches for change in batch)
+    assert pushed == [("delete", "GONE"), ("upsert", "K0"), ("upsert", "K1"), ("upsert", "K2"), ("upsert", "K3")], \
+        f"Test failed! Unexpected pushes {pushed}."
+    assert metadata("K0") == (0, 100) and metadata("GONE") is None, "Test failed! The backfill was not recorded."
+    with connection() as conn:
+        logged, last_seq = conn.execute("SELECT COUNT(*), MAX(seq) FROM Call_Changes").fetchone()
+    assert logged == 1, f"Test failed! The backfill wrote {logged - 1} entries to the change log."
+    assert worker.checkpoint() == totals['last_seq'] == last_seq, f"Test failed! Unexpected checkpoint {totals}."
+
+    seed(6)  # K4 and K5 are new; the rest are unchanged
+    sink.batches.clear()
+    assert SyncWorker(sink, backoff=0).drain()['upserts'] == 2, "Test failed! The backfill ran again."
+
+
+# 4. A call updated and then archived before the next sync is pushed from its partition, not deleted
+def test_sync_pushes_archived_calls(temp_db):
+    seed(2)
+    sink = MockSink()
+    worker = SyncWorker(sink, backoff=0)
+    worker.drain()
+
+    backend.update_incident("K0", priority="High")
+    with connection() as conn:
+        archive.archive_calls(conn, horizon_days=30, now=to_epoch("2022/02/01 00:00:00+00"))
+    sink.batches.clear()
+    totals = worker.drain()
+    pushed = [(change['operation'], change['call_key'], change['esri_oid']) for batch in sink.batches for change in batch]
+    assert pushed == [("upsert", "K0", 1)] and totals['deletes'] == 0, f"Test failed! Unexpected pushes {pushed}."
+    assert sink.features[1]['priority'] == "High" and metadata("K0") == (0, 1), \
+        "Test failed! The archived call was not synced."
+
+
+# 5. The change log is pruned up to the slowest consumer, keeping the recent changes
+def test_sync_prunes_applied_changes(temp_db):
+    seed(4)
+    with transaction() as conn:
+        changelog.set_checkpoint(conn, 'other', 2)  # A consumer that applied the first two changes
+    worker = SyncWorker(MockSink(), backoff=0)
+    worker.drain()
+    with connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Call_Changes").fetchone()[0] == 4, \
+            "Test failed! Recent changes were pruned."
+    with transaction() as conn:
+        assert changelog.prune_consumed(conn, now=to_epoch("2100/01/01 00:00:00+00")) == 2, \
+            "Test failed! Expected the changes applied by every consumer to be pruned."
+        assert [row[0] for row in conn.execute("SELECT seq FROM Call_Changes")] == [3, 4], \
+            "Test failed! Changes not applied by every consumer were pruned."
+        conn.execute("DELETE FROM Sync_Checkpoints WHERE name = 'other'")
+        assert changelog.prune_consumed(conn, now=to_epoch("2100/01/01 00:00:00+00")) == 2, \
+            "Test failed! The sync checkpoint should release the rest."
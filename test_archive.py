@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+import archive
+import backend
+import dashboard_data
+from db import connection
+from rollups import verify_rollups
+from timestamps import to_epoch
+
+NOW = to_epoch("2022/03/15 00:00:00+00")
+
+# Calls in October, November and December 2021, then March 2022 (hot)
+CALLS = [("K1", "2021/10/05 10:00:00+00", "High", "HIT AND RUN", 1), ("K2", "2021/10/20 11:00:00+00", "Low", "NOISE", 2),
+         ("K3", "2021/11/02 12:00:00+00", "High", "BURGLARY", 1), ("K4", "2021/12/30 13:00:00+00", "Low", "HIT AND RUN", 2),
+         ("K5", "2022/03/01 14:00:00+00", "High", "HIT AND RUN", 1), ("K6", None, "Low", "NOISE", 2)]
+
+
+def seed():
+    backend.create_incidents_many({'call_key': key, 'record_id': key, 'call_date_time': time, 'priority': priority,
+                                   'description': description, 'jurisdiction_id': place, 'reporter_location_id': place}
+                                  for key, time, priority, description, place in CALLS)
+    with connection() as conn:
+        return archive.archive_calls(conn, horizon_days=30, now=NOW)
+
+
+def keys(rows):
+    return [row['call_key'] for row in rows]
+
+
+# 1. Old calls move to monthly partitions and reads span the hot and cold stores
+def test_archive_reads_span_stores(temp_db):
+    summary = seed()
+    assert summary['archived'] == 4, f"Test failed! Expected 4 archived calls, got {summary}."
+    assert summary['months'] == ["2021-10", "2021-11", "2021-12"], f"Test failed! Unexpected months {summary['months']}."
+    assert os.path.exists(os.path.join(os.path.dirname(temp_db), "archive", "calls_2021_10.db")), \
+        "Test failed! The partition file was not created."
+    with connection() as conn:
+        hot = [row[0] for row in conn.execute("SELECT call_key FROM Calls ORDER BY call_key")]
+    assert hot == ["K5", "K6"], f"Test failed! Unexpected hot calls {hot}."
+
+    assert keys(backend.search_incident()) == ["K5", "K4", "K3", "K2", "K1", "K6"], "Test failed! Search missed the archive."
+    assert keys(backend.search_incident(description="hit run", order='newest')) == ["K5", "K4", "K1"], \
+        "Test failed! Full-text search missed the archive."
+    assert sorted(keys(backend.search_incident(description="hit run"))) == ["K1", "K4", "K5"], \
+        "Test failed! Ranked search missed the archive."
+    assert keys(backend.search_incident(priority="High", end="2021/11/01 00:00:00+00")) == ["K1"], \
+        "Test failed! Time filters on the archive."
+
+    listed, cursor = [], None
+    while True:
+        page, cursor = backend.list_incidents(page_size=2, cursor=cursor)
+        listed += keys(page)
+        if cursor is None:
+            break
+    assert listed == ["K5", "K4", "K3", "K2", "K1", "K6"], f"Test failed! Unexpected listing {listed}."
+
+    with pytest.raises(ValueError, match="archived"):
+        backend.update_incident("K1", priority="Low")
+    with pytest.raises(ValueError, match="archived"):
+        backend.delete_incident("K2")
+    assert backend.update_incident("K5", priority="Low") == 1 and backend.delete_incident("MISSING") == 0, \
+        "Test failed! Writes should return the number of incidents changed."
+
+
+# 2. Rollups keep all-time totals, ranged dashboards prune partitions, and a rerun is a no-op
+def test_archive_rollups_and_dashboard(temp_db):
+    seed()
+    with connection() as conn:
+        assert verify_rollups(conn) == [], "Test failed! Archiving changed the rollups."
+        priorities = dashboard_data.priority_counts(conn)
+        assert dict(zip(priorities['priority'], priorities['count'])) == {"High": 3, "Low": 3}, \
+            "Test failed! The rollups lost archived calls."
+        november = dashboard_data.priority_counts(conn, start=to_epoch("2021/11/01 00:00:00+00"),
+                                                  end=to_epoch("2021/12/01 00:00:00+00"))
+        assert dict(zip(november['priority'], november['count'])) == {"High": 1}, "Test failed! Unexpected ranged counts."
+        pruned = [month for month, _, _, _, _ in archive.partitions(conn, start=to_epoch("2021/11/15 00:00:00+00"))]
+        assert pruned == ["2021-12", "2021-11"], f"Test failed! Unexpected partitions {pruned}."
+
+        assert archive.archive_calls(conn, horizon_days=30, now=NOW)['archived'] == 0, "Test failed! Rerun archived calls."
+        backend.delete_incident("K5")
+        assert verify_rollups(conn) == [], "Test failed! Deletes after archiving broke the rollups."
@@ -0,0 +1,30 @@
+import asyncio
+import sqlite3
+
+from async_backend import AsyncBackend
+
+
+# 1. Concurrent writes are group-committed, and a failing write only fails its own caller
+def test_async_backend_group_commit(temp_db):
+    async def scenario():
+        async with AsyncBackend() as backend:
+            keys = await asyncio.gather(*(
+                backend.create_incident(call_key=f"K{i}", call_date_time="2021/12/01 10:00:00+00",
+                                        priority="High", description="HIT AND RUN") for i in range(200)))
+            results = await asyncio.gather(
+                backend.create_incident(call_key="K0"),  # duplicate
+                backend.update_incident("K1", priority="Low"),
+                backend.delete_incident("K2"),
+                return_exceptions=True)
+            low = await backend.search_incident(priority="Low")
+            latest = await backend.read_incidents()
+            return keys, results, low, latest, backend.stats()
+
+    keys, results, low, latest, stats = asyncio.run(scenario())
+    assert keys == [f"K{i}" for i in range(200)], "Test failed! create_incident returned the wrong call_keys."
+    assert isinstance(results[0], sqlite3.IntegrityError), f"Test failed! Expected an IntegrityError, got {results[0]!r}."
+    assert results[1:] == [1, 1], f"Test failed! The other writes of the batch failed: {results[1:]}."
+    assert [row['call_key'] for row in low] == ["K1"], "Test failed! The update was not committed."
+    assert len(latest) == 10, f"Test failed! Expected 10 incidents, but got {len(latest)}."
+    assert stats['writes'] == 202 and stats['failed_writes'] == 1, f"Test failed! Unexpected stats {stats}."
+    assert stats['batches'] < 200, f"Test failed! Writes were not grouped: {stats}."
@@ -1,6 +1,6 @@
 import sqlite3
 import uuid
-from backend import create_incident, update_incident, delete_incident, search_incident
+from backend import create_incident, create_incidents_many, update_incident, delete_incident, search_incident
 
 # Function to check the number of rows in the Calls table (for testing)
 def get_calls_count():
@@ -94,6 +94,28 @@ def test_search_incident():
     non_existing_incidents = search_incident(description="MISSING")
     assert len(non_existing_incidents) == 0, f"Test failed! Expected 0 incidents with 'MISSING', but got {len(non_existing_incidents)}."
 
+# 5. Test `create_incidents_many()`
+def test_create_incidents_many():
+    duplicate_key = str(uuid.uuid4())
+    create_incident(duplicate_key, "R007", "2021/12/01 16:00:00+00", "Low", "NOISE", "P210123462", 1, 1, 1)
+    count_before = get_calls_count()
+
+    # Mix dicts and tuples, one row without a call_key and one duplicate call_key
+    incidents = (
+        [{"record_id": f"RB{i}", "call_date_time": "2021/12/02 10:00:00+00", "priority": "Medium",
+          "description": "BATCH", "call_number": f"PB{i}", "incident_location_id": 1,
+          "reporter_location_id": 1, "jurisdiction_id": 1} for i in range(5)]
+        + [(str(uuid.uuid4()), "RB5", "2021/12/02 11:00:00+00", "High", "BATCH", "PB5", 1, 1, 1)]
+        + [(duplicate_key, "RB6", "2021/12/02 12:00:00+00", "High", "BATCH", "PB6", 1, 1, 1)]
+    )
+    summary = create_incidents_many(iter(incidents), chunk_size=3)
+    count_after = get_calls_count()
+
+    assert summary['inserted'] == 6, f"Test failed! Expected 6 inserted rows, but got {summary['inserted']}."
+    assert summary['failed'] == 1, f"Test failed! Expected 1 failed row, but got {summary['failed']}."
+    assert summary['errors'][0][:2] == (6, duplicate_key), f"Test failed! Unexpected error report {summary['errors']}."
+    assert count_after == count_before + 6, f"Test failed! Expected {count_before + 6} rows, but got {count_after}."
+
 # Running the tests
 def run_tests():
     test_create_incident()
@@ -108,5 +130,8 @@ def run_tests():
     test_search_incident()
     print("search_incident() test passed.")
 
+    test_create_incidents_many()
+    print("create_incidents_many() test passed.")
+
 # Execute the tests
 run_tests()
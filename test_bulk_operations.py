@@ -0,0 +1,37 @@
+from backend import create_incidents_many, delete_incidents_many, search_incident, update_incidents_many
+from db import connection
+from rollups import verify_rollups
+
+
+# 1. Bulk updates select by keys and/or filters and keep the derived structures consistent
+def test_update_incidents_many(temp_db):
+    create_incidents_many({'call_key': f"K{i}", 'call_date_time': f"2021/12/0{1 + i % 3} 10:00:00+00",
+                           'priority': "Low", 'description': "NOISE", 'jurisdiction_id': 1 + i % 2} for i in range(30))
+
+    updated = update_incidents_many({'priority': "High", 'description': "LOUD PARTY"}, jurisdiction_id=2,
+                                    start="2021/12/02")
+    assert updated == 10, f"Test failed! Expected 10 updated incidents, but got {updated}."
+    assert len(search_incident(description="party")) == 10, "Test failed! The full-text index was not updated."
+
+    updated = update_incidents_many({'call_date_time': "2022/01/01 00:00:00+00"}, call_keys=["K0", "K1", "missing"])
+    assert updated == 2, f"Test failed! Expected 2 updated incidents, but got {updated}."
+    with connection() as conn:
+        assert verify_rollups(conn) == [], "Test failed! The rollups are out of date."
+
+    try:
+        update_incidents_many({'priority': "High"})
+        assert False, "Test failed! An update without a selection was accepted."
+    except ValueError:
+        pass
+
+
+# 2. Bulk deletes return the number of incidents removed
+def test_delete_incidents_many(temp_db):
+    create_incidents_many({'call_key': f"K{i}", 'call_date_time': "2021/12/01 10:00:00+00",
+                           'priority': "Low" if i < 20 else "High"} for i in range(30))
+
+    assert delete_incidents_many(call_keys=[f"K{i}" for i in range(5)]) == 5, "Test failed! Wrong key delete count."
+    assert delete_incidents_many(priority="Low") == 15, "Test failed! Wrong filter delete count."
+    assert len(search_incident()) == 10, "Test failed! Unexpected incidents left."
+    with connection() as conn:
+        assert verify_rollups(conn) == [], "Test failed! The rollups are out of date."
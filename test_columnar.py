@@ -0,0 +1,67 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+import archive
+import backend
+import columnar
+import dashboard_data
+from db import connection
+from timestamps import to_epoch
+
+
+def assert_matches_sql(conn, **window):
+    expected = dashboard_data.load_dashboard(conn, engine='sql', **window)
+    actual = dashboard_data.load_dashboard(conn, engine='columnar', **window)
+    for name in dashboard_data.CHARTS:
+        pd.testing.assert_frame_equal(actual[name], expected[name], obj=name)
+
+
+# 1. The columnar engine matches the SQL engine, and follows writes incrementally
+def test_columnar_engine_follows_writes(temp_db):
+    incidents = [(f"K{i}", f"R{i}", f"2021/12/0{1 + i % 4} {i % 24:02d}:15:00+00", ["High", "Low", "Medium"][i % 3],
+                  "THEFT", f"P{i}", 1, 1 + i % 3, 1 + i % 3) for i in range(60)]  # id 3 is not a known lookup
+    backend.create_incidents_many(incidents)
+    try:
+        with connection() as conn:
+            assert_matches_sql(conn)
+            assert_matches_sql(conn, start=1638403200, end=1638489600)  # 2021-12-02 only
+            assert_matches_sql(conn, jurisdiction_id=1, max_points=50, top=1)  # Hourly buckets
+
+            backend.update_incident("K1", priority="High", call_date_time="2021/12/09 08:00:00+00")
+            backend.delete_incident("K2")
+            backend.create_incident("K100", "R100", "2021/12/10 09:00:00+00", "Low", "NOISE", "P100", 1, 2, 2)
+            summary = columnar.snapshot_for(conn).refresh(conn)
+            assert summary['mode'] == 'incremental' and summary['rows'] == 3, f"Test failed! Unexpected refresh {summary}."
+            assert_matches_sql(conn)
+            assert columnar.snapshot_for(conn).refresh(conn)['mode'] == 'none', "Test failed! Refreshed without changes."
+    finally:
+        columnar.close_snapshots()
+
+
+# 2. Calls archived after they changed stay in the snapshot, and stale snapshots refresh in the background
+def test_columnar_refresh_follows_archive_and_runs_in_background(temp_db):
+    incidents = [(f"K{i}", f"R{i}", f"2021/{10 + i % 3}/0{1 + i % 9} 10:00:00+00", ["High", "Low"][i % 2],
+                  "NOISE", f"P{i}", 1, 1, 1) for i in range(30)]
+    backend.create_incidents_many(incidents)
+    try:
+        with connection() as conn:
+            assert_matches_sql(conn)  # Builds the snapshot
+            snapshot = columnar.snapshot_for(conn)
+
+            backend.update_incident("K0", priority="Medium")  # An October call, archived below
+            archive.archive_calls(conn, horizon_days=30, now=to_epoch("2021/12/05 00:00:00+00"))
+            summary = snapshot.refresh(conn)
+            assert summary['mode'] == 'incremental', f"Test failed! Unexpected refresh {summary}."
+            assert_matches_sql(conn)
+
+            backend.create_incident("K100", "R100", "2021/12/10 09:00:00+00", "Low", "NOISE", "P100", 1, 1, 1)
+            stale = columnar.aggregate(conn, 'priority')
+            assert stale['count'].sum() == 30, "Test failed! A fresh snapshot was refreshed in the request."
+            columnar.aggregate(conn, 'priority', max_staleness=0)
+            snapshot._refresher.join()
+            assert snapshot.refresh(conn)['mode'] == 'none', "Test failed! The background refresh did not run."
+            assert_matches_sql(conn)
+    finally:
+        columnar.close_snapshots()
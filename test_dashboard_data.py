@@ -0,0 +1,76 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+import backend
+import dashboard_data
+from db import connection, transaction
+
+# 1. The rollup and SQL engines return the same chart data
+def test_engines_agree(temp_db):
+    incidents = [(None, f"R{i}", f"2021/12/0{1 + i % 4} {i % 24:02d}:15:00+00", ["High", "Low", "Medium"][i % 3],
+                  "THEFT", f"P{i}", 1, 1 + i % 2, 1 + i % 2) for i in range(50)]
+    backend.create_incidents_many(incidents)
+
+    with connection() as conn:
+        rollup = dashboard_data.load_dashboard(conn, engine='rollup')
+        sql = dashboard_data.load_dashboard(conn, engine='sql')
+
+    for name in dashboard_data.CHARTS:
+        pd.testing.assert_frame_equal(rollup[name], sql[name], obj=name)
+    assert rollup['hour']['count'].sum() == 50, "Test failed! Expected every call in the hourly chart."
+    assert rollup['priority']['count'].dtype == 'int32', "Test failed! Expected compact count dtype."
+
+# 2. Unknown engines are rejected
+def test_unknown_engine(temp_db):
+    with connection() as conn:
+        with pytest.raises(ValueError):
+            dashboard_data.priority_counts(conn, engine='spark')
+
+# 3. Filters, automatic time buckets and top-N bars, with the same results from every engine
+def test_filters_buckets_and_top(temp_db):
+    incidents = [(None, f"R{i}", f"2021/{10 + i % 3}/{1 + i % 28:02d} {i % 24:02d}:15:00+00", ["High", "Low"][i % 2],
+                  "THEFT", f"P{i}", 1, 1 + i % 2, 1 + i % 2) for i in range(90)]
+    backend.create_incidents_many(incidents)
+    window = {'start': 1633046400, 'end': 1635724800, 'jurisdiction_id': 1}  # October 2021, first jurisdiction
+
+    with connection() as conn:
+        over_time = dashboard_data.priority_over_time(conn, max_points=20)
+        assert over_time.attrs['bucket'] == 'week', f"Test failed! Unexpected bucket {over_time.attrs['bucket']}."
+        assert over_time['count'].sum() == 90, "Test failed! Buckets lost calls."
+        assert dashboard_data.choose_bucket(0, 48 * 3600, 100) == 'hour', "Test failed! Expected hourly buckets."
+
+        filtered = dashboard_data.load_dashboard(conn, engine='sql', **window)
+        assert filtered['hour']['count'].sum() == 15, "Test failed! The filters were ignored."
+        for name, frame in dashboard_data.load_dashboard(conn, engine='rollup', max_points=20, **window).items():
+            pd.testing.assert_frame_equal(frame, filtered[name] if name != 'priority_over_time' else
+                                          dashboard_data.priority_over_time(conn, 'sql', max_points=20, **window),
+                                          obj=name)
+
+        with transaction() as writer:
+            writer.execute("INSERT INTO Locations (address) VALUES ('300 ELM ST')")  # location 3
+        backend.create_incident(None, "R90", "2021/12/31 10:00:00+00", "High", "THEFT", "P90", 1, 3, 1)
+        top = dashboard_data.location_counts(conn, top=1)
+        assert top['location_id'].tolist() == ["1", "Other"] and top['count'].tolist() == [45, 46], \
+            f"Test failed! Unexpected top locations {top.to_dict('list')}."
+
+# 4. Calls without a district or neighborhood are left out of those charts by every engine
+def test_null_keys_skipped(temp_db):
+    with transaction() as conn:
+        conn.execute("INSERT INTO Jurisdictions (district) VALUES (NULL)")  # jurisdiction 3
+        conn.execute("INSERT INTO Locations (address, neighborhood) VALUES ('300 ELM ST', NULL)")  # location 3
+    incidents = [(None, f"R{i}", f"2021/12/0{1 + i % 4} {i % 24:02d}:15:00+00", "High", "THEFT", f"P{i}",
+                  1, 1 + i % 3, 1 + i % 3) for i in range(30)]
+    backend.create_incidents_many(incidents)
+
+    engines = ['rollup', 'sql'] + (['columnar'] if dashboard_data.columnar.duckdb is not None else [])
+    try:
+        with connection() as conn:
+            for engine in engines:
+                districts = dashboard_data.district_counts(conn, engine=engine)
+                assert districts['district'].tolist() == ["CD", "ED"] and districts['count'].tolist() == [10, 10], \
+                    f"Test failed! Unexpected {engine} districts {districts.to_dict('list')}."
+                neighborhoods = dashboard_data.neighborhood_counts(conn, engine=engine)
+                assert neighborhoods['neighborhood'].tolist() == ["Downtown", "Midtown"], \
+                    f"Test failed! Unexpected {engine} neighborhoods {neighborhoods.to_dict('list')}."
+    finally:
+        dashboard_data.columnar.close_snapshots()
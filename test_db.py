@@ -0,0 +1,81 @@
+import threading
+from db import ConnectionPool, PoolTimeoutError
+import pytest
+
+# 1. Connections are reused instead of reopened on every call
+def test_pool_reuses_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), pool_size=2)
+
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        second = conn
+
+    stats = pool.stats()
+    assert first is second, "Test failed! Expected the idle connection to be reused."
+    assert stats['opened'] == 1, f"Test failed! Expected 1 opened connection, but got {stats['opened']}."
+    assert stats['checkouts'] == 2, f"Test failed! Expected 2 checkouts, but got {stats['checkouts']}."
+    pool.close()
+
+# 2. PRAGMAs are applied when the connection is opened
+def test_pool_applies_pragmas(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pragmas.db"))
+
+    with pool.connection() as conn:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+
+    assert journal_mode == "wal", f"Test failed! Expected WAL journal mode, but got {journal_mode}."
+    assert synchronous == 1, f"Test failed! Expected synchronous=NORMAL (1), but got {synchronous}."
+    pool.close()
+
+# 3. Transactions commit on success and roll back on error
+def test_pool_transaction(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "tx.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(ValueError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise ValueError("boom")
+
+    with pool.connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+    assert count == 1, f"Test failed! Expected 1 row after rollback, but got {count}."
+    pool.close()
+
+# 4. The pool never opens more than pool_size connections across threads
+def test_pool_is_bounded_across_threads(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "threads.db"), pool_size=2)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(50):
+                with pool.connection() as conn:
+                    conn.execute("SELECT 1").fetchone()
+        except Exception as e:  # pragma: no cover - only hit on failure
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = pool.stats()
+    assert not errors, f"Test failed! Worker errors: {errors}"
+    assert stats['open'] <= 2, f"Test failed! Expected at most 2 open connections, but got {stats['open']}."
+    assert stats['in_use'] == 0, f"Test failed! Expected no connections in use, but got {stats['in_use']}."
+    pool.close()
+
+# 5. A pool that stays busy raises PoolTimeoutError
+def test_pool_timeout(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "timeout.db"), pool_size=1, acquire_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire()
+    assert pool.stats()['timeouts'] == 1, "Test failed! Expected the timeout to be counted."
+    pool.close()
@@ -0,0 +1,59 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import archive
+import backend
+from db import connection
+from export import EXPORT_FIELDS
+from timestamps import to_epoch
+
+INCIDENTS = [(f"K{i}", f"R{i}", f"2021/{10 + i % 3}/0{1 + i % 9} 10:00:00+00", ["High", "Low"][i % 2],
+              ["BURGLARY", "NOISE"][i % 3 == 0], f"P{i}", 1, 1, 1) for i in range(30)]
+
+
+# 1. Filtered exports carry the incidents with their location and jurisdiction attributes
+def test_export_formats(temp_db):
+    backend.create_incidents_many(INCIDENTS)
+    with connection() as conn:
+        location = dict(conn.execute("SELECT * FROM Locations WHERE location_id = 1").fetchone())
+
+    output, calls = io.BytesIO(), []
+    summary = backend.export_incidents(output, compression='gzip', priority="High", chunk_size=4, count=True,
+                                       progress=lambda written, total, elapsed: calls.append((written, total)))
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(output.getvalue()).decode())))
+    assert summary['rows'] == len(rows) == 15 and {row['priority'] for row in rows} == {"High"}, \
+        f"Test failed! Unexpected CSV export {summary}."
+    assert list(rows[0]) == list(EXPORT_FIELDS), "Test failed! Unexpected CSV header."
+    assert rows[0]['incident_address'] == (location['address'] or ""), "Test failed! Location attributes missing."
+    assert calls[-1] == (15, 15) and len(calls) == 4, f"Test failed! Unexpected progress {calls}."
+
+    output = io.BytesIO()
+    summary = backend.export_incidents(output, format='ndjson', description="burglary", ordered=True)
+    records = [json.loads(line) for line in output.getvalue().decode().splitlines()]
+    assert len(records) == 20 and all(r['description'] == "BURGLARY" for r in records), \
+        "Test failed! The description filter was not applied."
+    assert summary['total'] is None, "Test failed! The rows were counted without count=True."
+    assert [r['call_epoch'] for r in records] == sorted((r['call_epoch'] for r in records), reverse=True), \
+        "Test failed! The ordered export is not newest first."
+    with pytest.raises(ValueError):
+        backend.export_incidents(io.BytesIO(), format='ndjson', compression='zstd')
+
+
+# 2. Parquet exports include the archived partitions
+def test_export_parquet_spans_archive(temp_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    backend.create_incidents_many(INCIDENTS)
+    with connection() as conn:
+        archive.archive_calls(conn, horizon_days=30, now=to_epoch("2021/12/05 00:00:00+00"))
+
+    path = str(tmp_path / "calls.parquet")
+    summary = backend.export_incidents(path, format='parquet', compression='zstd', chunk_size=7)
+    table = pq.read_table(path)
+    assert summary['rows'] == table.num_rows == 30, f"Test failed! Unexpected Parquet export {summary}."
+    assert table.schema.names == list(EXPORT_FIELDS), "Test failed! Unexpected Parquet columns."
+    window = backend.export_incidents(io.BytesIO(), start="2021/10/01 00:00:00+00", end="2021/11/01 00:00:00+00")
+    assert window['rows'] == 10, f"Test failed! Expected the 10 archived October calls, got {window}."
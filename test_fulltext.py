@@ -0,0 +1,53 @@
+import db
+from backend import create_incidents_many, delete_incident, search_incident, update_incident
+from fulltext import fts_query
+
+
+# 1. Description searches follow inserts, updates and deletes, and support prefix and phrase queries
+def test_search_incident_fulltext(temp_db):
+    create_incidents_many([
+        ("K1", "R1", "2021/12/01 10:00:00+00", "High", "HIT AND RUN", "C1", 1, 1, 1),
+        ("K2", "R2", "2021/12/01 11:00:00+00", "Low", "RUN AWAY HIT", "C2", 1, 1, 2),
+        ("K3", "R3", "2021/12/02 12:00:00+00", "High", "BURGLARY", "C3", 1, 1, 1),
+    ])
+
+    keys = lambda rows: sorted(row['call_key'] for row in rows)
+    assert keys(search_incident(description="hit run")) == ["K1", "K2"], "Test failed! Word search mismatch."
+    assert keys(search_incident(description='"hit and run"')) == ["K1"], "Test failed! Phrase search mismatch."
+    assert keys(search_incident(description="burg*")) == ["K3"], "Test failed! Prefix search mismatch."
+    assert keys(search_incident(description="hit", priority="Low")) == ["K2"], "Test failed! Priority filter ignored."
+    assert keys(search_incident(description="hit", jurisdiction_id=1, end="2021/12/01 10:30:00+00")) == ["K1"], \
+        "Test failed! Jurisdiction or time filter ignored."
+
+    update_incident("K3", description="HOME INVASION")
+    delete_incident("K1")
+    assert search_incident(description="burg*") == [], "Test failed! The index kept an updated description."
+    assert keys(search_incident(description="invasion")) == ["K3"], "Test failed! The new description is not indexed."
+    assert keys(search_incident(description="hit", limit=5)) == ["K2"], "Test failed! The index kept a deleted call."
+
+
+# 2. User input is always turned into a valid FTS5 query
+def test_fts_query():
+    assert fts_query('burg* "hit and run"') == '"burg"* "hit and run"', "Test failed! Unexpected FTS5 query."
+    assert fts_query('NEAR( a" OR -') == '"NEAR(" "a""" "OR"', "Test failed! Syntax was not neutralized."
+    assert fts_query(' * "" ') is None, "Test failed! Expected no query for text without words."
+
+
+# 3. A renumbering of the Calls rowids (as a VACUUM may do) is repaired when the database is opened
+def test_fulltext_repaired_after_rowid_drift(temp_db):
+    create_incidents_many([
+        ("K1", "R1", "2021/12/01 10:00:00+00", "High", "HIT AND RUN", "C1", 1, 1, 1),
+        ("K2", "R2", "2021/12/01 11:00:00+00", "Low", "BURGLARY", "C2", 1, 1, 2),
+        ("K3", "R3", "2021/12/02 12:00:00+00", "High", "HOME INVASION", "C3", 1, 1, 1),
+    ])
+    delete_incident("K1")
+    with db.transaction() as conn:
+        conn.execute("UPDATE Calls SET rowid = rowid - 1")  # Packs the rowids from 1, like VACUUM
+    assert [row['call_key'] for row in search_incident(description="burglary")] == ["K3"], \
+        "Test failed! The drift was not reproduced."
+
+    db.configure(temp_db)  # A new pool, as when the application restarts
+    assert [row['call_key'] for row in search_incident(description="burglary")] == ["K2"], \
+        "Test failed! The index was not rebuilt."
+    assert [row['call_key'] for row in search_incident(description="invasion")] == ["K3"], \
+        "Test failed! The index was not rebuilt."
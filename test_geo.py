@@ -0,0 +1,74 @@
+import pytest
+
+import archive
+import backend
+import geo
+from db import connection, transaction
+from lookups import resolve_location
+from rollups import verify_rollups
+from timestamps import to_epoch
+
+# Location 1 has the even calls, location 2 (about 510 m north of it) the odd ones
+INCIDENTS = [(f"K{i}", f"R{i}", f"2021/{10 + i % 3}/0{1 + i % 9} 10:00:00+00", ["High", "Low"][i // 2 % 2], "NOISE",
+              f"P{i}", 1 + i % 2, 1, 1) for i in range(24)]
+
+
+def geocode(tmp_path):
+    path = tmp_path / "geocodes.csv"
+    path.write_text("address,zip_code,latitude,longitude\n"
+                    "100 MAIN ST,21201,39.2904,-76.6122\n"
+                    "200 OAK ST,21202,39.2950,-76.6122\n"
+                    "300 ELM ST,21203,not a number,-76.6\n"
+                    "400 PINE ST,21201,39.3100,-76.6122\n")
+    with transaction() as conn:
+        return geo.load_geocodes(conn, str(path))
+
+
+# 1. Radius and box searches find the calls at the geocoded locations through the R*Tree
+def test_radius_and_bbox_search(temp_db, tmp_path):
+    backend.create_incidents_many(INCIDENTS)
+    assert backend.incidents_near(39.2904, -76.6122, 1000) == [], "Test failed! Locations have no coordinates yet."
+    pine = resolve_location("400 PINE ST")  # Incident locations have no ZIP code
+    backend.create_incident("K99", "R99", "2021/12/01 10:00:00+00", "Low", "NOISE", "P99", pine, 1, 1)
+    summary = geocode(tmp_path)
+    assert summary == {'read': 4, 'skipped': 1, 'updated': 3}, f"Test failed! Unexpected geocode summary {summary}."
+    assert [row['call_key'] for row in backend.incidents_near(39.3100, -76.6122, 50)] == ["K99"], \
+        "Test failed! A location without a ZIP code was not geocoded."
+
+    near = backend.incidents_near(39.2904, -76.6122, 300, limit=None, shape='incident')
+    assert sorted(i.call_key for i in near) == sorted(f"K{i}" for i in range(0, 24, 2)), \
+        "Test failed! The radius search should only find location 1."
+    assert [i.call_epoch for i in near] == sorted((i.call_epoch for i in near), reverse=True), \
+        "Test failed! Incidents are not newest first."
+    both = backend.incidents_near(39.2904, -76.6122, 600, priority="High", start="2021/11/01 00:00:00+00", limit=5)
+    assert len(both) == 5 and {row['incident_location_id'] for row in both} == {1, 2}, \
+        "Test failed! The wider radius should reach location 2."
+    assert all(row['priority'] == "High" and row['call_epoch'] >= to_epoch("2021/11/01 00:00:00+00") for row in both), \
+        "Test failed! The filters were not applied."
+
+    boxed = backend.incidents_in_bbox(39.293, -76.62, 39.30, -76.60, limit=None)
+    assert {row['incident_location_id'] for row in boxed} == {2} and len(boxed) == 12, \
+        "Test failed! The box should only contain location 2."
+    with pytest.raises(ValueError):
+        backend.incidents_near(95, 0, 100)
+
+
+# 2. Grid counts agree across the rollup and the filtered paths, archived calls included
+def test_incident_grid(temp_db, tmp_path):
+    backend.create_incidents_many(INCIDENTS)
+    geocode(tmp_path)
+    with connection() as conn:
+        archive.archive_calls(conn, horizon_days=30, now=to_epoch("2021/12/05 00:00:00+00"))
+        assert verify_rollups(conn) == [], "Test failed! Rollups out of date."
+
+    grid = backend.incident_grid(cell_m=100)
+    assert [count for _, _, count in grid] == [12, 12], f"Test failed! Unexpected grid {grid}."
+    assert geo.distance_m(grid[0][0], grid[0][1], 39.2904, -76.6122) < 100 \
+        or geo.distance_m(grid[1][0], grid[1][1], 39.2904, -76.6122) < 100, "Test failed! Cells are misplaced."
+    assert [count for _, _, count in backend.incident_grid(cell_m=1000)] == [24], \
+        "Test failed! Both locations should share a 1 km cell."
+
+    window = backend.incident_grid(cell_m=100, start="2021/11/01 00:00:00+00", end="2021/12/01 00:00:00+00")
+    assert sorted(count for _, _, count in window) == [4, 4], f"Test failed! Unexpected window grid {window}."
+    high = backend.incident_grid(cell_m=100, priority="High", bbox=(39.293, -76.62, 39.30, -76.60))
+    assert [count for _, _, count in high] == [6], f"Test failed! Unexpected filtered grid {high}."
@@ -0,0 +1,47 @@
+import backend
+import changelog
+from db import transaction
+
+INCIDENTS = [(f"K{i}", f"R{i}", f"2021/12/{10 + i} 10:00:00+00", "High", "NOISE", f"P{i}", 1, 1, 1) for i in range(5)]
+
+
+# 1. Polls return only the incidents changed since the watermark
+def test_changes_since_watermark(temp_db):
+    backend.create_incidents_many(INCIDENTS)
+    first = backend.incident_changes(priority="High", page_size=3)
+    assert first['reset'] and [i['call_key'] for i in first['incidents']] == ["K4", "K3", "K2"], \
+        f"Test failed! Unexpected first poll {first}."
+
+    idle = backend.incident_changes(since=first['watermark'], priority="High")
+    assert idle['incidents'] == [] and idle['watermark'] == first['watermark'], "Test failed! An idle poll changed."
+
+    backend.create_incident("K9", "R9", "2021/12/20 10:00:00+00", "High", "NOISE", "P9", 1, 1, 1)
+    backend.update_incident("K1", description="BURGLARY")
+    backend.update_incident("K2", priority="Low")
+    backend.delete_incident("K3")
+    changes = backend.incident_changes(since=first['watermark'], priority="High")
+    assert not changes['reset'] and not changes['more'], f"Test failed! Unexpected poll {changes}."
+    assert [i['call_key'] for i in changes['incidents']] == ["K9", "K1"], "Test failed! Unexpected changed incidents."
+    assert changes['incidents'][1]['description'] == "BURGLARY", "Test failed! The update was not returned."
+    assert changes['removed'] == ["K2", "K3"], f"Test failed! Unexpected removed keys {changes['removed']}."
+
+    partial = backend.incident_changes(since=first['watermark'], max_changes=2)
+    assert partial['more'] and [i['call_key'] for i in partial['incidents']] == ["K9", "K1"], \
+        f"Test failed! Unexpected partial poll {partial}."
+    rest = backend.incident_changes(since=partial['watermark'])
+    assert rest['watermark'] == changes['watermark'] and [i['call_key'] for i in rest['incidents']] == ["K2"], \
+        f"Test failed! Unexpected second partial poll {rest}."
+
+
+# 2. A watermark older than the pruned change log resets the board
+def test_pruned_watermark_resets(temp_db):
+    backend.create_incidents_many(INCIDENTS)
+    watermark = backend.incident_changes()['watermark']
+    backend.update_incident("K0", priority="Low")
+    backend.update_incident("K1", priority="Low")
+    with transaction() as conn:
+        changelog.prune_changes(conn, watermark + 2)
+
+    changes = backend.incident_changes(since=watermark, page_size=10)
+    assert changes['reset'] and len(changes['incidents']) == 5, f"Test failed! Expected a reset, got {changes}."
+    assert changes['watermark'] == watermark + 2, "Test failed! Unexpected watermark after a reset."
@@ -0,0 +1,66 @@
+import backend
+import instrumentation
+from db import connection, transaction
+
+
+def query(snapshot, prefix):
+    return next(q for q in snapshot['queries'] if q['template'].startswith(prefix))
+
+
+# 1. Statements are recorded by template with their rows, latency percentiles and caller
+def test_statements_are_recorded(temp_db):
+    backend.create_incidents_many((f"K{i}", f"R{i}", "2021/12/01 10:00:00+00", "Low", "NOISE", f"P{i}", 1, 1, 1)
+                                  for i in range(20))
+    instrumentation.reset()
+    for call_key in ("K1", "K2", "K3"):
+        backend.update_incident(call_key, priority="High")
+    with connection() as conn:
+        rows = [row for row in conn.execute("SELECT call_key FROM Calls WHERE priority = 'High' LIMIT 10")]
+
+    snapshot = instrumentation.snapshot()
+    update = query(snapshot, "UPDATE Calls SET priority = ?")
+    assert update['calls'] == 3 and update['rows'] == 3, f"Test failed! Unexpected update metrics {update}."
+    assert update['callers'] == {'backend.update_incident': 3}, f"Test failed! Unexpected callers {update['callers']}."
+    select = query(snapshot, "SELECT call_key FROM Calls WHERE priority = ? LIMIT ?")
+    assert select['rows'] == len(rows) == 3, f"Test failed! Expected 3 rows recorded, got {select}."
+    assert 0 <= select['p50_ms'] <= select['p99_ms'] <= select['max_ms'], "Test failed! Inconsistent percentiles."
+
+
+# 2. Slow statements are logged with their query plan
+def test_slow_query_log(temp_db):
+    instrumentation.reset()
+    instrumentation.configure(slow_ms=0)
+    try:
+        backend.search_incident(call_key="K1")
+        with connection() as conn:
+            cursor = conn.execute("SELECT call_key FROM Calls WHERE priority = 'Low'")
+            del cursor  # Collected unread: recorded with the plan captured by execute()
+    finally:
+        instrumentation.configure(slow_ms=100)
+    slow = [entry for entry in instrumentation.snapshot()['slow_queries']
+            if entry['caller'] == 'backend.search_incident' and "WHERE call_key = ?" in entry['template']]
+    assert slow, "Test failed! The search was not logged as slow."
+    assert any("USING INDEX" in step for step in slow[0]['plan']), f"Test failed! Unexpected plan {slow[0]['plan']}."
+    unread = next(entry for entry in instrumentation.snapshot()['slow_queries']
+                  if entry['template'] == "SELECT call_key FROM Calls WHERE priority = ?")
+    assert unread['plan'], "Test failed! The collected cursor was logged without its plan."
+    instrumentation.reset()
+    assert instrumentation.snapshot()['queries'] == [], "Test failed! reset() kept metrics."
+
+
+# 3. Slow executemany() batches are explained with their first parameters, and still run them all
+def test_slow_executemany_plan(temp_db):
+    backend.create_incidents_many((f"K{i}", f"R{i}", "2021/12/01 10:00:00+00", "Low", "NOISE", f"P{i}", 1, 1, 1)
+                                  for i in range(3))
+    instrumentation.reset()
+    instrumentation.configure(slow_ms=0)
+    try:
+        with transaction() as conn:
+            conn.executemany("UPDATE Calls SET priority = ? WHERE call_key = ?",
+                             (("High", key) for key in ("K1", "K2")))
+    finally:
+        instrumentation.configure(slow_ms=100)
+    batch = next(entry for entry in instrumentation.snapshot()['slow_queries']
+                 if entry['template'] == "UPDATE Calls SET priority = ? WHERE call_key = ?")
+    assert batch['rows'] == 2, f"Test failed! Expected 2 updated calls, got {batch['rows']}."
+    assert any("USING INDEX" in step for step in batch['plan']), f"Test failed! Unexpected plan {batch['plan']}."
@@ -0,0 +1,116 @@
+import sqlite3
+import pytest
+
+pd = pytest.importorskip("pandas")
+from loader import load_csv
+
+CSV_HEADER = ("callKey,recordId,callDateTime,priority,description,callNumber,location,Neighborhood,ZIPCode,"
+              "Census_Tracts,Community_Statistical_Areas,incidentLocation,district,PoliceDistrict,PolicePost,"
+              "CouncilDistrict,SheriffDistricts,NeedsSync,ESRI_OID\n")
+
+def write_csv(path, rows):
+    with open(path, "w") as f:
+        f.write(CSV_HEADER)
+        for row in rows:
+            f.write(",".join(row) + "\n")
+
+def make_row(i, address="100 MAIN ST", district="CD"):
+    return [f"K{i}", str(i), "2021/12/01 10:00:00+00", "Medium", "THEFT", f"P{i}", address, "Downtown",
+            "21201", "Census Tract 401", "Downtown", f"{i} BLOCK", district, "Central", "111", "11", "D1",
+            "1", str(1000 + i)]
+
+# 1. Rows, locations and jurisdictions are loaded and deduplicated across chunks
+def test_load_csv_dedups_across_chunks(tmp_path):
+    csv_path = tmp_path / "calls.csv"
+    db_path = str(tmp_path / "calls.db")
+    rows = [make_row(i) for i in range(7)] + [make_row(7, address="200 OAK ST", district="ED")]
+    incomplete = make_row(8)
+    incomplete[4] = ""  # Rows with a missing value are skipped, as in the notebook
+    write_csv(csv_path, rows + [incomplete])
+
+    summary = load_csv(str(csv_path), db_path, chunksize=3)
+
+    conn = sqlite3.connect(db_path)
+    calls = conn.execute("SELECT COUNT(*) FROM Calls").fetchone()[0]
+    jurisdictions = conn.execute("SELECT COUNT(*) FROM Jurisdictions").fetchone()[0]
+    locations = conn.execute("SELECT COUNT(*) FROM Locations").fetchone()[0]
+    metadata = conn.execute("SELECT needs_sync, esri_oid FROM ArcGIS_Metadata WHERE call_key = 'K3'").fetchone()
+    conn.close()
+
+    assert summary['processed'] == 8, f"Test failed! Expected 8 processed rows, but got {summary['processed']}."
+    assert summary['skipped'] == 1, f"Test failed! Expected 1 skipped row, but got {summary['skipped']}."
+    assert calls == 8, f"Test failed! Expected 8 calls, but got {calls}."
+    assert jurisdictions == 2, f"Test failed! Expected 2 jurisdictions, but got {jurisdictions}."
+    # 2 reporter locations + 8 distinct incident locations
+    assert locations == 10, f"Test failed! Expected 10 locations, but got {locations}."
+    assert tuple(metadata) == (1, 1003), f"Test failed! Unexpected ArcGIS metadata {tuple(metadata)}."
+
+# 2. Re-running the loader is idempotent and reuses existing lookup rows
+def test_load_csv_is_idempotent(tmp_path):
+    csv_path = tmp_path / "calls.csv"
+    db_path = str(tmp_path / "calls.db")
+    write_csv(csv_path, [make_row(i) for i in range(5)])
+
+    load_csv(str(csv_path), db_path, chunksize=2)
+    summary = load_csv(str(csv_path), db_path, chunksize=2)
+
+    conn = sqlite3.connect(db_path)
+    locations = conn.execute("SELECT COUNT(*) FROM Locations").fetchone()[0]
+    conn.close()
+    assert summary['processed'] == 0, f"Test failed! Expected 0 new rows, but got {summary['processed']}."
+    assert locations == 6, f"Test failed! Expected 6 locations, but got {locations}."
+
+# 3. Loading into a database built by the notebook reuses its jurisdictions, with bounded caches
+def test_load_csv_into_notebook_database(tmp_path):
+    from schema import create_schema
+    csv_path = tmp_path / "calls.csv"
+    db_path = str(tmp_path / "calls.db")
+    conn = sqlite3.connect(db_path)
+    create_schema(conn)  # Unmigrated, with values bound like the notebook's raw pandas floats
+    conn.execute("INSERT INTO Jurisdictions (district, police_district, police_post, council_district, "
+                 "sheriff_district) VALUES ('CD', 'Central', 111.0, 11.0, 'D1')")
+    conn.commit()
+    conn.close()
+    write_csv(csv_path, [make_row(i) for i in range(6)])
+
+    summary = load_csv(str(csv_path), db_path, chunksize=2, cache_size=2)
+
+    conn = sqlite3.connect(db_path)
+    jurisdictions = conn.execute("SELECT jurisdiction_id, police_post, council_district FROM Jurisdictions").fetchall()
+    used = conn.execute("SELECT DISTINCT jurisdiction_id FROM Calls").fetchall()
+    locations = conn.execute("SELECT COUNT(*) FROM Locations").fetchone()[0]
+    conn.close()
+    assert summary['processed'] == 6, f"Test failed! Expected 6 processed rows, but got {summary['processed']}."
+    assert jurisdictions == [(1, "111", "11")] and used == [(1,)], \
+        f"Test failed! The notebook jurisdiction was not reused: {jurisdictions}."
+    assert locations == 7, f"Test failed! Expected 7 locations with a 2-key cache, but got {locations}."
+
+# 4. A bulk load updates the rollups and the full-text index without logging each call, and the
+# consumers of the change log start over
+def test_load_csv_resets_change_log(temp_db, tmp_path):
+    import backend
+    import changelog
+    from arcgis_sync import MockSink, SyncWorker
+    from db import connection
+    from rollups import verify_rollups
+
+    backend.create_incidents_many([("S1", "R1", "2021/12/01 10:00:00+00", "Low", "NOISE", "P1", 1, 1, 1)])
+    worker = SyncWorker(MockSink(), backoff=0)
+    assert worker.drain()['upserts'] == 1, "Test failed! The first call was not synced."
+    watermark = backend.incident_changes()['watermark']
+
+    csv_path = tmp_path / "calls.csv"
+    rows = [make_row(i) for i in range(4)]
+    rows[0][17] = "0"  # Already synced according to the CSV
+    write_csv(csv_path, rows)
+    load_csv(str(csv_path), temp_db, chunksize=3)
+
+    with connection() as conn:
+        logged = conn.execute("SELECT COUNT(*) FROM Call_Changes").fetchone()[0]
+        assert logged == 0, f"Test failed! Expected no logged change, got {logged}."
+        assert verify_rollups(conn) == [], "Test failed! The rollups miss the loaded calls."
+        assert not changelog.has_changes_since(conn, watermark), "Test failed! The log was not reset."
+    assert len(backend.search_incident(description="theft")) == 4, "Test failed! The loaded calls were not indexed."
+    assert backend.incident_changes(since=watermark)['reset'], "Test failed! The live board was not reset."
+    pushed = worker.drain()
+    assert pushed['upserts'] == 3, f"Test failed! Expected the 3 dirty loaded calls to be synced, got {pushed}."
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import lookups
+from lookups import LookupCache, resolve_jurisdiction, resolve_location, resolve_locations
+
+
+# 1. Existing rows are found, new ones are created once, and batch resolves keep the input order
+def test_resolve_location_and_jurisdiction(temp_db):
+    assert resolve_location("100 MAIN ST", "Downtown", 21201, "401", "Downtown") == 1, \
+        "Test failed! The existing location was not found."
+    assert resolve_jurisdiction("ED", "Eastern", "222", "12", "D2") == 2, "Test failed! The existing jurisdiction was not found."
+    assert resolve_location("1 NEW ST", create=False) is None, "Test failed! create=False created a location."
+
+    new_id = resolve_location(" 1 NEW ST ")
+    assert resolve_location("1 NEW ST") == new_id == 3, f"Test failed! Expected location 3 once, got {new_id}."
+    ids = resolve_locations([{'address': "2 NEW ST"}, ("1 NEW ST",), {'address': "2 NEW ST"}])
+    assert ids == [4, 3, 4], f"Test failed! Unexpected batch ids {ids}."
+    assert lookups.locations.stats()['created'] == 2, "Test failed! Unexpected number of created locations."
+
+
+# 2. Concurrent resolves of the same new key create a single row, and the cache stays bounded
+def test_lookup_cache_concurrency_and_bound(temp_db):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(lambda _: resolve_jurisdiction("NW", "Northwestern", "611"), range(32)))
+    assert len(set(ids)) == 1, f"Test failed! Concurrent resolves created several rows: {set(ids)}."
+
+    cache = LookupCache('Locations', 'location_id', lookups.LOCATION_FIELDS, maxsize=2)
+    cache.resolve_many([(f"{i} ELM ST",) for i in range(5)])
+    stats = cache.stats()
+    assert stats['size'] == 2 and stats['evictions'] >= 3, f"Test failed! The cache is not bounded: {stats}."
@@ -0,0 +1,44 @@
+import sqlite3
+from migrations import MIGRATIONS, check_query_plans, migrate, schema_version
+
+# 1. Migrations build a fresh database and are idempotent
+def test_migrate_is_idempotent(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "migrate.db"))
+
+    applied = migrate(conn)
+    latest = MIGRATIONS[-1][0]
+    assert applied == [version for version, _, _ in MIGRATIONS], f"Test failed! Unexpected migrations {applied}."
+    assert schema_version(conn) == latest, f"Test failed! Expected version {latest}, but got {schema_version(conn)}."
+
+    applied_again = migrate(conn)
+    assert applied_again == [], f"Test failed! Expected no migrations on re-run, but got {applied_again}."
+    conn.close()
+
+# 2. Every backend and dashboard query is served by an index
+def test_query_plans_use_indexes(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "plans.db"))
+    migrate(conn)
+    conn.executemany("INSERT INTO Calls (call_key, call_date_time, priority, jurisdiction_id, reporter_location_id) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     [(f"K{i}", f"2021/12/01 {i % 24:02d}:00:00+00", "High", i % 5, i % 7) for i in range(200)])
+    conn.commit()
+    conn.execute("ANALYZE")
+
+    plans = check_query_plans(conn)  # Raises AssertionError on a full table scan
+    assert "SEARCH" in plans['search_incident'][0], f"Test failed! Unexpected plan {plans['search_incident']}."
+    assert "idx_locations_coordinates" in plans['incident_grid_rollup'][0], \
+        f"Test failed! Unexpected plan {plans['incident_grid_rollup']}."
+    conn.close()
+
+# 3. Existing rows get call_epoch backfilled when the column is added
+def test_call_epoch_backfill(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "backfill.db"))
+    migrate(conn, target=2)
+    conn.execute("INSERT INTO Calls (call_key, call_date_time) VALUES ('K1', '2021/12/01 10:00:00+00')")
+    conn.execute("INSERT INTO Calls (call_key, call_date_time) VALUES ('K2', 'garbage')")
+    conn.commit()
+
+    migrate(conn)
+    epochs = dict(conn.execute("SELECT call_key, call_epoch FROM Calls"))
+    assert epochs == {'K1': 1638352800, 'K2': None}, f"Test failed! Unexpected backfill {epochs}."
+    conn.close()
@@ -0,0 +1,46 @@
+from backend import create_incidents_many, decode_cursor, list_incidents
+
+
+# Helper to follow every cursor and collect the call_keys of all pages
+def _all_pages(page_size, **filters):
+    keys, cursor, pages = [], None, 0
+    while True:
+        incidents, cursor = list_incidents(page_size=page_size, cursor=cursor, **filters)
+        keys += [incident['call_key'] for incident in incidents]
+        pages += 1
+        if cursor is None:
+            return keys, pages
+
+
+# 1. Pages cover every incident exactly once, newest first, with untimed calls last
+def test_list_incidents_pages(temp_db):
+    incidents = [{'call_key': f"K{i:02d}", 'call_date_time': f"2021/12/01 {i % 5:02d}:00:00+00",
+                  'priority': "High" if i % 2 else "Low", 'jurisdiction_id': 1 + i % 2} for i in range(23)]
+    incidents.append({'call_key': "NO-TIME", 'call_date_time': "unknown", 'priority': "Low", 'jurisdiction_id': 1})
+    create_incidents_many(incidents)
+
+    keys, pages = _all_pages(page_size=5)
+    expected = sorted((incident for incident in incidents[:-1]),
+                      key=lambda incident: (incident['call_date_time'], incident['call_key']), reverse=True)
+    assert keys == [incident['call_key'] for incident in expected] + ["NO-TIME"], f"Test failed! Unexpected order {keys}."
+    assert pages == 5, f"Test failed! Expected 5 pages, but got {pages}."
+
+    high, _ = _all_pages(page_size=4, priority="High", start="2021/12/01 01:00:00+00", end="2021/12/01 03:00:00+00")
+    assert high == ["K17", "K07", "K21", "K11", "K01"], f"Test failed! Unexpected filtered keys {high}."
+
+
+# 2. A cursor stays valid when newer incidents are inserted, and bad cursors are rejected
+def test_list_incidents_cursor_is_stable(temp_db):
+    create_incidents_many({'call_key': f"K{i}", 'call_date_time': f"2021/12/0{i + 1} 10:00:00+00"} for i in range(4))
+    first, cursor = list_incidents(page_size=2)
+    assert decode_cursor(cursor) == (first[-1]['call_epoch'], "K2"), "Test failed! The cursor does not point at the last row."
+
+    create_incidents_many([{'call_key': "NEWEST", 'call_date_time': "2022/01/01 00:00:00+00"}])
+    second, cursor = list_incidents(page_size=2, cursor=cursor)
+    assert [row['call_key'] for row in second] == ["K1", "K0"] and cursor is None, "Test failed! The second page shifted."
+
+    try:
+        list_incidents(cursor="not-a-cursor")
+        assert False, "Test failed! An invalid cursor was accepted."
+    except ValueError:
+        pass
@@ -0,0 +1,41 @@
+import time
+
+from backend import create_incident, read_incidents, search_incident, update_incident
+from query_cache import QueryCache
+
+
+# Test that repeated reads hit the cache and any write invalidates it
+def test_query_cache_hits_and_write_invalidation(temp_db):
+    create_incident("cache-1", "R1", "2021/12/01 10:00:00+00", "Low", "Noise", "C1", 1, 1, 1)
+
+    first = read_incidents()
+    assert read_incidents() is first, "Test failed! The second read was not served from the cache."
+
+    update_incident("cache-1", priority="High")
+    rows = search_incident(call_key="cache-1")
+    assert rows[0]['priority'] == "High", "Test failed! A cached search returned data from before the update."
+    assert read_incidents() is not first, "Test failed! The cache was not invalidated by a write."
+
+
+# Test the size bound, the TTL and the statistics
+def test_query_cache_bounds_and_stats():
+    version = [0]
+    cache = QueryCache(maxsize=2, ttl=0.05, version=lambda: version[0])
+    calls = []
+
+    @cache.cached()
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    square(1), square(1), square(2), square(3)  # 3 evicts 1
+    square(1)
+    assert calls == [1, 2, 3, 1], f"Test failed! Unexpected computations: {calls}"
+
+    version[0] += 1
+    square(1)  # stale
+    time.sleep(0.06)
+    square(1)  # expired
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 6, 2), f"Test failed! Unexpected stats: {stats}"
+    assert (stats['stale'], stats['expired'], stats['size']) == (1, 1, 2), f"Test failed! Unexpected stats: {stats}"
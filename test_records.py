@@ -0,0 +1,57 @@
+import pytest
+
+import archive
+import backend
+from db import connection
+from records import INCIDENT_FIELDS, Incident
+from timestamps import to_epoch
+
+INCIDENTS = [(f"K{i}", f"R{i}", f"2021/{10 + i % 3}/0{1 + i % 9} 10:00:00+00", ["High", "Low"][i % 2], "NOISE",
+              f"P{i}", 1, 1 + i % 2, 1 + i % 2) for i in range(30)]
+
+
+# 1. Every shape carries the same incidents as the default sqlite3.Row results
+def test_shapes_match_rows(temp_db):
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("pyarrow")
+    backend.create_incidents_many(INCIDENTS + [("K99", "R99", None, "Low", "NOISE", "P99", None, None, None)])
+
+    rows, _ = backend.list_incidents(page_size=50)
+    expected = [tuple(row) for row in rows]
+    incidents, _ = backend.list_incidents(page_size=50, shape='incident')
+    assert incidents == expected and isinstance(incidents[0], Incident), "Test failed! Incident shape differs."
+    assert incidents[0].call_key == rows[0]['call_key'], "Test failed! Incident fields are not named."
+
+    columns, _ = backend.list_incidents(page_size=50, shape='numpy')
+    assert list(columns['call_key']) == [row['call_key'] for row in rows], "Test failed! NumPy keys differ."
+    assert np.isnan(columns['jurisdiction_id'][-1]), "Test failed! A NULL id should be NaN."
+    batch = backend.search_incident(priority="High", shape='arrow')
+    assert batch.num_rows == 15 and batch.schema.names == list(INCIDENT_FIELDS), "Test failed! Unexpected Arrow batch."
+
+    streamed = [tuple(incident) for incident in backend.iter_incidents(chunk_size=7)]
+    assert streamed == expected, "Test failed! The stream differs from the listing."
+    batches = list(backend.iter_incidents(priority="Low", shape='arrow', chunk_size=4))
+    assert [b.num_rows for b in batches] == [4, 4, 4, 4], "Test failed! Unexpected Arrow batches."
+    with pytest.raises(ValueError):
+        backend.list_incidents(shape='xml')
+
+
+# 2. Streams merge the hot table and the archive partitions newest first
+def test_stream_spans_archive(temp_db):
+    backend.create_incidents_many(INCIDENTS)
+    with connection() as conn:
+        summary = archive.archive_calls(conn, horizon_days=30, now=to_epoch("2021/12/05 00:00:00+00"))
+    assert summary['months'] == ["2021-10", "2021-11"], f"Test failed! Unexpected archive {summary}."
+    backend.create_incident("K50", "R50", "2021/10/15 10:00:00+00", "Low", "NOISE", "P50", 1, 1, 1)  # Old but hot
+
+    listed, cursor = [], None
+    while True:
+        page, cursor = backend.list_incidents(page_size=8, cursor=cursor, shape='incident')
+        listed += page
+        if cursor is None:
+            break
+    streamed = list(backend.iter_incidents(chunk_size=5))
+    assert len(streamed) == 31 and streamed == listed, "Test failed! The stream does not match the paged listing."
+    window = list(backend.iter_incidents(start="2021/10/01 00:00:00+00", end="2021/11/01 00:00:00+00", ordered=False))
+    assert sorted(i.call_key for i in window) == sorted(i.call_key for i in listed if i.call_date_time < "2021/11"), \
+        "Test failed! The unordered window stream is incomplete."
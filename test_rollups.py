@@ -0,0 +1,41 @@
+import uuid
+
+import backend
+from db import connection
+from rollups import read_rollup, verify_rollups
+
+def assert_consistent():
+    with connection() as conn:
+        mismatched = verify_rollups(conn)
+    assert mismatched == [], f"Test failed! Rollups out of date: {mismatched}"
+
+# 1. Rollups follow create, update and delete through the backend
+def test_rollups_follow_writes(temp_db):
+    call_key = backend.create_incident(None, "R1", "2021/12/01 10:00:00+00", "High", "THEFT", "P1", 1, 1, 1)
+    backend.create_incident(None, "R2", "2021/12/01 23:30:00+00", "Low", "NOISE", "P2", 2, 2, 2)
+    assert_consistent()
+
+    backend.update_incident(call_key, priority="Low", call_date_time="2021/12/02 08:00:00+00")
+    assert_consistent()
+    with connection() as conn:
+        priorities = [tuple(row) for row in read_rollup(conn, 'priority')]
+        days = [tuple(row) for row in read_rollup(conn, 'date_priority')]
+    assert priorities == [("Low", 2)], f"Test failed! Unexpected priority rollup {priorities}."
+    assert days == [("2021-12-01", "Low", 1), ("2021-12-02", "Low", 1)], f"Test failed! Unexpected rollup {days}."
+
+    backend.delete_incident(call_key)
+    assert_consistent()
+
+# 2. Bulk ingestion and unknown lookups keep the rollups exact
+def test_rollups_follow_bulk_insert(temp_db):
+    incidents = [(str(uuid.uuid4()), f"R{i}", f"2021/12/0{1 + i % 3} {i % 24:02d}:00:00+00",
+                  ["High", "Low", None][i % 3], "BATCH", f"P{i}", 1, 1 + i % 3, 1 + i % 3) for i in range(60)]
+    backend.create_incidents_many(incidents, chunk_size=7)
+    assert_consistent()
+
+    with connection() as conn:
+        conn.execute("DELETE FROM Calls WHERE priority = 'High'")
+        conn.commit()
+        empty_groups = conn.execute("SELECT COUNT(*) FROM Rollup_Priority WHERE count <= 0").fetchone()[0]
+    assert_consistent()
+    assert empty_groups == 0, "Test failed! Empty rollup groups should be removed."
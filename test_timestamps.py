@@ -0,0 +1,17 @@
+from timestamps import format_call_time, to_epoch
+
+# 1. The stored "+00" format and ISO-8601 variants parse to the same epoch
+def test_to_epoch_formats():
+    expected = 1638352800  # 2021-12-01 10:00:00 UTC
+    for value in ("2021/12/01 10:00:00+00", "2021-12-01T10:00:00Z", "2021-12-01 05:00:00-05:00",
+                  "2021-12-01 10:00:00"):
+        assert to_epoch(value) == expected, f"Test failed! {value!r} parsed to {to_epoch(value)}."
+
+# 2. Missing or malformed values become None instead of raising
+def test_to_epoch_invalid():
+    for value in (None, "", "not a date", "2021/13/45 10:00:00+00", float("nan")):
+        assert to_epoch(value) is None, f"Test failed! Expected None for {value!r}, but got {to_epoch(value)}."
+
+# 3. Formatting round-trips to the stored text format
+def test_format_call_time():
+    assert format_call_time(1638352800) == "2021/12/01 10:00:00+00", "Test failed! Unexpected formatted time."
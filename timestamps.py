@@ -0,0 +1,72 @@
+import re
+from datetime import datetime, timezone
+
+# Format of Calls.call_date_time, e.g. "2021/12/01 10:00:00+00"
+CALL_TIME_FORMAT = "%Y/%m/%d %H:%M:%S+00"
+
+_CALL_TIME_PATTERN = re.compile(
+    r"^\s*(\d{4})[/-](\d{1,2})[/-](\d{1,2})"               # date
+    r"(?:[ T](\d{1,2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?)?"    # optional time
+    r"\s*(Z|[+-]\d{2}(?::?\d{2})?)?\s*$"                    # optional UTC offset
+)
+
+
+# Function to convert a call time to a Unix epoch
+def to_epoch(value):
+    """
+    Convert a call date/time to seconds since the Unix epoch (UTC).
+
+    Accepts the stored "YYYY/MM/DD HH:MM:SS+00" text format, ISO-8601 variants ("-" separators,
+    "T", "Z" or "+HH:MM" offsets, date only), datetime objects and numbers (already an epoch).
+    Values without an offset are taken as UTC.
+
+    Parameters:
+    - value (str, datetime, int or float): The call time.
+
+    Returns:
+    - int or None: The epoch in seconds, or None if the value is missing or cannot be parsed.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value == value else None  # NaN is not a time
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+
+    match = _CALL_TIME_PATTERN.match(str(value))
+    if not match:
+        return None
+    year, month, day, hour, minute, second, offset = match.groups()
+    try:
+        moment = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                          tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+    epoch = int(moment.timestamp())
+    if offset and offset != 'Z':
+        sign = -1 if offset[0] == '-' else 1
+        digits = offset[1:].replace(':', '')
+        offset_seconds = int(digits[:2]) * 3600 + int(digits[2:4] or 0) * 60
+        epoch -= sign * offset_seconds
+    return epoch
+
+
+# Function to format an epoch in the stored call time format
+def format_call_time(epoch):
+    """
+    Format an epoch as the "YYYY/MM/DD HH:MM:SS+00" text used in Calls.call_date_time.
+
+    Parameters:
+    - epoch (int): Seconds since the Unix epoch.
+
+    Returns:
+    - str or None: The formatted UTC time, or None if epoch is None.
+    """
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime(CALL_TIME_FORMAT)